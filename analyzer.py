@@ -0,0 +1,788 @@
+from collections import defaultdict
+from io import StringIO
+
+from cfg import ControlFlowGraph, find_basic_blocks
+from clones import CloneCalls, Clones
+from codegen import InstructionCode
+from constants import ConstantFolding
+from instruction_table import InstructionTable
+from instructions import flag_table_declarations, values_to_mask, mask_to_values
+from inline import InlinedCode, Inliner
+from jswriter import JavascriptWriter
+from lazyflags import LazyFlags
+from loops import optimise_loops
+from memvars import MemoryVariableCode, MemoryVariables
+from pointers import ANY, DATA, PointerAnalysis
+from ports import AYPortCode, AYRegisterLoopCode, AYRegisterLoops
+from precompute import Precomputation
+from predecode import PreDecode
+from promote import RegisterPromoter
+from smc import find_modified_instructions
+from stack import LocalStackCode, StackAnalysis, uses_stack
+from summary import RoutineLiveness, RoutineSummaries
+from structure import IrreducibleControlFlow, RoutineStructurer, get_used_labels, write_statements
+
+
+class Routine(object):
+    def __init__(self, start_addr):
+        self.start_addr = start_addr
+        self.calls = []
+        self.is_traced = False
+        # addresses of exit instructions
+        self.exit_points = set()
+        # addresses of all instructions, in address order
+        self.addresses = []
+        self.cfg = None
+        self.overwrites = None
+        self.uses = None
+        self.results = None
+
+    def to_javascript(self, analyzer):
+        out = StringIO()
+        analyzer.find_self_modifying_code([self.start_addr])
+        inliner = analyzer.get_inliner()
+        promoter = analyzer.get_register_promoter([self.start_addr], inliner)
+        self.write_javascript(JavascriptWriter(out), analyzer, promoter, inliner)
+        return out.getvalue()
+
+    def write_javascript(
+        self, writer, analyzer, promoter=None, inliner=None, memory_variables=None,
+        ay_register_loops=None, clones=None, clone=None
+    ):
+        # If clone (a clones.Clone of the routine) is given, write that instead
+        instructions_by_address = analyzer.instructions_by_address
+        name = "r%04x" % self.start_addr if clone is None else clone.name
+        liveness = RoutineLiveness(analyzer, self, clone)
+        jump_targets = analyzer.jump_targets
+
+        precomputation = analyzer.precomputed.get(self.start_addr)
+        if precomputation is not None:
+            writer.write_line("function %s() {" % name)
+            writer.indent()
+            writer.write_code("/*\nPrecomputed: sets up the state that the routine leaves\n*/")
+            precomputation.write_javascript(
+                writer, liveness.results, memory_variables, analyzer.ay_ports
+            )
+            writer.dedent()
+            writer.write_line("}")
+            return
+
+        code = InstructionCode(instructions_by_address, liveness)
+        if inliner is not None:
+            code = InlinedCode(inliner, liveness, code)
+        if analyzer.promote_stack:
+            stack = analyzer.get_stack_analysis(self.start_addr)
+            if stack.is_balanced and stack.depth:
+                code = LocalStackCode(analyzer, stack, code)
+        if ay_register_loops is not None:
+            code = AYRegisterLoopCode(ay_register_loops, liveness, code)
+        if promoter is not None:
+            code = promoter.promote(self, liveness, code, clones)
+        if memory_variables:
+            code = MemoryVariableCode(memory_variables, code)
+        if analyzer.fold_constants:
+            code = ConstantFolding(analyzer, self, code)
+        if analyzer.ay_ports:
+            code = AYPortCode(code)
+        if analyzer.lazy_flags:
+            code = LazyFlags(analyzer, self, liveness, code)
+        if clones is not None:
+            code = CloneCalls(clones, code)
+
+        writer.write_line("function %s() {" % name)
+        writer.indent()
+
+        writer.write_code("/*\nInputs: %r\nOutputs: %r\nOverwrites: %r\n*/" % (
+            list(self.uses), list(liveness.results), list(self.overwrites)
+        ))
+        for line in code.declarations():
+            writer.write_line(line)
+
+        has_jumps = any(
+            block.start_addr in jump_targets for block in self.cfg.blocks
+        )
+
+        if has_jumps and analyzer.structure_control_flow:
+            try:
+                statements = RoutineStructurer(self.cfg, instructions_by_address, code).structure()
+            except IrreducibleControlFlow as e:
+                analyzer.log("Using pc dispatch for routine 0x%04x: %s" % (self.start_addr, e))
+            else:
+                if analyzer.optimise_loops:
+                    statements = optimise_loops(statements)
+                write_statements(writer, statements, get_used_labels(statements))
+                writer.dedent()
+                writer.write_line("}")
+                return
+
+        if has_jumps:
+            writer.write_line("var pc = 0x%04x;" % self.start_addr)
+            writer.write_line("while (true) {")
+            writer.indent()
+            writer.write_line("switch (pc) {")
+            writer.indent()
+
+            for block in self.cfg.blocks:
+                if block.start_addr in jump_targets or block.start_addr == self.start_addr:
+                    writer.write_line("case 0x%04x:" % block.start_addr)
+
+                writer.indent()
+                for addr in block.addresses:
+                    instruction_code = code.code_for_address(addr)
+                    if instruction_code:
+                        writer.write_code(instruction_code)
+                writer.dedent()
+
+            writer.dedent()
+            writer.write_line("}")
+            writer.dedent()
+            writer.write_line("}")
+        else:
+            for block in self.cfg.blocks:
+                for addr in block.addresses:
+                    instruction_code = code.code_for_address(addr)
+                    if instruction_code:
+                        writer.write_code(instruction_code)
+
+        writer.dedent()
+        writer.write_line("}")
+
+
+class Analyzer(object):
+    # One analysis of one memory image: load code and data into memory, then analyse from a
+    # list of entry points, then emit Javascript for the routines found. All state is held
+    # on the instance, so any number of analyses can exist side by side.
+
+    def __init__(
+        self, verbose=False, cache=None, structure_control_flow=True, promote_registers=True,
+        lazy_flags=True, inline_threshold=8, fold_constants=True, memory_variables=False,
+        self_modifying_code=True, ay_ports=False, promote_stack=True, clone_budget=0,
+        optimise_loops=True
+    ):
+        self.verbose = verbose
+        # an AnalysisCache to reuse results from, or None
+        self.cache = cache
+        # if False, routines with internal jumps are always emitted as a pc dispatch loop
+        self.structure_control_flow = structure_control_flow
+        # if False, registers are always accessed through the shared r / rp buffer rather
+        # than held in locals
+        self.promote_registers = promote_registers
+        # if False, flags are assigned as soon as they are produced rather than where
+        # they are needed
+        self.lazy_flags = lazy_flags
+        # the largest routine (in instructions, not counting its RET) to inline at its
+        # call sites; 0 to inline nothing
+        self.inline_threshold = inline_threshold
+        # if False, values of locals that are known at compile time are not substituted
+        # where they are read
+        self.fold_constants = fold_constants
+        # if True, memory only accessed at fixed addresses is held in Javascript variables
+        # rather than mem, on the assumption that pointers read from memory never point
+        # there (and so the host cannot see or set it through mem either)
+        self.memory_variables = memory_variables
+        # if False, operands are always taken from the memory image as loaded, even where
+        # the code writes to them
+        self.self_modifying_code = self_modifying_code
+        # if True, values sent to ports known at compile time to be the AY's (as the 128K
+        # Spectrum decodes them) are stored in the host's AY state (selectedAYRegister /
+        # ayRegisters) directly rather than passed to out()
+        self.ay_ports = ay_ports
+        # if False, pushes and pops always go through the stack in mem, even in routines
+        # where each POP can be matched with the PUSH whose value it takes back
+        self.promote_stack = promote_stack
+        # the most instructions to add in clones of routines specialised to the results
+        # that their callers use; 0 to clone nothing
+        self.clone_budget = clone_budget
+        # if False, structured loops are written as found, rather than counted loops as
+        # for loops and with invariant expressions evaluated ahead of them
+        self.optimise_loops = optimise_loops
+        self.mem = bytearray(0x10000)
+        # addresses of memory that the code never writes, such as a tune's data
+        self.read_only = set()
+        self.reset()
+
+    def reset(self):
+        self.instructions_by_address = InstructionTable(self.mem)
+        self.origins_by_address = defaultdict(set)
+        self.destinations_by_address = defaultdict(set)
+        self.jump_targets = set()
+        self.routines = {}
+        self.blocks_by_address = {}
+        self.live_in_by_address = {}
+        self.routine_live_in_by_address = {}
+        # routine address -> Precomputation, for routines run at compile time
+        self.precomputed = {}
+        # PointerAnalysis results, by the entry points and modified operands they are for
+        self.pointer_analyses = {}
+        # routine address -> StackAnalysis
+        self.stack_analyses = {}
+        # RoutineSummaries of the analysis, once asked for
+        self.routine_summaries = None
+
+    def log(self, *args):
+        if self.verbose:
+            print(*args)
+
+    def load_bytes(self, data, addr):
+        # copy data into memory at addr; return the address following it
+        for byte in bytearray(data):
+            self.mem[addr & 0xffff] = byte
+            addr += 1
+        return addr
+
+    def load(self, filename, addr):
+        with open(filename, 'rb') as f:
+            return self.load_bytes(f.read(), addr)
+
+    def mark_read_only(self, start, end):
+        # Declare that the code never writes to memory from start up to (not including) end,
+        # such as a tune that it plays: reads from there at addresses known at compile time
+        # are replaced with the values loaded. Checked against the code on emitting it, as
+        # far as the pointer analysis can tell: the stack is the caller's to keep clear
+        self.read_only.update(addr & 0xffff for addr in range(start, end))
+
+    def get_constant_memory(self):
+        # address -> value, for the memory marked read-only
+        return dict((addr, self.mem[addr]) for addr in self.read_only)
+
+    def get_pointer_analysis(self, entry_points):
+        # return a PointerAnalysis for the code called from outside at entry_points, as it
+        # now decodes
+        modified_operands = self.instructions_by_address.modified_operands
+        key = (tuple(sorted(entry_points)), tuple(sorted(modified_operands.items())))
+        if key not in self.pointer_analyses:
+            self.pointer_analyses[key] = PointerAnalysis(self, entry_points)
+        return self.pointer_analyses[key]
+
+    def check_read_only(self, entry_points):
+        # raise an exception if the code called from outside at entry_points may write to
+        # memory marked read-only. A write through a pointer read from memory (DATA) may
+        # be to anywhere, so counts as one - other than to the stack, which the caller
+        # must keep clear of the read-only memory
+        if not self.read_only:
+            return
+        pointers = self.get_pointer_analysis(entry_points)
+        instructions_by_address = self.instructions_by_address
+        for addr, accesses in sorted(pointers.accesses_by_address.items()):
+            if uses_stack(instructions_by_address.get_class(addr)):
+                continue
+            for is_write, address in accesses:
+                if is_write and (address is ANY or address is DATA or address in self.read_only):
+                    raise ValueError(
+                        "%s may write to read-only memory" % instructions_by_address[addr]
+                    )
+
+    def trace_routine(self, start_addr, predecoded):
+        # Follow the control flow from start_addr, as given by predecoded (a PreDecode of
+        # the memory image), decoding each instruction reached into the instruction table
+        instructions_by_address = self.instructions_by_address
+        origins_by_address = self.origins_by_address
+        destinations_by_address = self.destinations_by_address
+        routines = self.routines
+
+        addresses_to_trace = [start_addr]
+        visited_addresses = set()
+        self.log("Tracing from %04x..." % start_addr)
+
+        routine = Routine(start_addr)
+        routines[start_addr] = routine
+
+        while addresses_to_trace:
+            addr = addresses_to_trace.pop()
+            if addr in visited_addresses:
+                # scheduled more than once (e.g. as both a return address and a static
+                # destination) - only record it in the routine once
+                continue
+            visited_addresses.add(addr)
+
+            is_previously_traced = addr in instructions_by_address
+            if not is_previously_traced:
+                instructions_by_address.decode(addr)
+
+            routine.addresses.append(addr)
+            if self.verbose:
+                self.log(instructions_by_address[addr])
+
+            if predecoded.is_routine_exit(addr):
+                # the stack is checked for balance once the control flow is known; see
+                # get_stack_analysis
+                routine.exit_points.add(addr)
+
+            jump_target = predecoded.jump_target(addr)
+            if jump_target is not None:
+                self.jump_targets.add(jump_target)
+
+            call_target = predecoded.call_target(addr)
+
+            for dest in predecoded.static_destination_addresses(addr):
+                if not is_previously_traced:
+                    destinations_by_address[addr].add(dest)
+                    origins_by_address[dest].add(addr)
+
+                if dest in visited_addresses:
+                    # already traced
+                    pass
+                elif dest in addresses_to_trace:
+                    # already scheduled to be traced
+                    pass
+                elif dest == call_target:
+                    # special case - follow calls recursively
+                    pass
+                else:
+                    addresses_to_trace.append(dest)
+
+            if call_target is not None:
+                routine.calls.append(call_target)
+
+                if call_target in routines:
+                    subroutine = routines[call_target]
+                    if not subroutine.is_traced:
+                        raise Exception("Recursive call detected!")
+                    self.log("Using previously-completed trace of routine from %04x." % call_target)
+                else:
+                    subroutine = self.trace_routine(call_target, predecoded)
+
+                return_address = predecoded.return_address(addr)
+                if subroutine.exit_points:
+                    for exit_point in subroutine.exit_points:
+                        # mark each exit instruction as having this call's return address
+                        # as a destination
+                        destinations_by_address[exit_point].add(return_address)
+                        # mark the return address as being arrivable from each exit point
+                        origins_by_address[return_address].add(exit_point)
+
+                    # continue tracing from the return address
+                    addresses_to_trace.append(return_address)
+                else:
+                    self.log("Subroutine does not exit; not continuing to trace from its return address")
+
+        routine.is_traced = True
+        routine.addresses.sort()
+        self.log("Completed trace from %04x." % start_addr)
+        return routine
+
+    def get_candidate_entry_points(self, start=0x0000, end=0x10000):
+        # Addresses called from instructions that would decode between start and end (not
+        # including end), most called first: likely entry points to try tracing from, for
+        # code whose entry points are not known
+        return PreDecode(self.mem).candidate_entry_points(range(start, end))
+
+    def trace(self, entry_points):
+        predecoded = PreDecode(self.mem)
+        for addr in entry_points:
+            if addr not in self.routines:
+                self.trace_routine(addr, predecoded)
+
+        self.log("Trace complete.")
+
+    def build_control_flow(self):
+        self.blocks_by_address = find_basic_blocks(
+            self.instructions_by_address, self.origins_by_address, self.destinations_by_address,
+            self.routines, self.jump_targets
+        )
+        for routine in self.routines.values():
+            routine.cfg = ControlFlowGraph(self.blocks_by_address[routine.start_addr])
+
+    # Backward liveness analysis over the basic blocks of the whole program, run to a fixpoint.
+    # successors_of(block) gives the blocks that control can pass to after that block.
+    # Returns a dict of block -> bitmask of the TRACKED_VALUES that are live on entry to it.
+    def solve_liveness(self, successors_of):
+        blocks = self.blocks_by_address.values()
+        successors = {}
+        predecessors = defaultdict(list)
+        for block in blocks:
+            successors[block] = successors_of(block)
+            for successor in successors[block]:
+                predecessors[successor].append(block)
+
+        live_in = dict((block, block.uses_mask) for block in blocks)
+        worklist = list(blocks)
+        queued = set(worklist)
+
+        while worklist:
+            block = worklist.pop()
+            queued.discard(block)
+
+            live_out = 0
+            for successor in successors[block]:
+                live_out |= live_in[successor]
+
+            new_live_in = block.uses_mask | (live_out & ~block.overwrites_mask)
+            if new_live_in != live_in[block]:
+                live_in[block] = new_live_in
+                for predecessor in predecessors[block]:
+                    if predecessor not in queued:
+                        queued.add(predecessor)
+                        worklist.append(predecessor)
+
+        return live_in
+
+    def analyse_liveness(self):
+        instructions_by_address = self.instructions_by_address
+        blocks_by_address = self.blocks_by_address
+        uses_masks = instructions_by_address.uses_masks
+        overwrites_masks = instructions_by_address.overwrites_masks
+
+        for block in blocks_by_address.values():
+            uses = 0
+            overwrites = 0
+            for addr in block.addresses:
+                uses |= uses_masks[addr] & ~overwrites
+                overwrites |= overwrites_masks[addr]
+            block.uses_mask = uses
+            block.overwrites_mask = overwrites
+
+        # values live on entry to each block, following routine exits to every return
+        # address that they can go to
+        live_in_by_block = self.solve_liveness(lambda block: block.destinations)
+
+        # propagate back through each block to find the values live on entry to each instruction
+        self.live_in_by_address = live_in_by_address = {}
+        for block in blocks_by_address.values():
+            live = 0
+            for successor in block.destinations:
+                live |= live_in_by_block[successor]
+            for addr in reversed(block.addresses):
+                live = uses_masks[addr] | (live & ~overwrites_masks[addr])
+                live_in_by_address[addr] = live
+
+        # values live on entry to each block within the routine being executed - i.e.
+        # not following routine exits beyond their statically known destinations
+        routine_live_in_by_block = self.solve_liveness(lambda block: [
+            blocks_by_address[dest]
+            for dest in instructions_by_address.static_destination_addresses(block.last_addr)
+            if dest in blocks_by_address
+        ])
+        self.routine_live_in_by_address = dict(
+            (block.start_addr, live) for block, live in routine_live_in_by_block.items()
+        )
+
+    def get_live_values(self, addresses):
+        mask = 0
+        for addr in addresses:
+            mask |= self.live_in_by_address.get(addr, 0)
+        return mask
+
+    def get_used_results_mask(self, addr):
+        live_out = self.get_live_values(self.destinations_by_address[addr])
+        return self.instructions_by_address.overwrites_masks[addr] & live_out
+
+    def get_values_written_by_routine(self, routine):
+        mask = 0
+        for addr in routine.addresses:
+            mask |= self.instructions_by_address.overwrites_masks[addr]
+        return mask_to_values(mask)
+
+    def get_values_used_by_routine(self, routine):
+        return mask_to_values(self.routine_live_in_by_address[routine.start_addr])
+
+    def get_live_after_routine(self, routine):
+        # get the destinations of all exit points of this routine
+        destinations = set()
+        for addr in routine.exit_points:
+            static_destinations = self.instructions_by_address.static_destination_addresses(addr)
+            for dest in self.destinations_by_address[addr]:
+                if dest not in static_destinations:
+                    destinations.add(dest)
+
+        return self.get_live_values(destinations)
+
+    def get_results_from_routine(self, routine):
+        return mask_to_values(
+            values_to_mask(routine.overwrites) & self.get_live_after_routine(routine)
+        )
+
+    def get_analysis_state(self):
+        return {
+            'instructions_by_address': self.instructions_by_address,
+            'origins_by_address': self.origins_by_address,
+            'destinations_by_address': self.destinations_by_address,
+            'jump_targets': self.jump_targets,
+            'routines': self.routines,
+            'blocks_by_address': self.blocks_by_address,
+            'live_in_by_address': self.live_in_by_address,
+            'routine_live_in_by_address': self.routine_live_in_by_address,
+        }
+
+    def restore_analysis_state(self, state):
+        self.instructions_by_address = state['instructions_by_address']
+        self.origins_by_address = state['origins_by_address']
+        self.destinations_by_address = state['destinations_by_address']
+        self.jump_targets = state['jump_targets']
+        self.routines = state['routines']
+        self.blocks_by_address = state['blocks_by_address']
+        self.live_in_by_address = state['live_in_by_address']
+        self.routine_live_in_by_address = state['routine_live_in_by_address']
+        # decode instructions for code generation from the current memory image
+        self.instructions_by_address.mem = self.mem
+
+    def analyse(self, entry_points):
+        if self.cache is not None:
+            cached_state = self.cache.load(self.mem, entry_points)
+            if cached_state is not None:
+                self.log("Using cached analysis results.")
+                self.restore_analysis_state(cached_state)
+                return
+
+        self.trace(entry_points)
+        self.build_control_flow()
+        self.analyse_liveness()
+
+        instructions_by_address = self.instructions_by_address
+        for addr in instructions_by_address:
+            instructions_by_address.used_results_masks[addr] = self.get_used_results_mask(addr)
+
+            if self.verbose:
+                instruction = instructions_by_address[addr]
+                origins = ','.join(["%04x" % origin for origin in self.origins_by_address[addr]])
+                destinations = ','.join(["%04x" % dest for dest in self.destinations_by_address[addr]])
+                self.log("%s - reachable from: %s, goes to: %s" % (instruction, origins, destinations))
+                used_results = mask_to_values(instructions_by_address.used_results_masks[addr])
+                overwrites = mask_to_values(instructions_by_address.overwrites_masks[addr])
+                self.log("Needs to evaluate", used_results, 'from', overwrites)
+
+        self.log("Routines:")
+
+        for addr, routine in sorted(self.routines.items()):
+            routine.uses = self.get_values_used_by_routine(routine)
+            routine.overwrites = self.get_values_written_by_routine(routine)
+            routine.results = self.get_results_from_routine(routine)
+
+            calls = ', '.join(["0x%04x" % dest for dest in routine.calls])
+            self.log("0x%04x - %d instructions, calls %s, uses %r, overwrites %r, returns %r" % (
+                addr, len(routine.addresses), calls, routine.uses, routine.overwrites, routine.results
+            ))
+            stack = self.get_stack_analysis(addr)
+            if not stack.is_balanced:
+                self.log("0x%04x - stack not balanced: %s" % (addr, stack.problem))
+
+        if self.cache is not None:
+            self.cache.save(
+                self.mem, entry_points, instructions_by_address, self.get_analysis_state()
+            )
+
+    def precompute(self, addr, stack_pointer=0x0000, registers=None):
+        # Run the (analysed) routine at addr at compile time, with SP set to stack_pointer
+        # and the registers it reads set as given by registers (see Precomputation),
+        # leaving memory as it leaves it. The routine is then emitted as code that sets up
+        # that state directly, and other code as it runs from that state.
+        precomputation = Precomputation(self, addr, stack_pointer, registers)
+        instructions_by_address = self.instructions_by_address
+        changed = set()
+        for address, value in precomputation.changes:
+            self.mem[address] = value
+            changed.add(address)
+
+        for instruction_addr in instructions_by_address:
+            length = instructions_by_address.lengths[instruction_addr]
+            if changed.isdisjoint((instruction_addr + i) & 0xffff for i in range(length)):
+                continue
+            # a modified operand; the analysis still holds as long as it is not an
+            # opcode, or a jump or call target
+            cls = instructions_by_address.get_class(instruction_addr)
+            jump_target = instructions_by_address.jump_target(instruction_addr)
+            call_target = instructions_by_address.call_target(instruction_addr)
+            instructions_by_address.decode(instruction_addr)
+            if (
+                instructions_by_address.get_class(instruction_addr) is not cls
+                or instructions_by_address.jump_target(instruction_addr) != jump_target
+                or instructions_by_address.call_target(instruction_addr) != call_target
+            ):
+                raise NotImplementedError(
+                    "r%04x modifies the opcode or target of %s"
+                    % (addr, instructions_by_address[instruction_addr])
+                )
+
+        self.precomputed[addr] = precomputation
+        self.pointer_analyses = {}
+        self.log("Precomputed r%04x: %d bytes of memory, %d port writes" % (
+            addr, len(precomputation.changes), len(precomputation.outs)
+        ))
+
+    def get_routines_in_dependency_order(self, addrs, inliner=None, emitted_only=False):
+        # Yield the routines at the given addresses and all routines that they call, with
+        # each routine following every routine that it calls. Routines that the inliner
+        # has inlined everywhere are left out, unless asked for by address; if emitted_only
+        # is True, so are routines only called by precomputed ones
+        def get_calls(routine):
+            if emitted_only and routine.start_addr in self.precomputed:
+                return iter([])
+            return iter(routine.calls)
+
+        emitted = set()
+        for addr in addrs:
+            if addr in emitted:
+                continue
+            emitted.add(addr)
+            stack = [(self.routines[addr], get_calls(self.routines[addr]))]
+            while stack:
+                routine, calls = stack[-1]
+                for call_addr in calls:
+                    if call_addr not in emitted and (
+                        inliner is None or inliner.is_emitted(call_addr)
+                    ):
+                        emitted.add(call_addr)
+                        subroutine = self.routines[call_addr]
+                        stack.append((subroutine, get_calls(subroutine)))
+                        break
+                else:
+                    stack.pop()
+                    yield routine
+
+    def find_self_modifying_code(self, entry_points):
+        # Tell the instruction table which operands are written by the code called from
+        # outside at entry_points, so that they are read from memory; return lines
+        # describing them
+        instructions_by_address = self.instructions_by_address
+        if self.self_modifying_code:
+            operands, unhandled = find_modified_instructions(self, entry_points)
+        else:
+            operands, unhandled = {}, []
+        instructions_by_address.modified_operands = operands
+        return [
+            "Modified operand: %s" % instructions_by_address[addr] for addr in sorted(operands)
+        ] + [
+            "Modified instruction (not handled): %s" % instructions_by_address[addr]
+            for addr in sorted(unhandled)
+        ]
+
+    def get_inliner(self):
+        # return an Inliner for the routines to inline, or None if nothing is to be inlined
+        if self.inline_threshold:
+            return Inliner(self, self.inline_threshold)
+        return None
+
+    def get_register_promoter(self, entry_points, inliner=None):
+        # return a RegisterPromoter for emitting code called from outside at entry_points,
+        # or None if registers are not to be promoted
+        if self.promote_registers:
+            return RegisterPromoter(self, entry_points, inliner)
+        return None
+
+    def get_clones(self, routines, inliner=None):
+        # return the Clones to emit along with the given routines, or None if routines
+        # are not to be cloned
+        if self.clone_budget:
+            return Clones(self, routines, inliner, self.clone_budget)
+        return None
+
+    def get_routine_summaries(self):
+        # return the RoutineSummaries of the (analysed) routines
+        if self.routine_summaries is None:
+            self.routine_summaries = RoutineSummaries(self)
+        return self.routine_summaries
+
+    def get_stack_analysis(self, addr):
+        # return the StackAnalysis of the (analysed) routine at addr
+        if addr not in self.stack_analyses:
+            self.stack_analyses[addr] = StackAnalysis(self, self.routines[addr])
+        return self.stack_analyses[addr]
+
+    def get_memory_variables(self, entry_points):
+        # return the MemoryVariables for code called from outside at entry_points, or None
+        # if memory is not to be promoted
+        if self.memory_variables:
+            return MemoryVariables(self, entry_points)
+        return None
+
+    def get_ay_register_loops(self, entry_points):
+        # return the AYRegisterLoops for code called from outside at entry_points, or None
+        # if AY ports are not to be written directly
+        if self.ay_ports:
+            return AYRegisterLoops(self, entry_points)
+        return None
+
+    def get_flag_table_declarations(self, addrs):
+        # Definitions of the flag tables that the code for the routines at the given
+        # addresses, and all routines that they call, looks flags up in
+        code = []
+        for routine in self.get_routines_in_dependency_order(addrs, emitted_only=True):
+            if routine.start_addr in self.precomputed:
+                continue
+            for block in routine.cfg.blocks:
+                for addr in block.addresses:
+                    try:
+                        code.append(self.instructions_by_address[addr].to_javascript() or '')
+                    except NotImplementedError:
+                        # reported when the routine is written
+                        pass
+        return flag_table_declarations('\n'.join(code))
+
+    def write_javascript(self, addrs, stream):
+        # Write the Javascript for the routines at the given addresses, and all routines
+        # that they call, to stream - each routine being written as soon as it is generated
+        writer = JavascriptWriter(stream)
+        # precomputed routines have no code to analyse
+        entry_points = [addr for addr in addrs if addr not in self.precomputed]
+        report = self.find_self_modifying_code(entry_points)
+        self.check_read_only(entry_points)
+        for line in report:
+            self.log(line)
+        if report:
+            writer.write_code("/*\n%s\n*/" % '\n'.join(report))
+            writer.write_line()
+
+        inliner = self.get_inliner()
+        if inliner is not None:
+            report = inliner.report()
+            for line in report:
+                self.log(line)
+            if report:
+                writer.write_code("/*\n%s\n*/" % '\n'.join(report))
+                writer.write_line()
+
+        memory_variables = self.get_memory_variables(entry_points)
+        if memory_variables:
+            report = memory_variables.report()
+            for line in report:
+                self.log(line)
+            writer.write_code("/*\n%s\n*/" % '\n'.join(report))
+            for line in memory_variables.declarations():
+                writer.write_line(line)
+            writer.write_line()
+
+        ay_register_loops = self.get_ay_register_loops(entry_points)
+        if ay_register_loops is not None:
+            report = ay_register_loops.report()
+            for line in report:
+                self.log(line)
+            if report:
+                writer.write_code("/*\n%s\n*/" % '\n'.join(report))
+                writer.write_line()
+
+        declarations = self.get_flag_table_declarations(addrs)
+        for line in declarations:
+            writer.write_line(line)
+        if declarations:
+            writer.write_line()
+
+        routines = list(self.get_routines_in_dependency_order(addrs, inliner, emitted_only=True))
+        clones = self.get_clones(routines, inliner)
+        if clones is not None:
+            report = clones.report()
+            for line in report:
+                self.log(line)
+            if report:
+                writer.write_code("/*\n%s\n*/" % '\n'.join(report))
+                writer.write_line()
+
+        promoter = self.get_register_promoter(entry_points, inliner)
+        for routine in routines:
+            routine.write_javascript(
+                writer, self, promoter, inliner, memory_variables, ay_register_loops, clones
+            )
+            writer.write_line()
+            if clones is not None:
+                for clone in clones.get_clones(routine.start_addr):
+                    clone.write_javascript(
+                        writer, self, promoter, inliner, memory_variables, ay_register_loops,
+                        clones
+                    )
+                    writer.write_line()
+
+    def emit(self, addrs):
+        # Return the Javascript for the routines at the given addresses and all routines
+        # that they call, as a string
+        out = StringIO()
+        self.write_javascript(addrs, out)
+        return out.getvalue()
@@ -0,0 +1,193 @@
+# Compile many player / tune combinations in parallel.
+#
+#   python batch.py manifest.json output_dir [--jobs N] [--no-cache]
+#
+# The manifest is a JSON list of jobs, each of the form:
+#
+#   {
+#       "name": "shatners_bassoon",
+#       "player": "stc_player.bin", "player_addr": "0x4000",
+#       "data": "testfiles/shatners_bassoon.stc", "data_addr": "0x443c",
+#       "entry_points": ["0x4000", "0x4006"],
+#       "emit": ["0x4000", "0x4006"]
+#   }
+#
+# Addresses may be given as numbers or as strings in any base Python understands.
+# "data" and "data_addr" are optional; if data_addr is omitted, the data is loaded
+# immediately after the player. "emit" defaults to the entry points. An optional
+# "precompute" lists routines (such as "0x4000", the init routine) to run at compile time,
+# with SP set to "stack_addr" (default 0x0000) and any other registers that they read given
+# by "precompute_registers" (such as {"HL": "0x443c"}); these are emitted as code setting up
+# the state that they leave, specialising the rest of the player to the tune. If "read_only"
+# is true, the data is taken never to be written, so that reads from it fold to constants;
+# the player is checked for writes that may reach it, other than to the stack, which must
+# not overlap it.
+# If "ay_ports" is true, writes to the AY's ports set the host's selectedAYRegister /
+# ayRegisters directly wherever the port is known at compile time. "clone_budget" is the
+# most instructions to add in clones of routines specialised to their call sites (default 0).
+# Paths are relative to the manifest's directory.
+#
+# Jobs run in a process pool, one worker per core by default. Each job streams its
+# Javascript to output_dir/<name>.js, and a status line is printed as it finishes; a
+# failing job is reported, leaves no output file and does not stop the others. A summary
+# of all jobs is written to output_dir/report.json, and the exit status is non-zero if any
+# job failed.
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import json
+import os
+import sys
+import time
+import traceback
+
+from analyzer import Analyzer
+from cache import AnalysisCache
+
+
+def parse_addr(value):
+    if isinstance(value, int):
+        return value
+    return int(value, 0)
+
+
+def read_manifest(filename):
+    base_dir = os.path.dirname(os.path.abspath(filename))
+    with open(filename) as f:
+        entries = json.load(f)
+
+    jobs = []
+    names = set()
+    for entry in entries:
+        entry_points = [parse_addr(addr) for addr in entry['entry_points']]
+        job = {
+            'name': entry['name'],
+            'player': os.path.join(base_dir, entry['player']),
+            'player_addr': parse_addr(entry['player_addr']),
+            'data': os.path.join(base_dir, entry['data']) if entry.get('data') else None,
+            'data_addr': parse_addr(entry['data_addr']) if entry.get('data_addr') is not None else None,
+            'entry_points': entry_points,
+            'emit': [parse_addr(addr) for addr in entry.get('emit', entry_points)],
+            'precompute': [parse_addr(addr) for addr in entry.get('precompute', [])],
+            'stack_addr': parse_addr(entry.get('stack_addr', 0)),
+            'precompute_registers': dict(
+                (name, parse_addr(value))
+                for name, value in entry.get('precompute_registers', {}).items()
+            ),
+            'read_only': bool(entry.get('read_only', False)),
+            'ay_ports': bool(entry.get('ay_ports', False)),
+            'clone_budget': int(entry.get('clone_budget', 0)),
+        }
+        if job['name'] in names:
+            raise ValueError("Duplicate job name in manifest: %s" % job['name'])
+        names.add(job['name'])
+        jobs.append(job)
+
+    return jobs
+
+
+def run_job(job, output_dir, use_cache):
+    # Runs in a worker process, streaming the Javascript straight to the job's output file.
+    # Returns a dict describing the outcome rather than raising, so that one failure does
+    # not affect the reporting of other jobs.
+    start_time = time.time()
+    output = "%s.js" % job['name']
+    output_path = os.path.join(output_dir, output)
+    temp_path = "%s.%d.tmp" % (output_path, os.getpid())
+    result = {'name': job['name'], 'status': 'ok', 'error': None, 'output': output}
+    try:
+        analyzer = Analyzer(
+            cache=AnalysisCache() if use_cache else None, ay_ports=job['ay_ports'],
+            clone_budget=job['clone_budget']
+        )
+        data_addr = analyzer.load(job['player'], job['player_addr'])
+        if job['data'] is not None:
+            if job['data_addr'] is not None:
+                data_addr = job['data_addr']
+            data_end = analyzer.load(job['data'], data_addr)
+            if job['read_only']:
+                analyzer.mark_read_only(data_addr, data_end)
+
+        analyzer.analyse(job['entry_points'])
+        for addr in job['precompute']:
+            analyzer.precompute(addr, job['stack_addr'], job['precompute_registers'])
+        with open(temp_path, 'w') as f:
+            analyzer.write_javascript(job['emit'], f)
+        os.replace(temp_path, output_path)
+    except Exception:
+        result['status'] = 'failed'
+        result['error'] = traceback.format_exc()
+        result['output'] = None
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    result['seconds'] = time.time() - start_time
+    return result
+
+
+def run_batch(jobs, output_dir, max_workers=None, use_cache=True):
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+
+    start_time = time.time()
+    report = []
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = dict(
+            (executor.submit(run_job, job, output_dir, use_cache), job) for job in jobs
+        )
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                result = future.result()
+            except Exception:
+                # the worker process itself failed (e.g. was killed)
+                result = {
+                    'name': job['name'], 'status': 'failed', 'seconds': None,
+                    'error': traceback.format_exc(), 'output': None,
+                }
+
+            seconds = "%.2fs" % result['seconds'] if result['seconds'] is not None else "-"
+            print("%-6s %-40s %s" % (result['status'], job['name'], seconds))
+            if result['error']:
+                print(result['error'], file=sys.stderr)
+            sys.stdout.flush()
+
+            report.append(result)
+
+    # report in manifest order
+    order = dict((job['name'], i) for i, job in enumerate(jobs))
+    report.sort(key=lambda result: order[result['name']])
+
+    with open(os.path.join(output_dir, 'report.json'), 'w') as f:
+        json.dump({
+            'seconds': time.time() - start_time,
+            'jobs': report,
+        }, f, indent=4)
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile player / tune combinations in parallel")
+    parser.add_argument('manifest', help="JSON manifest of jobs")
+    parser.add_argument('output_dir', help="directory to write Javascript and report.json to")
+    parser.add_argument(
+        '--jobs', '-j', type=int, default=None,
+        help="number of worker processes (default: one per core)"
+    )
+    parser.add_argument(
+        '--no-cache', action='store_true', help="do not read or write cached analysis results"
+    )
+    args = parser.parse_args()
+
+    jobs = read_manifest(args.manifest)
+    report = run_batch(jobs, args.output_dir, max_workers=args.jobs, use_cache=not args.no_cache)
+
+    failures = [result for result in report if result['status'] != 'ok']
+    print("%d jobs, %d failed" % (len(report), len(failures)))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
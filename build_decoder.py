@@ -0,0 +1,264 @@
+# Generate decoder.py from the INSTRUCTIONS_BY_*_OPCODE tables in instructions.py.
+#
+# The generated module replaces the dicts of functools.partial objects with flat 256-entry
+# tuples indexed by opcode, one per opcode table (and one per index register for the DD / FD
+# tables). Each entry records what analysis needs to know about the instruction - its
+# class, length, flow control and uses / overwrites masks, and where its parameters are -
+# so that decode_fields can fill in an InstructionTable without building an Instruction
+# object. Instruction objects themselves come from instructions.get_instruction.
+#
+# Run this whenever the opcode tables or the instruction definitions change:
+#
+#   python build_decoder.py
+
+from io import StringIO
+import os
+
+from instructions import (
+    INSTRUCTION_SET_VERSION, Instruction,
+    InstructionWithByteParam, ExtendedInstructionWithByteParam,
+    InstructionWithOffsetParam, ExtendedInstructionWithOffsetParam,
+    DoubleExtendedInstructionWithOffsetParam, ExtendedInstructionWithOffsetAndByteParams,
+    InstructionWithWordParam, ExtendedInstructionWithWordParam,
+    INSTRUCTIONS_BY_OPCODE, INSTRUCTIONS_BY_CB_OPCODE, INSTRUCTIONS_BY_DDFD_OPCODE,
+    INSTRUCTIONS_BY_DDFDCB_OPCODE, INSTRUCTIONS_BY_ED_OPCODE,
+    get_cb_instruction, get_dd_instruction, get_ddfdcb_instruction, get_ed_instruction,
+    get_fd_instruction,
+)
+
+
+OUTPUT_FILENAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'decoder.py')
+
+# (name, opcode table, position of the opcode byte within the instruction,
+#  arguments passed to every constructor in the table ahead of mem and addr)
+OPCODE_TABLES = [
+    ('main', INSTRUCTIONS_BY_OPCODE, 0, ()),
+    ('cb', INSTRUCTIONS_BY_CB_OPCODE, 1, ()),
+    ('ed', INSTRUCTIONS_BY_ED_OPCODE, 1, ()),
+    ('dd', INSTRUCTIONS_BY_DDFD_OPCODE, 1, ('IX',)),
+    ('ddcb', INSTRUCTIONS_BY_DDFDCB_OPCODE, 3, ('IX',)),
+    ('fd', INSTRUCTIONS_BY_DDFD_OPCODE, 1, ('IY',)),
+    ('fdcb', INSTRUCTIONS_BY_DDFDCB_OPCODE, 3, ('IY',)),
+]
+
+# the opcode table that each prefix handler dispatches to, from the table of each name
+PREFIX_TABLES = {
+    get_cb_instruction: {'main': 'cb'},
+    get_ed_instruction: {'main': 'ed'},
+    get_dd_instruction: {'main': 'dd'},
+    get_fd_instruction: {'main': 'fd'},
+    get_ddfdcb_instruction: {'dd': 'ddcb', 'fd': 'fdcb'},
+}
+
+# where each class of instruction finds its parameters, as offsets from the instruction
+# address: (byte param, word param, offset param)
+PARAM_POSITIONS = [
+    (InstructionWithByteParam, (1, None, None)),
+    (ExtendedInstructionWithByteParam, (2, None, None)),
+    (InstructionWithOffsetParam, (None, None, 1)),
+    (ExtendedInstructionWithOffsetParam, (None, None, 2)),
+    (DoubleExtendedInstructionWithOffsetParam, (None, None, 2)),
+    (ExtendedInstructionWithOffsetAndByteParams, (3, None, 2)),
+    (InstructionWithWordParam, (None, 1, None)),
+    (ExtendedInstructionWithWordParam, (None, 2, None)),
+]
+
+PROBE_ADDR = 0x8000
+
+# kinds of static target, as recorded in the opcode tables
+TARGET_NONE = 0
+TARGET_JUMP_WORD = 1
+TARGET_JUMP_OFFSET = 2
+TARGET_CALL_WORD = 3
+
+
+def get_param_positions(cls):
+    for base, positions in PARAM_POSITIONS:
+        if issubclass(cls, base):
+            return positions
+    return (None, None, None)
+
+
+def split_constructor(entry):
+    # return the instruction class and the positional arguments bound to it
+    try:
+        return entry.func, entry.args
+    except AttributeError:
+        return entry, ()
+
+
+def probe(cls, args):
+    # Instantiate the instruction on a scratch memory to find out the properties that do
+    # not depend on its parameters. The parameter bytes are chosen so that jump targets
+    # never coincide with the following instruction.
+    mem = bytearray(0x10000)
+    mem[PROBE_ADDR + 1:PROBE_ADDR + 4] = b'\x34\x35\x36'
+    instruction = cls(*(args + (mem, PROBE_ADDR)))
+    next_addr = (PROBE_ADDR + instruction.length) & 0xffff
+    return instruction, next_addr in instruction.static_destination_addresses
+
+
+def get_target_kind(instruction):
+    # Classify how the instruction's static jump / call target is found: a word target is
+    # its word parameter, and an offset target is relative to the following instruction.
+    # predecode.py also relies on either being the last bytes of the instruction.
+    cls = type(instruction)
+    byte_pos, word_pos, offset_pos = get_param_positions(cls)
+
+    if cls.call_target is not Instruction.call_target:
+        kind = TARGET_CALL_WORD
+        target = word_pos is not None and instruction.param
+    elif cls.jump_target is Instruction.jump_target:
+        return TARGET_NONE
+    elif word_pos is not None:
+        kind = TARGET_JUMP_WORD
+        target = instruction.param
+    else:
+        kind = TARGET_JUMP_OFFSET
+        target = offset_pos is not None and (
+            (PROBE_ADDR + instruction.length + instruction.offset) & 0xffff
+        )
+
+    param_pos = offset_pos if kind == TARGET_JUMP_OFFSET else word_pos
+    if (
+        target != (instruction.call_target if kind == TARGET_CALL_WORD else instruction.jump_target)
+        or param_pos != instruction.length - (1 if kind == TARGET_JUMP_OFFSET else 2)
+    ):
+        raise Exception("Cannot describe the target of %s" % cls.__name__)
+    return kind
+
+
+def format_entry(cls, args):
+    # the decoder table entry for an instruction of class cls, constructed with args
+    instruction, falls_through = probe(cls, args)
+    byte_pos, word_pos, offset_pos = get_param_positions(cls)
+    return "(%s, %d, 0x%05x, 0x%05x, %r, %r, %r, %r, %r, %d)" % (
+        cls.__name__, instruction.length, instruction.uses_mask, instruction.overwrites_mask,
+        instruction.is_routine_exit, falls_through, byte_pos, word_pos, offset_pos,
+        get_target_kind(instruction),
+    )
+
+
+def write_table(out, table_name, table, args, opcode_positions):
+    out.write("FIELDS_%s = (\n" % table_name.upper())
+    nones = 0
+    for opcode in range(0x100):
+        entry = table.get(opcode)
+        if entry is None:
+            nones += 1
+            continue
+        if nones:
+            write_nones(out, nones)
+            nones = 0
+        if entry in PREFIX_TABLES:
+            child = PREFIX_TABLES[entry][table_name]
+            out.write("    (FIELDS_%s, %d),  # 0x%02x\n" % (
+                child.upper(), opcode_positions[child], opcode
+            ))
+        else:
+            cls, bound_args = split_constructor(entry)
+            out.write("    %s,  # 0x%02x\n" % (format_entry(cls, bound_args + args), opcode))
+    if nones:
+        write_nones(out, nones)
+    out.write(")\n\n")
+
+
+def write_nones(out, count):
+    while count:
+        n = min(count, 16)
+        out.write("    %s\n" % ' '.join(['None,'] * n))
+        count -= n
+
+
+def build():
+    out = StringIO()
+    class_names = set()
+
+    for table_name, table, opcode_pos, args in OPCODE_TABLES:
+        for entry in table.values():
+            if entry not in PREFIX_TABLES:
+                class_names.add(split_constructor(entry)[0].__name__)
+
+    out.write("# Generated by build_decoder.py from the opcode tables in instructions.py - do not edit.\n")
+    out.write("#\n")
+    out.write("# decode_fields(mem, addr) returns a tuple of\n")
+    out.write("#   (class, length, uses_mask, overwrites_mask, is_routine_exit, falls_through,\n")
+    out.write("#    param, offset, jump_target, call_target)\n")
+    out.write("# for the instruction at addr, without constructing an Instruction object.\n")
+    out.write("#\n")
+    out.write("# Each FIELDS_* table has an entry for every opcode: None if it is not recognised,\n")
+    out.write("# (table, position of its opcode byte) for a prefix, and otherwise\n")
+    out.write("#   (class, length, uses_mask, overwrites_mask, is_routine_exit, falls_through,\n")
+    out.write("#    byte param position, word param position, offset position, target kind)\n\n")
+
+    out.write("from instructions import (\n    INSTRUCTION_SET_VERSION,\n")
+    for name in sorted(class_names):
+        out.write("    %s,\n" % name)
+    out.write(")\n\n\n")
+
+    out.write("if INSTRUCTION_SET_VERSION != %d:\n" % INSTRUCTION_SET_VERSION)
+    out.write("    raise ImportError(\"decoder.py is out of date - regenerate it with build_decoder.py\")\n\n\n")
+
+    out.write("# kinds of static target\n")
+    out.write("TARGET_NONE = %d\n" % TARGET_NONE)
+    out.write("TARGET_JUMP_WORD = %d\n" % TARGET_JUMP_WORD)
+    out.write("TARGET_JUMP_OFFSET = %d\n" % TARGET_JUMP_OFFSET)
+    out.write("TARGET_CALL_WORD = %d\n\n" % TARGET_CALL_WORD)
+
+    # tables are written innermost first, so that each is defined before the tables whose
+    # prefixes refer to it
+    opcode_positions = dict(
+        (table_name, opcode_pos) for table_name, table, opcode_pos, args in OPCODE_TABLES
+    )
+    for table_name, table, opcode_pos, args in reversed(OPCODE_TABLES):
+        write_table(out, table_name, table, args, opcode_positions)
+
+    out.write("\n")
+    out.write("def raise_unrecognised(mem, addr, length):\n")
+    out.write("    raise Exception(\"Unrecognised opcode at 0x%04x: %s\" % (\n")
+    out.write("        addr, ' '.join('0x%02x' % mem[(addr + i) & 0xffff] for i in range(length))\n")
+    out.write("    ))\n\n\n")
+
+    out.write("def decode_fields(mem, addr):\n")
+    out.write("    entry = FIELDS_MAIN[mem[addr]]\n")
+    out.write("    opcode_pos = 0\n")
+    out.write("    while entry is not None and len(entry) == 2:\n")
+    out.write("        # a prefix\n")
+    out.write("        table, opcode_pos = entry\n")
+    out.write("        entry = table[mem[(addr + opcode_pos) & 0xffff]]\n")
+    out.write("    if entry is None:\n")
+    out.write("        raise_unrecognised(mem, addr, opcode_pos + 1)\n\n")
+    out.write("    (\n")
+    out.write("        cls, length, uses_mask, overwrites_mask, is_routine_exit, falls_through,\n")
+    out.write("        byte_pos, word_pos, offset_pos, target_kind\n")
+    out.write("    ) = entry\n")
+    out.write("    if byte_pos is not None:\n")
+    out.write("        param = mem[(addr + byte_pos) & 0xffff]\n")
+    out.write("    elif word_pos is not None:\n")
+    out.write("        param = mem[(addr + word_pos) & 0xffff] | (mem[(addr + word_pos + 1) & 0xffff] << 8)\n")
+    out.write("    else:\n")
+    out.write("        param = -1\n")
+    out.write("    if offset_pos is not None:\n")
+    out.write("        offset = mem[(addr + offset_pos) & 0xffff]\n")
+    out.write("        if offset >= 128:\n")
+    out.write("            offset -= 256\n")
+    out.write("    else:\n")
+    out.write("        offset = 0\n\n")
+    out.write("    jump_target = call_target = None\n")
+    out.write("    if target_kind == TARGET_JUMP_WORD:\n")
+    out.write("        jump_target = param\n")
+    out.write("    elif target_kind == TARGET_JUMP_OFFSET:\n")
+    out.write("        jump_target = (addr + length + offset) & 0xffff\n")
+    out.write("    elif target_kind == TARGET_CALL_WORD:\n")
+    out.write("        call_target = param\n\n")
+    out.write("    return (\n")
+    out.write("        cls, length, uses_mask, overwrites_mask, is_routine_exit, falls_through,\n")
+    out.write("        param, offset, jump_target, call_target\n")
+    out.write("    )\n")
+
+    with open(OUTPUT_FILENAME, 'w') as f:
+        f.write(out.getvalue())
+
+
+if __name__ == '__main__':
+    build()
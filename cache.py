@@ -0,0 +1,138 @@
+import hashlib
+import os
+import pickle
+
+from instructions import INSTRUCTION_SET_VERSION
+
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.alan_cache')
+
+# the keys of each entry of an index
+INDEX_ENTRY_KEYS = set(['mem_digest', 'code_ranges', 'code_digest', 'filename'])
+
+# Increment this whenever a change to the analysis state or the index entries would stop
+# older cache files from loading as they should (INSTRUCTION_SET_VERSION covers changes to
+# the instructions themselves)
+CACHE_FORMAT_VERSION = 1
+
+
+def get_code_ranges(instructions_by_address):
+    # Find the (start, end) address ranges of the bytes that were decoded as instructions,
+    # merging adjacent ranges. An instruction running past 0xffff wraps to 0x0000.
+    ranges = []
+    for addr in instructions_by_address:
+        end = addr + instructions_by_address.lengths[addr]
+        if end > 0x10000:
+            ranges.append((0x0000, end - 0x10000))
+            end = 0x10000
+
+        if ranges and ranges[-1][1] >= addr:
+            start, old_end = ranges[-1]
+            ranges[-1] = (start, max(old_end, end))
+        else:
+            ranges.append((addr, end))
+
+    return ranges
+
+
+def get_ranges_digest(mem, ranges):
+    digest = hashlib.sha1()
+    for start, end in ranges:
+        digest.update(b"%04x:" % start)
+        digest.update(bytes(mem[start:end]))
+    return digest.hexdigest()
+
+
+class AnalysisCache(object):
+    # On-disk cache of analysis results. Entries are indexed by the entry points that were
+    # traced, and are valid for any memory image whose bytes match at the addresses that
+    # were decoded as code - so changing data that is never executed (such as song data)
+    # does not invalidate them.
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def get_key(self, entry_points):
+        return "%d:%d:%s" % (
+            CACHE_FORMAT_VERSION, INSTRUCTION_SET_VERSION,
+            ','.join("%04x" % addr for addr in entry_points)
+        )
+
+    def get_index_path(self, entry_points):
+        key = self.get_key(entry_points)
+        return os.path.join(self.cache_dir, "index-%s.pickle" % hashlib.sha1(key.encode()).hexdigest())
+
+    def read_pickle(self, filename):
+        # the object pickled in filename, or None if it cannot be read for any reason - a
+        # missing, truncated or corrupt file, or one pickled from classes that have since
+        # changed - as the cache is only ever an optimisation
+        try:
+            with open(os.path.join(self.cache_dir, filename), 'rb') as f:
+                return pickle.load(f)
+        except Exception:
+            return None
+
+    def read_index(self, entry_points):
+        index = self.read_pickle(os.path.basename(self.get_index_path(entry_points)))
+        if not isinstance(index, list):
+            return []
+        return [
+            entry for entry in index
+            if isinstance(entry, dict) and set(entry) == INDEX_ENTRY_KEYS
+        ]
+
+    def load(self, mem, entry_points):
+        mem_digest = hashlib.sha1(bytes(mem)).hexdigest()
+        index = self.read_index(entry_points)
+
+        # try entries for an identical memory image first
+        index.sort(key=lambda entry: entry['mem_digest'] != mem_digest)
+
+        for entry in index:
+            try:
+                is_match = (
+                    entry['mem_digest'] == mem_digest
+                    or get_ranges_digest(mem, entry['code_ranges']) == entry['code_digest']
+                )
+            except Exception:
+                # a malformed entry
+                continue
+            if is_match:
+                state = self.read_pickle(entry['filename'])
+                if isinstance(state, dict):
+                    return state
+
+        return None
+
+    def save(self, mem, entry_points, instructions_by_address, state):
+        code_ranges = get_code_ranges(instructions_by_address)
+        code_digest = get_ranges_digest(mem, code_ranges)
+        filename = "analysis-%s.pickle" % hashlib.sha1(
+            ("%s:%s" % (self.get_key(entry_points), code_digest)).encode()
+        ).hexdigest()
+
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+        self.write_pickle(filename, state)
+
+        index = [
+            entry for entry in self.read_index(entry_points)
+            if entry['filename'] != filename
+        ]
+        index.append({
+            'mem_digest': hashlib.sha1(bytes(mem)).hexdigest(),
+            'code_ranges': code_ranges,
+            'code_digest': code_digest,
+            'filename': filename,
+        })
+        self.write_pickle(os.path.basename(self.get_index_path(entry_points)), index)
+
+    def write_pickle(self, filename, obj):
+        # Write via a temporary file and rename it into place, so that other processes
+        # sharing the cache never see a partly-written file
+        path = os.path.join(self.cache_dir, filename)
+        temp_path = "%s.%d.tmp" % (path, os.getpid())
+        with open(temp_path, 'wb') as f:
+            pickle.dump(obj, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
@@ -0,0 +1,182 @@
+class BasicBlock(object):
+    def __init__(self, start_addr):
+        self.start_addr = start_addr
+        # addresses of the instructions in this block, in execution order
+        self.addresses = []
+
+        # Blocks that control can pass to within the current routine - a call is treated
+        # as continuing at its return address (if the called routine ever returns)
+        self.successors = []
+
+        # Blocks that control can pass to in the program as a whole - a call goes to the
+        # called routine's entry point, and a routine exit goes to every return address
+        # that it can return to
+        self.destinations = []
+        self.origins = []
+
+        # Bitmasks of the TRACKED_VALUES read before being written within this block, and
+        # written within this block; filled in by the liveness analysis
+        self.uses_mask = 0
+        self.overwrites_mask = 0
+
+    @property
+    def last_addr(self):
+        return self.addresses[-1]
+
+    def __repr__(self):
+        return "<BasicBlock 0x%04x-0x%04x>" % (self.start_addr, self.last_addr)
+
+
+def find_leaders(instructions_by_address, origins_by_address, routines, jump_targets):
+    leaders = set(routines)
+    leaders.update(jump_targets)
+
+    for addr in instructions_by_address:
+        if instructions_by_address.call_target(addr) is not None:
+            leaders.add(instructions_by_address.return_address(addr))
+
+        if (
+            instructions_by_address.is_routine_exit(addr)
+            or instructions_by_address.jump_target(addr) is not None
+        ):
+            # the instruction after a routine exit or branch starts a new block
+            leaders.add(instructions_by_address.next_address(addr))
+
+        origins = origins_by_address.get(addr, ())
+        if len(origins) != 1:
+            leaders.add(addr)
+        elif instructions_by_address.next_address(next(iter(origins))) != addr:
+            # only reachable by a jump
+            leaders.add(addr)
+
+    return set(addr for addr in leaders if addr in instructions_by_address)
+
+
+def get_flow_successors(instructions_by_address, addr, routines):
+    call_target = instructions_by_address.call_target(addr)
+    successors = [
+        dest for dest in instructions_by_address.static_destination_addresses(addr)
+        if dest != call_target
+    ]
+    if call_target is not None:
+        return_address = instructions_by_address.return_address(addr)
+        subroutine = routines.get(call_target)
+        if return_address not in successors and (subroutine is None or subroutine.exit_points):
+            successors.append(return_address)
+
+    return successors
+
+
+def find_basic_blocks(
+    instructions_by_address, origins_by_address, destinations_by_address, routines, jump_targets
+):
+    leaders = find_leaders(instructions_by_address, origins_by_address, routines, jump_targets)
+    blocks_by_address = {}
+
+    for start_addr in sorted(leaders):
+        block = BasicBlock(start_addr)
+        blocks_by_address[start_addr] = block
+
+        addr = start_addr
+        while True:
+            block.addresses.append(addr)
+            next_addr = instructions_by_address.next_address(addr)
+            if (
+                next_addr in leaders
+                or next_addr not in instructions_by_address
+                or instructions_by_address.is_routine_exit(addr)
+                or instructions_by_address.jump_target(addr) is not None
+                or instructions_by_address.call_target(addr) is not None
+                or instructions_by_address.static_destination_addresses(addr) != [next_addr]
+            ):
+                break
+            addr = next_addr
+
+    for block in blocks_by_address.values():
+        block.successors = [
+            blocks_by_address[dest]
+            for dest in get_flow_successors(instructions_by_address, block.last_addr, routines)
+            if dest in blocks_by_address
+        ]
+        block.destinations = [
+            blocks_by_address[dest]
+            for dest in sorted(destinations_by_address[block.last_addr])
+            if dest in blocks_by_address
+        ]
+        for dest in block.destinations:
+            dest.origins.append(block)
+
+    return blocks_by_address
+
+
+class ControlFlowGraph(object):
+    # The graph of basic blocks making up one routine, as reached from its entry block by
+    # following the routine's own control flow
+    def __init__(self, entry_block):
+        self.entry_block = entry_block
+
+        # depth-first search to find postorder
+        postorder = []
+        visited = set([entry_block])
+        stack = [(entry_block, iter(entry_block.successors))]
+        while stack:
+            block, successors = stack[-1]
+            for successor in successors:
+                if successor not in visited:
+                    visited.add(successor)
+                    stack.append((successor, iter(successor.successors)))
+                    break
+            else:
+                stack.pop()
+                postorder.append(block)
+
+        self.reverse_postorder = list(reversed(postorder))
+        self.rpo_index = dict((block, i) for i, block in enumerate(self.reverse_postorder))
+        self.blocks = sorted(self.reverse_postorder, key=lambda block: block.start_addr)
+
+        self.predecessors = dict((block, []) for block in self.reverse_postorder)
+        for block in self.reverse_postorder:
+            for successor in block.successors:
+                self.predecessors[successor].append(block)
+
+        self.immediate_dominators = self.find_immediate_dominators()
+
+    def find_immediate_dominators(self):
+        # Cooper, Harvey & Kennedy, "A Simple, Fast Dominance Algorithm"
+        idom = {self.entry_block: self.entry_block}
+        rpo_index = self.rpo_index
+
+        def intersect(b1, b2):
+            while b1 is not b2:
+                while rpo_index[b1] > rpo_index[b2]:
+                    b1 = idom[b1]
+                while rpo_index[b2] > rpo_index[b1]:
+                    b2 = idom[b2]
+            return b1
+
+        changed = True
+        while changed:
+            changed = False
+            for block in self.reverse_postorder[1:]:
+                new_idom = None
+                for predecessor in self.predecessors[block]:
+                    if predecessor in idom:
+                        if new_idom is None:
+                            new_idom = predecessor
+                        else:
+                            new_idom = intersect(predecessor, new_idom)
+
+                if idom.get(block) is not new_idom:
+                    idom[block] = new_idom
+                    changed = True
+
+        return idom
+
+    def dominates(self, b1, b2):
+        # return True if every path from the entry block to b2 passes through b1
+        while True:
+            if b1 is b2:
+                return True
+            if b2 is self.entry_block:
+                return False
+            b2 = self.immediate_dominators[b2]
@@ -0,0 +1,169 @@
+# Routine specialisation: liveness is merged over all the return addresses that a routine
+# can go to, so its code computes every result that any of its callers uses. Where the
+# calls from some sites use fewer of them, a clone of the routine is emitted for those
+# sites that leaves out the work on the rest, named for the values it still provides:
+#
+#   r40b5();  ->  r40b5_H_L();
+#
+# The clone's liveness is found by working back through the routine's own control flow
+# from its exits, with only the values live at its call sites live there, and the calls
+# within it taken as summarised by summary.RoutineSummaries; each instruction's used
+# results are those of the whole program narrowed to that. An instruction with no code
+# for the narrower results keeps those of the original. The clone is written as the
+# routine is, for that liveness (see summary.RoutineLiveness).
+#
+# A clone is only made where it drops at least MIN_SAVING results (counted over its
+# instructions) for each call, and clones are taken in order of the results they drop
+# over all of their call sites until the instructions in them would exceed the budget.
+
+from collections import defaultdict
+import re
+
+from codegen import RewrittenCode
+from instructions import TRACKED_VALUES, VALUE_MASKS, mask_to_values, values_to_mask
+
+
+MIN_SAVING = 2
+
+
+def count_values(mask):
+    return bin(mask).count('1')
+
+
+class Clone(object):
+    # A copy of routine for the calls at call_sites, after which only the values in
+    # live_mask (of those that the routine or anything it calls may write) are live
+
+    def __init__(self, analyzer, routine, live_mask, call_sites):
+        instructions_by_address = analyzer.instructions_by_address
+        self.routine = routine
+        self.live_mask = live_mask
+        self.call_sites = call_sites
+        self.results = mask_to_values(live_mask & values_to_mask(routine.overwrites))
+        self.name = "r%04x_%s" % (routine.start_addr, '_'.join(
+            value for value in TRACKED_VALUES if live_mask & VALUE_MASKS[value]
+        ) or 'none')
+
+        def get_live_out(addr):
+            return analyzer.get_live_values(analyzer.destinations_by_address[addr])
+
+        # address -> values live before, and after, each instruction
+        self.live_in_by_address, self.live_out_by_address = (
+            analyzer.get_routine_summaries().find_liveness(routine, live_mask, get_live_out)
+        )
+
+        # the used results of each instruction, and the number dropped from the original
+        self.used_results_masks = {}
+        self.saving = 0
+        for addr in routine.addresses:
+            used = instructions_by_address.used_results_masks[addr]
+            narrowed = used & self.live_out_by_address.get(addr, used)
+            if narrowed != used:
+                instruction = instructions_by_address[addr]
+                instruction.used_results = mask_to_values(narrowed)
+                try:
+                    instruction.to_javascript()
+                except NotImplementedError:
+                    narrowed = used
+            self.used_results_masks[addr] = narrowed
+            self.saving += count_values(used & ~narrowed)
+
+    @property
+    def size(self):
+        return len(self.routine.addresses)
+
+    def write_javascript(
+        self, writer, analyzer, promoter=None, inliner=None, memory_variables=None,
+        ay_register_loops=None, clones=None
+    ):
+        self.routine.write_javascript(
+            writer, analyzer, promoter, inliner, memory_variables, ay_register_loops, clones,
+            self
+        )
+
+
+class Clones(object):
+    # Decide which routines of an analysis to clone for which of their call sites, in
+    # the given routines (those being emitted, with inliner as they are emitted with),
+    # adding at most budget instructions
+
+    def __init__(self, analyzer, routines, inliner, budget):
+        self.analyzer = analyzer
+        instructions_by_address = analyzer.instructions_by_address
+
+        # values that each routine (or anything it calls) may write
+        writes = analyzer.get_routine_summaries().writes
+
+        # (routine address, values live after the call) -> addresses of calls
+        call_sites = defaultdict(list)
+        for routine in routines:
+            if routine.start_addr in analyzer.precomputed:
+                continue
+            for addr in routine.addresses:
+                call_target = instructions_by_address.call_target(addr)
+                if (
+                    call_target is None or call_target in analyzer.precomputed
+                    or (inliner is not None and inliner.is_inlined_call(addr))
+                ):
+                    continue
+                live = analyzer.live_in_by_address.get(
+                    instructions_by_address.return_address(addr), 0
+                ) & writes[call_target]
+                all_live = analyzer.get_live_after_routine(
+                    analyzer.routines[call_target]
+                ) & writes[call_target]
+                if live != all_live:
+                    call_sites[call_target, live].append(addr)
+
+        candidates = []
+        for (call_target, live), addresses in sorted(call_sites.items()):
+            clone = Clone(analyzer, analyzer.routines[call_target], live, addresses)
+            if clone.saving >= MIN_SAVING:
+                candidates.append(clone)
+        candidates.sort(key=lambda clone: -clone.saving * len(clone.call_sites))
+
+        # routine address -> its clones
+        self.clones_by_routine = defaultdict(list)
+        # call address -> the clone that it calls
+        self.clones_by_call_site = {}
+        self.size = 0
+        for clone in candidates:
+            if self.size + clone.size > budget:
+                continue
+            self.size += clone.size
+            self.clones_by_routine[clone.routine.start_addr].append(clone)
+            for addr in clone.call_sites:
+                self.clones_by_call_site[addr] = clone
+        for clones in self.clones_by_routine.values():
+            clones.sort(key=lambda clone: clone.name)
+
+    def get_clones(self, addr):
+        # the clones of the routine at addr
+        return self.clones_by_routine.get(addr, [])
+
+    def report(self):
+        lines = []
+        for addr, clones in sorted(self.clones_by_routine.items()):
+            for clone in clones:
+                lines.append("Cloned r%04x as %s for %d call sites, dropping %d results" % (
+                    addr, clone.name, len(clone.call_sites), clone.saving
+                ))
+        if lines:
+            lines.append("Code size change from cloning: %+d instructions" % self.size)
+        return lines
+
+
+class CloneCalls(RewrittenCode):
+    # The code for one routine's instructions, as given by code (a codegen.InstructionCode
+    # or another pass), with calls made to the clones chosen for them by clones
+
+    def __init__(self, clones, code):
+        self.clones = clones
+        super(CloneCalls, self).__init__(code)
+
+    def code_for_address(self, addr):
+        code = self.code.code_for_address(addr)
+        clone = self.clones.clones_by_call_site.get(addr)
+        if clone is None:
+            return code
+        return re.sub(r'\br%04x\(' % clone.routine.start_addr, clone.name + '(', code)
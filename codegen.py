@@ -0,0 +1,68 @@
+# The Javascript making up a routine's body, instruction by instruction. RoutineStructurer
+# and the pc dispatcher build routines from one of these; passes that rewrite the code
+# (register promotion, lazy flags) wrap another and provide the same interface:
+#
+#   code_for_address(addr) - the code for the instruction at addr
+#   condition_for_address(addr) - the condition under which a conditional jump at addr
+#       is taken
+#   code_before_branch(addr) - code to run before the jump at addr (ahead of testing its
+#       condition), when it is emitted as structured control flow rather than as its own
+#       code
+#   return_code - the code to leave the routine with
+#   declarations() - lines to open the routine with
+#
+# Passes subclass RewrittenCode, which passes all of these through from the code it wraps,
+# and override those that they change.
+
+from instructions import mask_to_values
+
+
+class InstructionCode(object):
+    # The code given by the instructions themselves, for the results used as given by
+    # liveness (a summary.RoutineLiveness), or by the instruction table if None
+
+    return_code = 'return;'
+
+    def __init__(self, instructions_by_address, liveness=None):
+        self.instructions_by_address = instructions_by_address
+        self.liveness = liveness
+
+    def code_for_address(self, addr):
+        instruction = self.instructions_by_address[addr]
+        if self.liveness is not None:
+            instruction.used_results = mask_to_values(self.liveness.get_used_results_mask(addr))
+        return instruction.to_javascript()
+
+    def condition_for_address(self, addr):
+        instruction = self.instructions_by_address[addr]
+        if not instruction.has_condition:
+            raise ValueError("%s is not conditional" % instruction)
+        return instruction.condition_to_javascript()
+
+    def code_before_branch(self, addr):
+        # as with the decrement of DJNZ
+        return self.instructions_by_address[addr].code_before_branch_to_javascript()
+
+    def declarations(self):
+        return []
+
+
+class RewrittenCode(object):
+    # The code for one routine's instructions, as given by code (an InstructionCode or
+    # another pass), unchanged: the base of the passes that rewrite it
+
+    def __init__(self, code):
+        self.code = code
+        self.return_code = code.return_code
+
+    def code_for_address(self, addr):
+        return self.code.code_for_address(addr)
+
+    def condition_for_address(self, addr):
+        return self.code.condition_for_address(addr)
+
+    def code_before_branch(self, addr):
+        return self.code.code_before_branch(addr)
+
+    def declarations(self):
+        return self.code.declarations()
@@ -0,0 +1,442 @@
+# Constant propagation and folding over a routine's generated code. A forward pass over
+# the routine's control flow graph tracks which locals (the register locals from register
+# promotion, the stack locals from stack promotion, the pair temporary and tmp) hold a
+# value known at compile time - as set by e.g. LD HL,nn, LD A,n or INC HL on a known
+# value - and substitutes those values wherever the locals are read, evaluating any
+# expression (or part of one, such as a memory address) that becomes constant:
+#
+#   h = 0x44; l = 0x3c; a = mem[(h << 8 | l)];  ->  h = 0x44; l = 0x3c; a = mem[0x443c];
+#
+# Reads from memory marked read-only (such as a tune's data) at an address that becomes
+# constant are replaced with the value there, as are lookups in flag tables at a constant
+# index. A backward liveness pass then deletes the assignments to locals that are no
+# longer read.
+#
+# Code is handled a statement at a time. Compound statements (if / while with a block)
+# are left alone, except to substitute into one that has no loop, call or assignment to
+# a local.
+
+import ast
+import re
+
+from codegen import RewrittenCode
+from instructions import FLAG_TABLES
+from promote import LOCAL_NAMES, TEMP
+from stack import STACK_LOCALS
+
+
+# locals whose values are tracked
+VARIABLES = set(LOCAL_NAMES.values()) | set(STACK_LOCALS) | set([TEMP, 'tmp'])
+# locals that can have assignments deleted when they are no longer read (tmp is a global)
+REMOVABLE_VARIABLES = set(LOCAL_NAMES.values()) | set(STACK_LOCALS) | set([TEMP])
+
+ASSIGNMENT_PATTERN = re.compile(r'^([A-Za-z_]\w*) (=|[-+&|^]=|<<=|>>=) (.*);$')
+IDENTIFIER_PATTERN = re.compile(r'\b[A-Za-z_]\w*\b')
+ASSIGNED_NAME_PATTERN = re.compile(
+    r'\b([A-Za-z_]\w*)\s*(?:(?:[-+*/%&|^]|<<|>>>?)?=(?!=)|\+\+|--)'
+)
+CALL_PATTERN = re.compile(r'\b[A-Za-z_]\w*\(')
+LOOP_PATTERN = re.compile(r'\b(?:while|for)\b')
+CONSTANT_TOKEN_PATTERN = re.compile(r'0x[0-9a-fA-F]+|\d+|<<|>>|[-+*&|^~()]|\s+')
+NUMBER_PATTERN = re.compile(r'0x[0-9a-fA-F]+|\d+')
+# a parenthesised (but not a function call's arguments) or bracketed part of an expression
+GROUP_PATTERN = re.compile(r'((?<![\w)\]])\(|\[)([^()\[\]]*)([)\]])')
+# a register pair whose high byte is known to be zero
+ZERO_HIGH_BYTE_PATTERN = re.compile(r'\(0x00 << 8 \| (\w+)\)')
+# a read from memory at a constant address (that is not the target of an assignment)
+CONSTANT_READ_PATTERN = re.compile(
+    r'mem\[(0x[0-9a-fA-F]+)\](?!\s*(?:(?:[-+&|^]|<<|>>)?=(?!=)|\+\+|--))'
+)
+# a lookup in a flag table at a constant index
+FLAG_TABLE_READ_PATTERN = re.compile(
+    r'\b(%s)\[(0x[0-9a-fA-F]+)\]' % '|'.join(sorted(FLAG_TABLES))
+)
+
+
+def split_statements(code):
+    # Split code into its top-level statements, each with any whitespace before it; a
+    # comment standing on its own counts as a statement
+    statements = []
+    depth = 0
+    start = 0
+    i = 0
+    while i < len(code):
+        if code.startswith('/*', i):
+            end = code.index('*/', i) + 2
+            if depth == 0 and not code[start:i].strip():
+                statements.append(code[start:end])
+                start = end
+            i = end
+            continue
+
+        char = code[i]
+        if char in '([{':
+            depth += 1
+        elif char in ')]}':
+            depth -= 1
+            if char == '}' and depth == 0 and not code[i + 1:].lstrip().startswith(';'):
+                statements.append(code[start:i + 1])
+                start = i + 1
+        elif char == ';' and depth == 0:
+            statements.append(code[start:i + 1])
+            start = i + 1
+        i += 1
+
+    if code[start:].strip():
+        statements.append(code[start:])
+    return statements
+
+
+def format_constant(value):
+    if value < 0:
+        return '-' + format_constant(-value)
+    elif value < 0x100:
+        return "0x%02x" % value
+    elif value < 0x10000:
+        return "0x%04x" % value
+    else:
+        return "0x%x" % value
+
+
+def check_int32(value):
+    # Javascript's bitwise operators convert their operands to 32-bit signed integers (and
+    # give one), which Python's do not; folding is only done where that changes nothing
+    if not -0x80000000 <= value < 0x80000000:
+        raise ValueError("Javascript would wrap 0x%x to 32 bits" % value)
+    return value
+
+
+def check_exact(value):
+    # Javascript numbers are doubles, which only hold integers up to 2 ** 53 exactly
+    if not -0x20000000000000 <= value <= 0x20000000000000:
+        raise ValueError("Javascript would round 0x%x" % value)
+    return value
+
+
+def check_shift(value):
+    # Javascript takes a shift count modulo 32, and Python refuses a negative one
+    if not 0 <= value < 32:
+        raise ValueError("Shift by %d" % value)
+    return value
+
+
+def evaluate_node(node):
+    # The value of a node of the syntax tree of a constant expression, as Javascript would
+    # give it. Raises ValueError for anything other than the operators below, and for
+    # values where the results of the two languages would differ
+    if isinstance(node, ast.Constant) and type(node.value) is int:
+        return node.value
+
+    elif isinstance(node, ast.UnaryOp):
+        operand = evaluate_node(node.operand)
+        if isinstance(node.op, ast.USub):
+            return check_exact(-operand)
+        elif isinstance(node.op, ast.UAdd):
+            return operand
+        elif isinstance(node.op, ast.Invert):
+            return ~check_int32(operand)
+
+    elif isinstance(node, ast.BinOp):
+        left = evaluate_node(node.left)
+        right = evaluate_node(node.right)
+        op = node.op
+        if isinstance(op, ast.Add):
+            return check_exact(left + right)
+        elif isinstance(op, ast.Sub):
+            return check_exact(left - right)
+        elif isinstance(op, ast.Mult):
+            return check_exact(left * right)
+        elif isinstance(op, ast.BitAnd):
+            return check_int32(left) & check_int32(right)
+        elif isinstance(op, ast.BitOr):
+            return check_int32(left) | check_int32(right)
+        elif isinstance(op, ast.BitXor):
+            return check_int32(left) ^ check_int32(right)
+        elif isinstance(op, ast.LShift):
+            return check_int32(check_int32(left) << check_shift(right))
+        elif isinstance(op, ast.RShift):
+            # both are arithmetic shifts
+            return check_int32(left) >> check_shift(right)
+
+    raise ValueError("Not a constant expression")
+
+
+def evaluate(expression):
+    # Return the value of an expression made up only of numbers and the arithmetic /
+    # bitwise operators + - * & | ^ ~ << >>, or None. These have the same precedence in
+    # Python as in Javascript, so Python parses the expression; it is evaluated as
+    # Javascript would, and not at all where that needs more than 32 bits
+    tokens = CONSTANT_TOKEN_PATTERN.findall(expression)
+    if ''.join(tokens) != expression or not NUMBER_PATTERN.search(expression):
+        return None
+    try:
+        return check_int32(evaluate_node(ast.parse(expression.strip(), mode='eval').body))
+    except (SyntaxError, ValueError):
+        return None
+
+
+def fold(expression):
+    # evaluate the constant parts of an expression: the whole of it, or any parenthesised
+    # or bracketed part
+    value = evaluate(expression.strip())
+    if value is not None:
+        return format_constant(value)
+
+    def replace(match):
+        opening, inner, closing = match.groups()
+        value = evaluate(inner.strip())
+        if value is None:
+            return match.group(0)
+        elif opening == '(':
+            return format_constant(value)
+        else:
+            return opening + format_constant(value) + closing
+
+    while True:
+        folded = GROUP_PATTERN.sub(replace, expression)
+        if folded == expression:
+            return expression
+        expression = folded
+
+
+def substitute(expression, values, memory=None):
+    # substitute the known values of locals into expression, and those of memory (a dict
+    # of address -> value for memory that is never written), and fold
+    def replace(match):
+        name = match.group(0)
+        if name in values:
+            return format_constant(values[name])
+        return name
+
+    def replace_read(match):
+        address = int(match.group(1), 16)
+        if address in memory:
+            return format_constant(memory[address])
+        return match.group(0)
+
+    def replace_flag_table_read(match):
+        table = FLAG_TABLES[match.group(1)]
+        return 'true' if table[int(match.group(2), 16) & 0xff] else 'false'
+
+    expression = fold(IDENTIFIER_PATTERN.sub(replace, expression))
+    while memory:
+        substituted = CONSTANT_READ_PATTERN.sub(replace_read, expression)
+        if substituted == expression:
+            break
+        expression = fold(substituted)
+    expression = FLAG_TABLE_READ_PATTERN.sub(replace_flag_table_read, expression)
+    return ZERO_HIGH_BYTE_PATTERN.sub(r'\1', expression)
+
+
+def get_assigned_variables(statement):
+    return set(ASSIGNED_NAME_PATTERN.findall(statement)) & VARIABLES
+
+
+def is_pure(expression):
+    # True if evaluating the expression has no side effects
+    return not (
+        CALL_PATTERN.search(expression) or '++' in expression or '--' in expression
+        or re.search(r'[^=!<>]=(?!=)', expression)
+    )
+
+
+def meet(states):
+    # the values that all the given states agree on
+    states = [state for state in states if state is not None]
+    if not states:
+        return None
+    result = dict(states[0])
+    for state in states[1:]:
+        for name, value in list(result.items()):
+            if state.get(name) != value:
+                del result[name]
+    return result
+
+
+def transfer(statements, values, rewrite, memory=None):
+    # Run through statements with the given known values (updated in place), and memory
+    # as for substitute; if rewrite is True, return the statements with known values
+    # substituted and folded
+    result = []
+    for statement in statements:
+        text = statement.strip()
+        leading = statement[:len(statement) - len(statement.lstrip())]
+        match = ASSIGNMENT_PATTERN.match(text)
+
+        if match:
+            target, operator, expression = match.groups()
+            if operator == '=':
+                expression = substitute(expression, values, memory)
+                text = "%s = %s;" % (target, expression)
+            else:
+                text = "%s %s %s;" % (target, operator, substitute(expression, values, memory))
+                expression = substitute(
+                    "%s %s (%s)" % (target, operator[:-1], expression), values, memory
+                )
+            if target in VARIABLES:
+                value = evaluate(expression)
+                if value is None:
+                    values.pop(target, None)
+                else:
+                    values[target] = value
+                    text = "%s = %s;" % (target, format_constant(value))
+        else:
+            assigned = get_assigned_variables(text)
+            is_call = CALL_PATTERN.search(text) is not None and not text.startswith('out(')
+            if rewrite and not (assigned or is_call or LOOP_PATTERN.search(text)):
+                text = substitute(text, values, memory)
+            if is_call:
+                values.clear()
+            for name in assigned:
+                values.pop(name, None)
+
+        if rewrite:
+            result.append(leading + text)
+    return result
+
+
+def get_read_variables(code):
+    return set(IDENTIFIER_PATTERN.findall(code)) & REMOVABLE_VARIABLES
+
+
+def remove_dead_assignments(statements, live):
+    # Remove the assignments in statements to locals that are not in live (the set of
+    # locals read after them); update live to the locals read before the statements.
+    # Return True if anything was removed.
+    removed = False
+    for i in reversed(range(len(statements))):
+        text = statements[i].strip()
+        match = ASSIGNMENT_PATTERN.match(text)
+        if match and match.group(2) == '=' and match.group(1) in REMOVABLE_VARIABLES:
+            target, _, expression = match.groups()
+            if target not in live and is_pure(expression):
+                del statements[i]
+                removed = True
+            else:
+                live.discard(target)
+                live.update(get_read_variables(expression))
+        else:
+            live.update(get_read_variables(text))
+    return removed
+
+
+class ConstantFolding(RewrittenCode):
+    # The code for one routine's instructions, as given by code (a codegen.InstructionCode
+    # or another pass), with known values of locals substituted and folded
+
+    def __init__(self, analyzer, routine, code):
+        self.analyzer = analyzer
+        self.routine = routine
+        super(ConstantFolding, self).__init__(code)
+        memory = analyzer.get_constant_memory()
+
+        cfg = routine.cfg
+        statements_by_address = {}
+        for block in cfg.blocks:
+            for addr in block.addresses:
+                statements_by_address[addr] = split_statements(code.code_for_address(addr))
+
+        # forward pass: find the values known at the start of each block, then rewrite
+        values_by_block = dict((block, None) for block in cfg.blocks)
+        values_by_block[cfg.entry_block] = {}
+        changed = True
+        while changed:
+            changed = False
+            for block in cfg.reverse_postorder:
+                values = self.get_values_in(block, values_by_block)
+                if values is None:
+                    continue
+                for addr in block.addresses:
+                    transfer(statements_by_address[addr], values, False, memory)
+                for successor in block.successors:
+                    if successor is not cfg.entry_block:
+                        merged = meet([values_by_block[successor], values])
+                        if merged != values_by_block[successor]:
+                            values_by_block[successor] = merged
+                            changed = True
+
+        # the code before each jump and its condition, as the structurer asks for them
+        # separately from the jump's own code
+        self.code_before_branch_by_address = {}
+        self.condition_by_address = {}
+        instructions_by_address = analyzer.instructions_by_address
+        for block in cfg.blocks:
+            values = self.get_values_in(block, values_by_block)
+            if values is None:
+                # unreachable
+                continue
+            for addr in block.addresses:
+                if instructions_by_address.jump_target(addr) is not None:
+                    values_before = dict(values)
+                    self.code_before_branch_by_address[addr] = ''.join(transfer(
+                        split_statements(code.code_before_branch(addr)), values_before, True,
+                        memory
+                    )).strip()
+                    if instructions_by_address.get_class(addr).has_condition:
+                        self.condition_by_address[addr] = substitute(
+                            code.condition_for_address(addr), values_before, memory
+                        )
+                statements_by_address[addr] = transfer(
+                    statements_by_address[addr], values, True, memory
+                )
+
+        # backward pass: delete assignments to locals that are no longer read, repeating
+        # for as long as that leaves more of them unread
+        removed = True
+        while removed:
+            live_in_by_block = self.get_live_in(statements_by_address)
+            removed = False
+            for block in cfg.blocks:
+                live = self.get_live_out(block, live_in_by_block)
+                for addr in reversed(block.addresses):
+                    if remove_dead_assignments(statements_by_address[addr], live):
+                        removed = True
+
+        self.code_by_address = dict(
+            (addr, ''.join(statements).strip())
+            for addr, statements in statements_by_address.items()
+        )
+
+    def get_values_in(self, block, values_by_block):
+        values = values_by_block[block]
+        if values is None:
+            return None
+        return dict(values)
+
+    def get_live_out(self, block, live_in_by_block):
+        if not block.successors and not self.analyzer.instructions_by_address.is_routine_exit(block.last_addr):
+            # a call that never returns; the structurer follows it with the return code
+            return get_read_variables(self.return_code)
+        live = set()
+        for successor in block.successors:
+            live |= live_in_by_block[successor]
+        return live
+
+    def get_live_in(self, statements_by_address):
+        cfg = self.routine.cfg
+        live_in_by_block = dict((block, set()) for block in cfg.blocks)
+        changed = True
+        while changed:
+            changed = False
+            for block in reversed(cfg.reverse_postorder):
+                live = self.get_live_out(block, live_in_by_block)
+                for addr in reversed(block.addresses):
+                    # run the removal on a copy, just to find what is read
+                    remove_dead_assignments(list(statements_by_address[addr]), live)
+                if live != live_in_by_block[block]:
+                    live_in_by_block[block] = live
+                    changed = True
+        return live_in_by_block
+
+    def code_for_address(self, addr):
+        return self.code_by_address[addr]
+
+    def condition_for_address(self, addr):
+        if addr in self.condition_by_address:
+            return self.condition_by_address[addr]
+        return self.code.condition_for_address(addr)
+
+    def code_before_branch(self, addr):
+        if addr in self.code_before_branch_by_address:
+            return self.code_before_branch_by_address[addr]
+        return self.code.code_before_branch(addr)
@@ -0,0 +1,940 @@
+# Generated by build_decoder.py from the opcode tables in instructions.py - do not edit.
+#
+# decode_fields(mem, addr) returns a tuple of
+#   (class, length, uses_mask, overwrites_mask, is_routine_exit, falls_through,
+#    param, offset, jump_target, call_target)
+# for the instruction at addr, without constructing an Instruction object.
+#
+# Each FIELDS_* table has an entry for every opcode: None if it is not recognised,
+# (table, position of its opcode byte) for a prefix, and otherwise
+#   (class, length, uses_mask, overwrites_mask, is_routine_exit, falls_through,
+#    byte param position, word param position, offset position, target kind)
+
+from instructions import (
+    INSTRUCTION_SET_VERSION,
+    ADC_A_N,
+    ADC_A_R,
+    ADD_A_N,
+    ADD_A_R,
+    ADD_A_iHLi,
+    ADD_A_iIXIYpNi,
+    ADD_HL_RR,
+    ADD_IXIY_RR,
+    AND_N,
+    AND_R,
+    BIT_N_R,
+    BIT_N_iHLi,
+    BIT_N_iIXIYpNi,
+    CALL_C_NN,
+    CALL_NN,
+    CP_N,
+    CP_R,
+    CP_iHLi,
+    DEC_IXIY,
+    DEC_IXIYH,
+    DEC_R,
+    DEC_RR,
+    DEC_iHLi,
+    DEC_iIXIYpNi,
+    DI,
+    DJNZ_NN,
+    EI,
+    EX_AF_AF,
+    EX_DE_HL,
+    EX_iSPi_HL,
+    INC_IXIY,
+    INC_R,
+    INC_RR,
+    INC_iHLi,
+    JP_C_NN,
+    JP_NN,
+    JR_C_NN,
+    JR_NN,
+    LDDR,
+    LDIR,
+    LD_A_iNNi,
+    LD_A_iRRi,
+    LD_BCDE_iNNi,
+    LD_HL_iNNi,
+    LD_IXIYH_N,
+    LD_IXIY_NN,
+    LD_IXIY_iNNi,
+    LD_RR_NN,
+    LD_R_N,
+    LD_R_R,
+    LD_R_iHLi,
+    LD_R_iIXIYpNi,
+    LD_SP_HL,
+    LD_SP_IXIY,
+    LD_iHLi_R,
+    LD_iIXIYpNi_N,
+    LD_iIXIYpNi_R,
+    LD_iNNi_A,
+    LD_iNNi_BCDE,
+    LD_iNNi_HL,
+    LD_iRRi_A,
+    OR_R,
+    OR_iHLi,
+    OR_iIXIYpNi,
+    OUTD,
+    OUTI,
+    OUT_iCi_R,
+    POP_IXIY,
+    POP_RR,
+    PUSH_RR,
+    RES_N_R,
+    RES_N_iHLi,
+    RES_N_iIXIYpNi,
+    RET,
+    RET_C,
+    RLA,
+    RLCA,
+    RLC_R,
+    RL_R,
+    RRA,
+    RRCA,
+    RR_R,
+    SBC_A_R,
+    SBC_HL_RR,
+    SET_N_R,
+    SET_N_iHLi,
+    SET_N_iIXIYpNi,
+    SRA_R,
+    SRL_R,
+    SUB_N,
+    SUB_R,
+    XOR_R,
+    XOR_iIXIYpNi,
+)
+
+
+if INSTRUCTION_SET_VERSION != 8:
+    raise ImportError("decoder.py is out of date - regenerate it with build_decoder.py")
+
+
+# kinds of static target
+TARGET_NONE = 0
+TARGET_JUMP_WORD = 1
+TARGET_JUMP_OFFSET = 2
+TARGET_CALL_WORD = 3
+
+FIELDS_FDCB = (
+    None, None, None, None, None, None, None, None, None, None, None, None, None, None, None, None,
+    None, None, None, None, None, None, None, None, None, None, None, None, None, None, None, None,
+    None, None, None, None, None, None, None, None, None, None, None, None, None, None, None, None,
+    None, None, None, None, None, None, None, None, None, None, None, None, None, None, None, None,
+    None, None, None, None, None, None,
+    (BIT_N_iIXIYpNi, 4, 0x00600, 0x38000, False, True, None, None, 2, 0),  # 0x46
+    None, None, None, None, None, None, None,
+    (BIT_N_iIXIYpNi, 4, 0x00600, 0x38000, False, True, None, None, 2, 0),  # 0x4e
+    None, None, None, None, None, None, None,
+    (BIT_N_iIXIYpNi, 4, 0x00600, 0x38000, False, True, None, None, 2, 0),  # 0x56
+    None, None, None, None, None, None, None,
+    (BIT_N_iIXIYpNi, 4, 0x00600, 0x38000, False, True, None, None, 2, 0),  # 0x5e
+    None, None, None, None, None, None, None,
+    (BIT_N_iIXIYpNi, 4, 0x00600, 0x38000, False, True, None, None, 2, 0),  # 0x66
+    None, None, None, None, None, None, None,
+    (BIT_N_iIXIYpNi, 4, 0x00600, 0x38000, False, True, None, None, 2, 0),  # 0x6e
+    None, None, None, None, None, None, None,
+    (BIT_N_iIXIYpNi, 4, 0x00600, 0x38000, False, True, None, None, 2, 0),  # 0x76
+    None, None, None, None, None, None, None,
+    (BIT_N_iIXIYpNi, 4, 0x00600, 0x38000, False, True, None, None, 2, 0),  # 0x7e
+    None, None, None, None, None, None, None,
+    (RES_N_iIXIYpNi, 4, 0x00600, 0x00000, False, True, None, None, 2, 0),  # 0x86
+    None, None, None, None, None, None, None,
+    (RES_N_iIXIYpNi, 4, 0x00600, 0x00000, False, True, None, None, 2, 0),  # 0x8e
+    None, None, None, None, None, None, None,
+    (RES_N_iIXIYpNi, 4, 0x00600, 0x00000, False, True, None, None, 2, 0),  # 0x96
+    None, None, None, None, None, None, None,
+    (RES_N_iIXIYpNi, 4, 0x00600, 0x00000, False, True, None, None, 2, 0),  # 0x9e
+    None, None, None, None, None, None, None,
+    (RES_N_iIXIYpNi, 4, 0x00600, 0x00000, False, True, None, None, 2, 0),  # 0xa6
+    None, None, None, None, None, None, None,
+    (RES_N_iIXIYpNi, 4, 0x00600, 0x00000, False, True, None, None, 2, 0),  # 0xae
+    None, None, None, None, None, None, None,
+    (RES_N_iIXIYpNi, 4, 0x00600, 0x00000, False, True, None, None, 2, 0),  # 0xb6
+    None, None, None, None, None, None, None,
+    (RES_N_iIXIYpNi, 4, 0x00600, 0x00000, False, True, None, None, 2, 0),  # 0xbe
+    None, None, None, None, None, None, None,
+    (SET_N_iIXIYpNi, 4, 0x00600, 0x00000, False, True, None, None, 2, 0),  # 0xc6
+    None, None, None, None, None, None, None,
+    (SET_N_iIXIYpNi, 4, 0x00600, 0x00000, False, True, None, None, 2, 0),  # 0xce
+    None, None, None, None, None, None, None,
+    (SET_N_iIXIYpNi, 4, 0x00600, 0x00000, False, True, None, None, 2, 0),  # 0xd6
+    None, None, None, None, None, None, None,
+    (SET_N_iIXIYpNi, 4, 0x00600, 0x00000, False, True, None, None, 2, 0),  # 0xde
+    None, None, None, None, None, None, None,
+    (SET_N_iIXIYpNi, 4, 0x00600, 0x00000, False, True, None, None, 2, 0),  # 0xe6
+    None, None, None, None, None, None, None,
+    (SET_N_iIXIYpNi, 4, 0x00600, 0x00000, False, True, None, None, 2, 0),  # 0xee
+    None, None, None, None, None, None, None,
+    (SET_N_iIXIYpNi, 4, 0x00600, 0x00000, False, True, None, None, 2, 0),  # 0xf6
+    None, None, None, None, None, None, None,
+    (SET_N_iIXIYpNi, 4, 0x00600, 0x00000, False, True, None, None, 2, 0),  # 0xfe
+    None,
+)
+
+FIELDS_FD = (
+    None, None, None, None, None, None, None, None, None,
+    (ADD_IXIY_RR, 2, 0x00606, 0x04600, False, True, None, None, None, 0),  # 0x09
+    None, None, None, None, None, None, None, None, None, None, None, None, None, None, None,
+    (ADD_IXIY_RR, 2, 0x00618, 0x04600, False, True, None, None, None, 0),  # 0x19
+    None, None, None, None, None, None, None,
+    (LD_IXIY_NN, 4, 0x00000, 0x00600, False, True, None, 2, None, 0),  # 0x21
+    None,
+    (INC_IXIY, 2, 0x00600, 0x00600, False, True, None, None, None, 0),  # 0x23
+    None,
+    (DEC_IXIYH, 2, 0x00200, 0x38200, False, True, None, None, None, 0),  # 0x25
+    (LD_IXIYH_N, 3, 0x00000, 0x00200, False, True, 2, None, None, 0),  # 0x26
+    None, None, None,
+    (LD_IXIY_iNNi, 4, 0x00000, 0x00600, False, True, None, 2, None, 0),  # 0x2a
+    (DEC_IXIY, 2, 0x00600, 0x00600, False, True, None, None, None, 0),  # 0x2b
+    None, None, None, None, None, None, None, None, None,
+    (DEC_iIXIYpNi, 3, 0x00600, 0x38000, False, True, None, None, 2, 0),  # 0x35
+    (LD_iIXIYpNi_N, 4, 0x00600, 0x00000, False, True, 3, None, 2, 0),  # 0x36
+    None, None, None, None, None, None, None, None, None, None, None, None, None, None, None,
+    (LD_R_iIXIYpNi, 3, 0x00600, 0x00002, False, True, None, None, 2, 0),  # 0x46
+    None, None, None, None, None, None, None,
+    (LD_R_iIXIYpNi, 3, 0x00600, 0x00004, False, True, None, None, 2, 0),  # 0x4e
+    None, None, None, None, None, None, None,
+    (LD_R_iIXIYpNi, 3, 0x00600, 0x00008, False, True, None, None, 2, 0),  # 0x56
+    None, None, None, None, None, None, None,
+    (LD_R_iIXIYpNi, 3, 0x00600, 0x00010, False, True, None, None, 2, 0),  # 0x5e
+    None, None, None, None, None, None, None,
+    (LD_R_iIXIYpNi, 3, 0x00600, 0x00020, False, True, None, None, 2, 0),  # 0x66
+    None, None, None, None, None, None, None,
+    (LD_R_iIXIYpNi, 3, 0x00600, 0x00040, False, True, None, None, 2, 0),  # 0x6e
+    None,
+    (LD_iIXIYpNi_R, 3, 0x00602, 0x00000, False, True, None, None, 2, 0),  # 0x70
+    (LD_iIXIYpNi_R, 3, 0x00604, 0x00000, False, True, None, None, 2, 0),  # 0x71
+    (LD_iIXIYpNi_R, 3, 0x00608, 0x00000, False, True, None, None, 2, 0),  # 0x72
+    (LD_iIXIYpNi_R, 3, 0x00610, 0x00000, False, True, None, None, 2, 0),  # 0x73
+    (LD_iIXIYpNi_R, 3, 0x00620, 0x00000, False, True, None, None, 2, 0),  # 0x74
+    (LD_iIXIYpNi_R, 3, 0x00640, 0x00000, False, True, None, None, 2, 0),  # 0x75
+    None,
+    (LD_iIXIYpNi_R, 3, 0x00601, 0x00000, False, True, None, None, 2, 0),  # 0x77
+    None, None, None, None, None, None,
+    (LD_R_iIXIYpNi, 3, 0x00600, 0x00001, False, True, None, None, 2, 0),  # 0x7e
+    None, None, None, None, None, None, None,
+    (ADD_A_iIXIYpNi, 3, 0x00601, 0x3c001, False, True, None, None, 2, 0),  # 0x86
+    None, None, None, None, None, None, None, None, None, None, None, None, None, None, None, None,
+    None, None, None, None, None, None, None, None, None, None, None, None, None, None, None, None,
+    None, None, None, None, None, None, None,
+    (XOR_iIXIYpNi, 3, 0x00601, 0x3c001, False, True, None, None, 2, 0),  # 0xae
+    None, None, None, None, None, None, None,
+    (OR_iIXIYpNi, 3, 0x00601, 0x3c001, False, True, None, None, 2, 0),  # 0xb6
+    None, None, None, None, None, None, None, None, None, None, None, None, None, None, None, None,
+    None, None, None, None,
+    (FIELDS_FDCB, 3),  # 0xcb
+    None, None, None, None, None, None, None, None, None, None, None, None, None, None, None, None,
+    None, None, None, None, None,
+    (POP_IXIY, 2, 0x00000, 0x00600, False, True, None, None, None, 0),  # 0xe1
+    None, None, None, None, None, None, None, None, None, None, None, None, None, None, None, None,
+    None, None, None, None, None, None, None,
+    (LD_SP_IXIY, 2, 0x00600, 0x00000, False, True, None, None, None, 0),  # 0xf9
+    None, None, None, None, None, None,
+)
+
+FIELDS_DDCB = (
+    None, None, None, None, None, None, None, None, None, None, None, None, None, None, None, None,
+    None, None, None, None, None, None, None, None, None, None, None, None, None, None, None, None,
+    None, None, None, None, None, None, None, None, None, None, None, None, None, None, None, None,
+    None, None, None, None, None, None, None, None, None, None, None, None, None, None, None, None,
+    None, None, None, None, None, None,
+    (BIT_N_iIXIYpNi, 4, 0x00180, 0x38000, False, True, None, None, 2, 0),  # 0x46
+    None, None, None, None, None, None, None,
+    (BIT_N_iIXIYpNi, 4, 0x00180, 0x38000, False, True, None, None, 2, 0),  # 0x4e
+    None, None, None, None, None, None, None,
+    (BIT_N_iIXIYpNi, 4, 0x00180, 0x38000, False, True, None, None, 2, 0),  # 0x56
+    None, None, None, None, None, None, None,
+    (BIT_N_iIXIYpNi, 4, 0x00180, 0x38000, False, True, None, None, 2, 0),  # 0x5e
+    None, None, None, None, None, None, None,
+    (BIT_N_iIXIYpNi, 4, 0x00180, 0x38000, False, True, None, None, 2, 0),  # 0x66
+    None, None, None, None, None, None, None,
+    (BIT_N_iIXIYpNi, 4, 0x00180, 0x38000, False, True, None, None, 2, 0),  # 0x6e
+    None, None, None, None, None, None, None,
+    (BIT_N_iIXIYpNi, 4, 0x00180, 0x38000, False, True, None, None, 2, 0),  # 0x76
+    None, None, None, None, None, None, None,
+    (BIT_N_iIXIYpNi, 4, 0x00180, 0x38000, False, True, None, None, 2, 0),  # 0x7e
+    None, None, None, None, None, None, None,
+    (RES_N_iIXIYpNi, 4, 0x00180, 0x00000, False, True, None, None, 2, 0),  # 0x86
+    None, None, None, None, None, None, None,
+    (RES_N_iIXIYpNi, 4, 0x00180, 0x00000, False, True, None, None, 2, 0),  # 0x8e
+    None, None, None, None, None, None, None,
+    (RES_N_iIXIYpNi, 4, 0x00180, 0x00000, False, True, None, None, 2, 0),  # 0x96
+    None, None, None, None, None, None, None,
+    (RES_N_iIXIYpNi, 4, 0x00180, 0x00000, False, True, None, None, 2, 0),  # 0x9e
+    None, None, None, None, None, None, None,
+    (RES_N_iIXIYpNi, 4, 0x00180, 0x00000, False, True, None, None, 2, 0),  # 0xa6
+    None, None, None, None, None, None, None,
+    (RES_N_iIXIYpNi, 4, 0x00180, 0x00000, False, True, None, None, 2, 0),  # 0xae
+    None, None, None, None, None, None, None,
+    (RES_N_iIXIYpNi, 4, 0x00180, 0x00000, False, True, None, None, 2, 0),  # 0xb6
+    None, None, None, None, None, None, None,
+    (RES_N_iIXIYpNi, 4, 0x00180, 0x00000, False, True, None, None, 2, 0),  # 0xbe
+    None, None, None, None, None, None, None,
+    (SET_N_iIXIYpNi, 4, 0x00180, 0x00000, False, True, None, None, 2, 0),  # 0xc6
+    None, None, None, None, None, None, None,
+    (SET_N_iIXIYpNi, 4, 0x00180, 0x00000, False, True, None, None, 2, 0),  # 0xce
+    None, None, None, None, None, None, None,
+    (SET_N_iIXIYpNi, 4, 0x00180, 0x00000, False, True, None, None, 2, 0),  # 0xd6
+    None, None, None, None, None, None, None,
+    (SET_N_iIXIYpNi, 4, 0x00180, 0x00000, False, True, None, None, 2, 0),  # 0xde
+    None, None, None, None, None, None, None,
+    (SET_N_iIXIYpNi, 4, 0x00180, 0x00000, False, True, None, None, 2, 0),  # 0xe6
+    None, None, None, None, None, None, None,
+    (SET_N_iIXIYpNi, 4, 0x00180, 0x00000, False, True, None, None, 2, 0),  # 0xee
+    None, None, None, None, None, None, None,
+    (SET_N_iIXIYpNi, 4, 0x00180, 0x00000, False, True, None, None, 2, 0),  # 0xf6
+    None, None, None, None, None, None, None,
+    (SET_N_iIXIYpNi, 4, 0x00180, 0x00000, False, True, None, None, 2, 0),  # 0xfe
+    None,
+)
+
+FIELDS_DD = (
+    None, None, None, None, None, None, None, None, None,
+    (ADD_IXIY_RR, 2, 0x00186, 0x04180, False, True, None, None, None, 0),  # 0x09
+    None, None, None, None, None, None, None, None, None, None, None, None, None, None, None,
+    (ADD_IXIY_RR, 2, 0x00198, 0x04180, False, True, None, None, None, 0),  # 0x19
+    None, None, None, None, None, None, None,
+    (LD_IXIY_NN, 4, 0x00000, 0x00180, False, True, None, 2, None, 0),  # 0x21
+    None,
+    (INC_IXIY, 2, 0x00180, 0x00180, False, True, None, None, None, 0),  # 0x23
+    None,
+    (DEC_IXIYH, 2, 0x00080, 0x38080, False, True, None, None, None, 0),  # 0x25
+    (LD_IXIYH_N, 3, 0x00000, 0x00080, False, True, 2, None, None, 0),  # 0x26
+    None, None, None,
+    (LD_IXIY_iNNi, 4, 0x00000, 0x00180, False, True, None, 2, None, 0),  # 0x2a
+    (DEC_IXIY, 2, 0x00180, 0x00180, False, True, None, None, None, 0),  # 0x2b
+    None, None, None, None, None, None, None, None, None,
+    (DEC_iIXIYpNi, 3, 0x00180, 0x38000, False, True, None, None, 2, 0),  # 0x35
+    (LD_iIXIYpNi_N, 4, 0x00180, 0x00000, False, True, 3, None, 2, 0),  # 0x36
+    None, None, None, None, None, None, None, None, None, None, None, None, None, None, None,
+    (LD_R_iIXIYpNi, 3, 0x00180, 0x00002, False, True, None, None, 2, 0),  # 0x46
+    None, None, None, None, None, None, None,
+    (LD_R_iIXIYpNi, 3, 0x00180, 0x00004, False, True, None, None, 2, 0),  # 0x4e
+    None, None, None, None, None, None, None,
+    (LD_R_iIXIYpNi, 3, 0x00180, 0x00008, False, True, None, None, 2, 0),  # 0x56
+    None, None, None, None, None, None, None,
+    (LD_R_iIXIYpNi, 3, 0x00180, 0x00010, False, True, None, None, 2, 0),  # 0x5e
+    None, None, None, None, None, None, None,
+    (LD_R_iIXIYpNi, 3, 0x00180, 0x00020, False, True, None, None, 2, 0),  # 0x66
+    None, None, None, None, None, None, None,
+    (LD_R_iIXIYpNi, 3, 0x00180, 0x00040, False, True, None, None, 2, 0),  # 0x6e
+    None,
+    (LD_iIXIYpNi_R, 3, 0x00182, 0x00000, False, True, None, None, 2, 0),  # 0x70
+    (LD_iIXIYpNi_R, 3, 0x00184, 0x00000, False, True, None, None, 2, 0),  # 0x71
+    (LD_iIXIYpNi_R, 3, 0x00188, 0x00000, False, True, None, None, 2, 0),  # 0x72
+    (LD_iIXIYpNi_R, 3, 0x00190, 0x00000, False, True, None, None, 2, 0),  # 0x73
+    (LD_iIXIYpNi_R, 3, 0x001a0, 0x00000, False, True, None, None, 2, 0),  # 0x74
+    (LD_iIXIYpNi_R, 3, 0x001c0, 0x00000, False, True, None, None, 2, 0),  # 0x75
+    None,
+    (LD_iIXIYpNi_R, 3, 0x00181, 0x00000, False, True, None, None, 2, 0),  # 0x77
+    None, None, None, None, None, None,
+    (LD_R_iIXIYpNi, 3, 0x00180, 0x00001, False, True, None, None, 2, 0),  # 0x7e
+    None, None, None, None, None, None, None,
+    (ADD_A_iIXIYpNi, 3, 0x00181, 0x3c001, False, True, None, None, 2, 0),  # 0x86
+    None, None, None, None, None, None, None, None, None, None, None, None, None, None, None, None,
+    None, None, None, None, None, None, None, None, None, None, None, None, None, None, None, None,
+    None, None, None, None, None, None, None,
+    (XOR_iIXIYpNi, 3, 0x00181, 0x3c001, False, True, None, None, 2, 0),  # 0xae
+    None, None, None, None, None, None, None,
+    (OR_iIXIYpNi, 3, 0x00181, 0x3c001, False, True, None, None, 2, 0),  # 0xb6
+    None, None, None, None, None, None, None, None, None, None, None, None, None, None, None, None,
+    None, None, None, None,
+    (FIELDS_DDCB, 3),  # 0xcb
+    None, None, None, None, None, None, None, None, None, None, None, None, None, None, None, None,
+    None, None, None, None, None,
+    (POP_IXIY, 2, 0x00000, 0x00180, False, True, None, None, None, 0),  # 0xe1
+    None, None, None, None, None, None, None, None, None, None, None, None, None, None, None, None,
+    None, None, None, None, None, None, None,
+    (LD_SP_IXIY, 2, 0x00180, 0x00000, False, True, None, None, None, 0),  # 0xf9
+    None, None, None, None, None, None,
+)
+
+FIELDS_ED = (
+    None, None, None, None, None, None, None, None, None, None, None, None, None, None, None, None,
+    None, None, None, None, None, None, None, None, None, None, None, None, None, None, None, None,
+    None, None, None, None, None, None, None, None, None, None, None, None, None, None, None, None,
+    None, None, None, None, None, None, None, None, None, None, None, None, None, None, None, None,
+    None,
+    (OUT_iCi_R, 2, 0x00006, 0x00000, False, True, None, None, None, 0),  # 0x41
+    (SBC_HL_RR, 2, 0x04066, 0x3c060, False, True, None, None, None, 0),  # 0x42
+    (LD_iNNi_BCDE, 4, 0x00006, 0x00000, False, True, None, 2, None, 0),  # 0x43
+    None, None, None, None, None,
+    (OUT_iCi_R, 2, 0x00006, 0x00000, False, True, None, None, None, 0),  # 0x49
+    None,
+    (LD_BCDE_iNNi, 4, 0x00000, 0x00006, False, True, None, 2, None, 0),  # 0x4b
+    None, None, None, None, None,
+    (OUT_iCi_R, 2, 0x0000e, 0x00000, False, True, None, None, None, 0),  # 0x51
+    (SBC_HL_RR, 2, 0x04078, 0x3c060, False, True, None, None, None, 0),  # 0x52
+    (LD_iNNi_BCDE, 4, 0x00018, 0x00000, False, True, None, 2, None, 0),  # 0x53
+    None, None, None, None, None,
+    (OUT_iCi_R, 2, 0x00016, 0x00000, False, True, None, None, None, 0),  # 0x59
+    None,
+    (LD_BCDE_iNNi, 4, 0x00000, 0x00018, False, True, None, 2, None, 0),  # 0x5b
+    None, None, None, None, None,
+    (OUT_iCi_R, 2, 0x00026, 0x00000, False, True, None, None, None, 0),  # 0x61
+    (SBC_HL_RR, 2, 0x04060, 0x3c060, False, True, None, None, None, 0),  # 0x62
+    None, None, None, None, None, None,
+    (OUT_iCi_R, 2, 0x00046, 0x00000, False, True, None, None, None, 0),  # 0x69
+    None, None, None, None, None, None, None, None, None,
+    (LD_iNNi_BCDE, 4, 0x01800, 0x00000, False, True, None, 2, None, 0),  # 0x73
+    None, None, None, None, None,
+    (OUT_iCi_R, 2, 0x00007, 0x00000, False, True, None, None, None, 0),  # 0x79
+    None, None, None, None, None, None, None, None, None, None, None, None, None, None, None, None,
+    None, None, None, None, None, None, None, None, None, None, None, None, None, None, None, None,
+    None, None, None, None, None, None, None, None, None,
+    (OUTI, 2, 0x00066, 0x38062, False, True, None, None, None, 0),  # 0xa3
+    None, None, None, None, None, None, None,
+    (OUTD, 2, 0x00066, 0x38062, False, True, None, None, None, 0),  # 0xab
+    None, None, None, None,
+    (LDIR, 2, 0x0007e, 0x1007e, False, True, None, None, None, 0),  # 0xb0
+    None, None, None, None, None, None, None,
+    (LDDR, 2, 0x0007e, 0x1007e, False, True, None, None, None, 0),  # 0xb8
+    None, None, None, None, None, None, None, None, None, None, None, None, None, None, None, None,
+    None, None, None, None, None, None, None, None, None, None, None, None, None, None, None, None,
+    None, None, None, None, None, None, None, None, None, None, None, None, None, None, None, None,
+    None, None, None, None, None, None, None, None, None, None, None, None, None, None, None, None,
+    None, None, None, None, None, None, None,
+)
+
+FIELDS_CB = (
+    (RLC_R, 2, 0x00002, 0x3c002, False, True, None, None, None, 0),  # 0x00
+    (RLC_R, 2, 0x00004, 0x3c004, False, True, None, None, None, 0),  # 0x01
+    (RLC_R, 2, 0x00008, 0x3c008, False, True, None, None, None, 0),  # 0x02
+    (RLC_R, 2, 0x00010, 0x3c010, False, True, None, None, None, 0),  # 0x03
+    (RLC_R, 2, 0x00020, 0x3c020, False, True, None, None, None, 0),  # 0x04
+    (RLC_R, 2, 0x00040, 0x3c040, False, True, None, None, None, 0),  # 0x05
+    None,
+    (RLC_R, 2, 0x00001, 0x3c001, False, True, None, None, None, 0),  # 0x07
+    None, None, None, None, None, None, None, None,
+    (RL_R, 2, 0x04002, 0x3c002, False, True, None, None, None, 0),  # 0x10
+    (RL_R, 2, 0x04004, 0x3c004, False, True, None, None, None, 0),  # 0x11
+    (RL_R, 2, 0x04008, 0x3c008, False, True, None, None, None, 0),  # 0x12
+    (RL_R, 2, 0x04010, 0x3c010, False, True, None, None, None, 0),  # 0x13
+    (RL_R, 2, 0x04020, 0x3c020, False, True, None, None, None, 0),  # 0x14
+    (RL_R, 2, 0x04040, 0x3c040, False, True, None, None, None, 0),  # 0x15
+    None,
+    (RL_R, 2, 0x04001, 0x3c001, False, True, None, None, None, 0),  # 0x17
+    (RR_R, 2, 0x04002, 0x3c002, False, True, None, None, None, 0),  # 0x18
+    (RR_R, 2, 0x04004, 0x3c004, False, True, None, None, None, 0),  # 0x19
+    (RR_R, 2, 0x04008, 0x3c008, False, True, None, None, None, 0),  # 0x1a
+    (RR_R, 2, 0x04010, 0x3c010, False, True, None, None, None, 0),  # 0x1b
+    (RR_R, 2, 0x04020, 0x3c020, False, True, None, None, None, 0),  # 0x1c
+    (RR_R, 2, 0x04040, 0x3c040, False, True, None, None, None, 0),  # 0x1d
+    None,
+    (RR_R, 2, 0x04001, 0x3c001, False, True, None, None, None, 0),  # 0x1f
+    None, None, None, None, None, None, None, None,
+    (SRA_R, 2, 0x00002, 0x3c002, False, True, None, None, None, 0),  # 0x28
+    (SRA_R, 2, 0x00004, 0x3c004, False, True, None, None, None, 0),  # 0x29
+    (SRA_R, 2, 0x00008, 0x3c008, False, True, None, None, None, 0),  # 0x2a
+    (SRA_R, 2, 0x00010, 0x3c010, False, True, None, None, None, 0),  # 0x2b
+    (SRA_R, 2, 0x00020, 0x3c020, False, True, None, None, None, 0),  # 0x2c
+    (SRA_R, 2, 0x00040, 0x3c040, False, True, None, None, None, 0),  # 0x2d
+    None,
+    (SRA_R, 2, 0x00001, 0x3c001, False, True, None, None, None, 0),  # 0x2f
+    None, None, None, None, None, None, None, None,
+    (SRL_R, 2, 0x00002, 0x3c002, False, True, None, None, None, 0),  # 0x38
+    (SRL_R, 2, 0x00004, 0x3c004, False, True, None, None, None, 0),  # 0x39
+    (SRL_R, 2, 0x00008, 0x3c008, False, True, None, None, None, 0),  # 0x3a
+    (SRL_R, 2, 0x00010, 0x3c010, False, True, None, None, None, 0),  # 0x3b
+    (SRL_R, 2, 0x00020, 0x3c020, False, True, None, None, None, 0),  # 0x3c
+    (SRL_R, 2, 0x00040, 0x3c040, False, True, None, None, None, 0),  # 0x3d
+    None,
+    (SRL_R, 2, 0x00001, 0x3c001, False, True, None, None, None, 0),  # 0x3f
+    (BIT_N_R, 2, 0x00002, 0x38000, False, True, None, None, None, 0),  # 0x40
+    (BIT_N_R, 2, 0x00004, 0x38000, False, True, None, None, None, 0),  # 0x41
+    (BIT_N_R, 2, 0x00008, 0x38000, False, True, None, None, None, 0),  # 0x42
+    (BIT_N_R, 2, 0x00010, 0x38000, False, True, None, None, None, 0),  # 0x43
+    (BIT_N_R, 2, 0x00020, 0x38000, False, True, None, None, None, 0),  # 0x44
+    (BIT_N_R, 2, 0x00040, 0x38000, False, True, None, None, None, 0),  # 0x45
+    (BIT_N_iHLi, 2, 0x00060, 0x38000, False, True, None, None, None, 0),  # 0x46
+    (BIT_N_R, 2, 0x00001, 0x38000, False, True, None, None, None, 0),  # 0x47
+    (BIT_N_R, 2, 0x00002, 0x38000, False, True, None, None, None, 0),  # 0x48
+    (BIT_N_R, 2, 0x00004, 0x38000, False, True, None, None, None, 0),  # 0x49
+    (BIT_N_R, 2, 0x00008, 0x38000, False, True, None, None, None, 0),  # 0x4a
+    (BIT_N_R, 2, 0x00010, 0x38000, False, True, None, None, None, 0),  # 0x4b
+    (BIT_N_R, 2, 0x00020, 0x38000, False, True, None, None, None, 0),  # 0x4c
+    (BIT_N_R, 2, 0x00040, 0x38000, False, True, None, None, None, 0),  # 0x4d
+    (BIT_N_iHLi, 2, 0x00060, 0x38000, False, True, None, None, None, 0),  # 0x4e
+    (BIT_N_R, 2, 0x00001, 0x38000, False, True, None, None, None, 0),  # 0x4f
+    (BIT_N_R, 2, 0x00002, 0x38000, False, True, None, None, None, 0),  # 0x50
+    (BIT_N_R, 2, 0x00004, 0x38000, False, True, None, None, None, 0),  # 0x51
+    (BIT_N_R, 2, 0x00008, 0x38000, False, True, None, None, None, 0),  # 0x52
+    (BIT_N_R, 2, 0x00010, 0x38000, False, True, None, None, None, 0),  # 0x53
+    (BIT_N_R, 2, 0x00020, 0x38000, False, True, None, None, None, 0),  # 0x54
+    (BIT_N_R, 2, 0x00040, 0x38000, False, True, None, None, None, 0),  # 0x55
+    (BIT_N_iHLi, 2, 0x00060, 0x38000, False, True, None, None, None, 0),  # 0x56
+    (BIT_N_R, 2, 0x00001, 0x38000, False, True, None, None, None, 0),  # 0x57
+    (BIT_N_R, 2, 0x00002, 0x38000, False, True, None, None, None, 0),  # 0x58
+    (BIT_N_R, 2, 0x00004, 0x38000, False, True, None, None, None, 0),  # 0x59
+    (BIT_N_R, 2, 0x00008, 0x38000, False, True, None, None, None, 0),  # 0x5a
+    (BIT_N_R, 2, 0x00010, 0x38000, False, True, None, None, None, 0),  # 0x5b
+    (BIT_N_R, 2, 0x00020, 0x38000, False, True, None, None, None, 0),  # 0x5c
+    (BIT_N_R, 2, 0x00040, 0x38000, False, True, None, None, None, 0),  # 0x5d
+    (BIT_N_iHLi, 2, 0x00060, 0x38000, False, True, None, None, None, 0),  # 0x5e
+    (BIT_N_R, 2, 0x00001, 0x38000, False, True, None, None, None, 0),  # 0x5f
+    (BIT_N_R, 2, 0x00002, 0x38000, False, True, None, None, None, 0),  # 0x60
+    (BIT_N_R, 2, 0x00004, 0x38000, False, True, None, None, None, 0),  # 0x61
+    (BIT_N_R, 2, 0x00008, 0x38000, False, True, None, None, None, 0),  # 0x62
+    (BIT_N_R, 2, 0x00010, 0x38000, False, True, None, None, None, 0),  # 0x63
+    (BIT_N_R, 2, 0x00020, 0x38000, False, True, None, None, None, 0),  # 0x64
+    (BIT_N_R, 2, 0x00040, 0x38000, False, True, None, None, None, 0),  # 0x65
+    (BIT_N_iHLi, 2, 0x00060, 0x38000, False, True, None, None, None, 0),  # 0x66
+    (BIT_N_R, 2, 0x00001, 0x38000, False, True, None, None, None, 0),  # 0x67
+    (BIT_N_R, 2, 0x00002, 0x38000, False, True, None, None, None, 0),  # 0x68
+    (BIT_N_R, 2, 0x00004, 0x38000, False, True, None, None, None, 0),  # 0x69
+    (BIT_N_R, 2, 0x00008, 0x38000, False, True, None, None, None, 0),  # 0x6a
+    (BIT_N_R, 2, 0x00010, 0x38000, False, True, None, None, None, 0),  # 0x6b
+    (BIT_N_R, 2, 0x00020, 0x38000, False, True, None, None, None, 0),  # 0x6c
+    (BIT_N_R, 2, 0x00040, 0x38000, False, True, None, None, None, 0),  # 0x6d
+    (BIT_N_iHLi, 2, 0x00060, 0x38000, False, True, None, None, None, 0),  # 0x6e
+    (BIT_N_R, 2, 0x00001, 0x38000, False, True, None, None, None, 0),  # 0x6f
+    (BIT_N_R, 2, 0x00002, 0x38000, False, True, None, None, None, 0),  # 0x70
+    (BIT_N_R, 2, 0x00004, 0x38000, False, True, None, None, None, 0),  # 0x71
+    (BIT_N_R, 2, 0x00008, 0x38000, False, True, None, None, None, 0),  # 0x72
+    (BIT_N_R, 2, 0x00010, 0x38000, False, True, None, None, None, 0),  # 0x73
+    (BIT_N_R, 2, 0x00020, 0x38000, False, True, None, None, None, 0),  # 0x74
+    (BIT_N_R, 2, 0x00040, 0x38000, False, True, None, None, None, 0),  # 0x75
+    (BIT_N_iHLi, 2, 0x00060, 0x38000, False, True, None, None, None, 0),  # 0x76
+    (BIT_N_R, 2, 0x00001, 0x38000, False, True, None, None, None, 0),  # 0x77
+    (BIT_N_R, 2, 0x00002, 0x38000, False, True, None, None, None, 0),  # 0x78
+    (BIT_N_R, 2, 0x00004, 0x38000, False, True, None, None, None, 0),  # 0x79
+    (BIT_N_R, 2, 0x00008, 0x38000, False, True, None, None, None, 0),  # 0x7a
+    (BIT_N_R, 2, 0x00010, 0x38000, False, True, None, None, None, 0),  # 0x7b
+    (BIT_N_R, 2, 0x00020, 0x38000, False, True, None, None, None, 0),  # 0x7c
+    (BIT_N_R, 2, 0x00040, 0x38000, False, True, None, None, None, 0),  # 0x7d
+    (BIT_N_iHLi, 2, 0x00060, 0x38000, False, True, None, None, None, 0),  # 0x7e
+    (BIT_N_R, 2, 0x00001, 0x38000, False, True, None, None, None, 0),  # 0x7f
+    (RES_N_R, 2, 0x00002, 0x00002, False, True, None, None, None, 0),  # 0x80
+    (RES_N_R, 2, 0x00004, 0x00004, False, True, None, None, None, 0),  # 0x81
+    (RES_N_R, 2, 0x00008, 0x00008, False, True, None, None, None, 0),  # 0x82
+    (RES_N_R, 2, 0x00010, 0x00010, False, True, None, None, None, 0),  # 0x83
+    (RES_N_R, 2, 0x00020, 0x00020, False, True, None, None, None, 0),  # 0x84
+    (RES_N_R, 2, 0x00040, 0x00040, False, True, None, None, None, 0),  # 0x85
+    (RES_N_iHLi, 2, 0x00060, 0x00000, False, True, None, None, None, 0),  # 0x86
+    (RES_N_R, 2, 0x00001, 0x00001, False, True, None, None, None, 0),  # 0x87
+    (RES_N_R, 2, 0x00002, 0x00002, False, True, None, None, None, 0),  # 0x88
+    (RES_N_R, 2, 0x00004, 0x00004, False, True, None, None, None, 0),  # 0x89
+    (RES_N_R, 2, 0x00008, 0x00008, False, True, None, None, None, 0),  # 0x8a
+    (RES_N_R, 2, 0x00010, 0x00010, False, True, None, None, None, 0),  # 0x8b
+    (RES_N_R, 2, 0x00020, 0x00020, False, True, None, None, None, 0),  # 0x8c
+    (RES_N_R, 2, 0x00040, 0x00040, False, True, None, None, None, 0),  # 0x8d
+    (RES_N_iHLi, 2, 0x00060, 0x00000, False, True, None, None, None, 0),  # 0x8e
+    (RES_N_R, 2, 0x00001, 0x00001, False, True, None, None, None, 0),  # 0x8f
+    (RES_N_R, 2, 0x00002, 0x00002, False, True, None, None, None, 0),  # 0x90
+    (RES_N_R, 2, 0x00004, 0x00004, False, True, None, None, None, 0),  # 0x91
+    (RES_N_R, 2, 0x00008, 0x00008, False, True, None, None, None, 0),  # 0x92
+    (RES_N_R, 2, 0x00010, 0x00010, False, True, None, None, None, 0),  # 0x93
+    (RES_N_R, 2, 0x00020, 0x00020, False, True, None, None, None, 0),  # 0x94
+    (RES_N_R, 2, 0x00040, 0x00040, False, True, None, None, None, 0),  # 0x95
+    (RES_N_iHLi, 2, 0x00060, 0x00000, False, True, None, None, None, 0),  # 0x96
+    (RES_N_R, 2, 0x00001, 0x00001, False, True, None, None, None, 0),  # 0x97
+    (RES_N_R, 2, 0x00002, 0x00002, False, True, None, None, None, 0),  # 0x98
+    (RES_N_R, 2, 0x00004, 0x00004, False, True, None, None, None, 0),  # 0x99
+    (RES_N_R, 2, 0x00008, 0x00008, False, True, None, None, None, 0),  # 0x9a
+    (RES_N_R, 2, 0x00010, 0x00010, False, True, None, None, None, 0),  # 0x9b
+    (RES_N_R, 2, 0x00020, 0x00020, False, True, None, None, None, 0),  # 0x9c
+    (RES_N_R, 2, 0x00040, 0x00040, False, True, None, None, None, 0),  # 0x9d
+    (RES_N_iHLi, 2, 0x00060, 0x00000, False, True, None, None, None, 0),  # 0x9e
+    (RES_N_R, 2, 0x00001, 0x00001, False, True, None, None, None, 0),  # 0x9f
+    (RES_N_R, 2, 0x00002, 0x00002, False, True, None, None, None, 0),  # 0xa0
+    (RES_N_R, 2, 0x00004, 0x00004, False, True, None, None, None, 0),  # 0xa1
+    (RES_N_R, 2, 0x00008, 0x00008, False, True, None, None, None, 0),  # 0xa2
+    (RES_N_R, 2, 0x00010, 0x00010, False, True, None, None, None, 0),  # 0xa3
+    (RES_N_R, 2, 0x00020, 0x00020, False, True, None, None, None, 0),  # 0xa4
+    (RES_N_R, 2, 0x00040, 0x00040, False, True, None, None, None, 0),  # 0xa5
+    (RES_N_iHLi, 2, 0x00060, 0x00000, False, True, None, None, None, 0),  # 0xa6
+    (RES_N_R, 2, 0x00001, 0x00001, False, True, None, None, None, 0),  # 0xa7
+    (RES_N_R, 2, 0x00002, 0x00002, False, True, None, None, None, 0),  # 0xa8
+    (RES_N_R, 2, 0x00004, 0x00004, False, True, None, None, None, 0),  # 0xa9
+    (RES_N_R, 2, 0x00008, 0x00008, False, True, None, None, None, 0),  # 0xaa
+    (RES_N_R, 2, 0x00010, 0x00010, False, True, None, None, None, 0),  # 0xab
+    (RES_N_R, 2, 0x00020, 0x00020, False, True, None, None, None, 0),  # 0xac
+    (RES_N_R, 2, 0x00040, 0x00040, False, True, None, None, None, 0),  # 0xad
+    (RES_N_iHLi, 2, 0x00060, 0x00000, False, True, None, None, None, 0),  # 0xae
+    (RES_N_R, 2, 0x00001, 0x00001, False, True, None, None, None, 0),  # 0xaf
+    (RES_N_R, 2, 0x00002, 0x00002, False, True, None, None, None, 0),  # 0xb0
+    (RES_N_R, 2, 0x00004, 0x00004, False, True, None, None, None, 0),  # 0xb1
+    (RES_N_R, 2, 0x00008, 0x00008, False, True, None, None, None, 0),  # 0xb2
+    (RES_N_R, 2, 0x00010, 0x00010, False, True, None, None, None, 0),  # 0xb3
+    (RES_N_R, 2, 0x00020, 0x00020, False, True, None, None, None, 0),  # 0xb4
+    (RES_N_R, 2, 0x00040, 0x00040, False, True, None, None, None, 0),  # 0xb5
+    (RES_N_iHLi, 2, 0x00060, 0x00000, False, True, None, None, None, 0),  # 0xb6
+    (RES_N_R, 2, 0x00001, 0x00001, False, True, None, None, None, 0),  # 0xb7
+    (RES_N_R, 2, 0x00002, 0x00002, False, True, None, None, None, 0),  # 0xb8
+    (RES_N_R, 2, 0x00004, 0x00004, False, True, None, None, None, 0),  # 0xb9
+    (RES_N_R, 2, 0x00008, 0x00008, False, True, None, None, None, 0),  # 0xba
+    (RES_N_R, 2, 0x00010, 0x00010, False, True, None, None, None, 0),  # 0xbb
+    (RES_N_R, 2, 0x00020, 0x00020, False, True, None, None, None, 0),  # 0xbc
+    (RES_N_R, 2, 0x00040, 0x00040, False, True, None, None, None, 0),  # 0xbd
+    (RES_N_iHLi, 2, 0x00060, 0x00000, False, True, None, None, None, 0),  # 0xbe
+    (RES_N_R, 2, 0x00001, 0x00001, False, True, None, None, None, 0),  # 0xbf
+    (SET_N_R, 2, 0x00002, 0x00002, False, True, None, None, None, 0),  # 0xc0
+    (SET_N_R, 2, 0x00004, 0x00004, False, True, None, None, None, 0),  # 0xc1
+    (SET_N_R, 2, 0x00008, 0x00008, False, True, None, None, None, 0),  # 0xc2
+    (SET_N_R, 2, 0x00010, 0x00010, False, True, None, None, None, 0),  # 0xc3
+    (SET_N_R, 2, 0x00020, 0x00020, False, True, None, None, None, 0),  # 0xc4
+    (SET_N_R, 2, 0x00040, 0x00040, False, True, None, None, None, 0),  # 0xc5
+    (SET_N_iHLi, 2, 0x00060, 0x00000, False, True, None, None, None, 0),  # 0xc6
+    (SET_N_R, 2, 0x00001, 0x00001, False, True, None, None, None, 0),  # 0xc7
+    (SET_N_R, 2, 0x00002, 0x00002, False, True, None, None, None, 0),  # 0xc8
+    (SET_N_R, 2, 0x00004, 0x00004, False, True, None, None, None, 0),  # 0xc9
+    (SET_N_R, 2, 0x00008, 0x00008, False, True, None, None, None, 0),  # 0xca
+    (SET_N_R, 2, 0x00010, 0x00010, False, True, None, None, None, 0),  # 0xcb
+    (SET_N_R, 2, 0x00020, 0x00020, False, True, None, None, None, 0),  # 0xcc
+    (SET_N_R, 2, 0x00040, 0x00040, False, True, None, None, None, 0),  # 0xcd
+    (SET_N_iHLi, 2, 0x00060, 0x00000, False, True, None, None, None, 0),  # 0xce
+    (SET_N_R, 2, 0x00001, 0x00001, False, True, None, None, None, 0),  # 0xcf
+    (SET_N_R, 2, 0x00002, 0x00002, False, True, None, None, None, 0),  # 0xd0
+    (SET_N_R, 2, 0x00004, 0x00004, False, True, None, None, None, 0),  # 0xd1
+    (SET_N_R, 2, 0x00008, 0x00008, False, True, None, None, None, 0),  # 0xd2
+    (SET_N_R, 2, 0x00010, 0x00010, False, True, None, None, None, 0),  # 0xd3
+    (SET_N_R, 2, 0x00020, 0x00020, False, True, None, None, None, 0),  # 0xd4
+    (SET_N_R, 2, 0x00040, 0x00040, False, True, None, None, None, 0),  # 0xd5
+    (SET_N_iHLi, 2, 0x00060, 0x00000, False, True, None, None, None, 0),  # 0xd6
+    (SET_N_R, 2, 0x00001, 0x00001, False, True, None, None, None, 0),  # 0xd7
+    (SET_N_R, 2, 0x00002, 0x00002, False, True, None, None, None, 0),  # 0xd8
+    (SET_N_R, 2, 0x00004, 0x00004, False, True, None, None, None, 0),  # 0xd9
+    (SET_N_R, 2, 0x00008, 0x00008, False, True, None, None, None, 0),  # 0xda
+    (SET_N_R, 2, 0x00010, 0x00010, False, True, None, None, None, 0),  # 0xdb
+    (SET_N_R, 2, 0x00020, 0x00020, False, True, None, None, None, 0),  # 0xdc
+    (SET_N_R, 2, 0x00040, 0x00040, False, True, None, None, None, 0),  # 0xdd
+    (SET_N_iHLi, 2, 0x00060, 0x00000, False, True, None, None, None, 0),  # 0xde
+    (SET_N_R, 2, 0x00001, 0x00001, False, True, None, None, None, 0),  # 0xdf
+    (SET_N_R, 2, 0x00002, 0x00002, False, True, None, None, None, 0),  # 0xe0
+    (SET_N_R, 2, 0x00004, 0x00004, False, True, None, None, None, 0),  # 0xe1
+    (SET_N_R, 2, 0x00008, 0x00008, False, True, None, None, None, 0),  # 0xe2
+    (SET_N_R, 2, 0x00010, 0x00010, False, True, None, None, None, 0),  # 0xe3
+    (SET_N_R, 2, 0x00020, 0x00020, False, True, None, None, None, 0),  # 0xe4
+    (SET_N_R, 2, 0x00040, 0x00040, False, True, None, None, None, 0),  # 0xe5
+    (SET_N_iHLi, 2, 0x00060, 0x00000, False, True, None, None, None, 0),  # 0xe6
+    (SET_N_R, 2, 0x00001, 0x00001, False, True, None, None, None, 0),  # 0xe7
+    (SET_N_R, 2, 0x00002, 0x00002, False, True, None, None, None, 0),  # 0xe8
+    (SET_N_R, 2, 0x00004, 0x00004, False, True, None, None, None, 0),  # 0xe9
+    (SET_N_R, 2, 0x00008, 0x00008, False, True, None, None, None, 0),  # 0xea
+    (SET_N_R, 2, 0x00010, 0x00010, False, True, None, None, None, 0),  # 0xeb
+    (SET_N_R, 2, 0x00020, 0x00020, False, True, None, None, None, 0),  # 0xec
+    (SET_N_R, 2, 0x00040, 0x00040, False, True, None, None, None, 0),  # 0xed
+    (SET_N_iHLi, 2, 0x00060, 0x00000, False, True, None, None, None, 0),  # 0xee
+    (SET_N_R, 2, 0x00001, 0x00001, False, True, None, None, None, 0),  # 0xef
+    (SET_N_R, 2, 0x00002, 0x00002, False, True, None, None, None, 0),  # 0xf0
+    (SET_N_R, 2, 0x00004, 0x00004, False, True, None, None, None, 0),  # 0xf1
+    (SET_N_R, 2, 0x00008, 0x00008, False, True, None, None, None, 0),  # 0xf2
+    (SET_N_R, 2, 0x00010, 0x00010, False, True, None, None, None, 0),  # 0xf3
+    (SET_N_R, 2, 0x00020, 0x00020, False, True, None, None, None, 0),  # 0xf4
+    (SET_N_R, 2, 0x00040, 0x00040, False, True, None, None, None, 0),  # 0xf5
+    (SET_N_iHLi, 2, 0x00060, 0x00000, False, True, None, None, None, 0),  # 0xf6
+    (SET_N_R, 2, 0x00001, 0x00001, False, True, None, None, None, 0),  # 0xf7
+    (SET_N_R, 2, 0x00002, 0x00002, False, True, None, None, None, 0),  # 0xf8
+    (SET_N_R, 2, 0x00004, 0x00004, False, True, None, None, None, 0),  # 0xf9
+    (SET_N_R, 2, 0x00008, 0x00008, False, True, None, None, None, 0),  # 0xfa
+    (SET_N_R, 2, 0x00010, 0x00010, False, True, None, None, None, 0),  # 0xfb
+    (SET_N_R, 2, 0x00020, 0x00020, False, True, None, None, None, 0),  # 0xfc
+    (SET_N_R, 2, 0x00040, 0x00040, False, True, None, None, None, 0),  # 0xfd
+    (SET_N_iHLi, 2, 0x00060, 0x00000, False, True, None, None, None, 0),  # 0xfe
+    (SET_N_R, 2, 0x00001, 0x00001, False, True, None, None, None, 0),  # 0xff
+)
+
+FIELDS_MAIN = (
+    None,
+    (LD_RR_NN, 3, 0x00000, 0x00006, False, True, None, 1, None, 0),  # 0x01
+    (LD_iRRi_A, 1, 0x00007, 0x00000, False, True, None, None, None, 0),  # 0x02
+    (INC_RR, 1, 0x00006, 0x00006, False, True, None, None, None, 0),  # 0x03
+    (INC_R, 1, 0x00002, 0x38002, False, True, None, None, None, 0),  # 0x04
+    (DEC_R, 1, 0x00002, 0x38002, False, True, None, None, None, 0),  # 0x05
+    (LD_R_N, 2, 0x00000, 0x00002, False, True, 1, None, None, 0),  # 0x06
+    (RLCA, 1, 0x00001, 0x04001, False, True, None, None, None, 0),  # 0x07
+    (EX_AF_AF, 1, 0x3e001, 0x3e001, False, True, None, None, None, 0),  # 0x08
+    (ADD_HL_RR, 1, 0x00066, 0x04060, False, True, None, None, None, 0),  # 0x09
+    (LD_A_iRRi, 1, 0x00006, 0x00001, False, True, None, None, None, 0),  # 0x0a
+    (DEC_RR, 1, 0x00006, 0x00006, False, True, None, None, None, 0),  # 0x0b
+    (INC_R, 1, 0x00004, 0x38004, False, True, None, None, None, 0),  # 0x0c
+    (DEC_R, 1, 0x00004, 0x38004, False, True, None, None, None, 0),  # 0x0d
+    (LD_R_N, 2, 0x00000, 0x00004, False, True, 1, None, None, 0),  # 0x0e
+    (RRCA, 1, 0x00001, 0x04001, False, True, None, None, None, 0),  # 0x0f
+    (DJNZ_NN, 2, 0x00002, 0x00002, False, True, None, None, 1, 2),  # 0x10
+    (LD_RR_NN, 3, 0x00000, 0x00018, False, True, None, 1, None, 0),  # 0x11
+    (LD_iRRi_A, 1, 0x00019, 0x00000, False, True, None, None, None, 0),  # 0x12
+    (INC_RR, 1, 0x00018, 0x00018, False, True, None, None, None, 0),  # 0x13
+    (INC_R, 1, 0x00008, 0x38008, False, True, None, None, None, 0),  # 0x14
+    (DEC_R, 1, 0x00008, 0x38008, False, True, None, None, None, 0),  # 0x15
+    (LD_R_N, 2, 0x00000, 0x00008, False, True, 1, None, None, 0),  # 0x16
+    (RLA, 1, 0x04001, 0x04001, False, True, None, None, None, 0),  # 0x17
+    (JR_NN, 2, 0x00000, 0x00000, False, False, None, None, 1, 2),  # 0x18
+    (ADD_HL_RR, 1, 0x00078, 0x04060, False, True, None, None, None, 0),  # 0x19
+    (LD_A_iRRi, 1, 0x00018, 0x00001, False, True, None, None, None, 0),  # 0x1a
+    (DEC_RR, 1, 0x00018, 0x00018, False, True, None, None, None, 0),  # 0x1b
+    (INC_R, 1, 0x00010, 0x38010, False, True, None, None, None, 0),  # 0x1c
+    (DEC_R, 1, 0x00010, 0x38010, False, True, None, None, None, 0),  # 0x1d
+    (LD_R_N, 2, 0x00000, 0x00010, False, True, 1, None, None, 0),  # 0x1e
+    (RRA, 1, 0x04001, 0x04001, False, True, None, None, None, 0),  # 0x1f
+    (JR_C_NN, 2, 0x08000, 0x00000, False, True, None, None, 1, 2),  # 0x20
+    (LD_RR_NN, 3, 0x00000, 0x00060, False, True, None, 1, None, 0),  # 0x21
+    (LD_iNNi_HL, 3, 0x00060, 0x00000, False, True, None, 1, None, 0),  # 0x22
+    (INC_RR, 1, 0x00060, 0x00060, False, True, None, None, None, 0),  # 0x23
+    (INC_R, 1, 0x00020, 0x38020, False, True, None, None, None, 0),  # 0x24
+    (DEC_R, 1, 0x00020, 0x38020, False, True, None, None, None, 0),  # 0x25
+    (LD_R_N, 2, 0x00000, 0x00020, False, True, 1, None, None, 0),  # 0x26
+    None,
+    (JR_C_NN, 2, 0x08000, 0x00000, False, True, None, None, 1, 2),  # 0x28
+    (ADD_HL_RR, 1, 0x00060, 0x04060, False, True, None, None, None, 0),  # 0x29
+    (LD_HL_iNNi, 3, 0x00000, 0x00060, False, True, None, 1, None, 0),  # 0x2a
+    (DEC_RR, 1, 0x00060, 0x00060, False, True, None, None, None, 0),  # 0x2b
+    (INC_R, 1, 0x00040, 0x38040, False, True, None, None, None, 0),  # 0x2c
+    (DEC_R, 1, 0x00040, 0x38040, False, True, None, None, None, 0),  # 0x2d
+    (LD_R_N, 2, 0x00000, 0x00040, False, True, 1, None, None, 0),  # 0x2e
+    None,
+    (JR_C_NN, 2, 0x04000, 0x00000, False, True, None, None, 1, 2),  # 0x30
+    (LD_RR_NN, 3, 0x00000, 0x01800, False, True, None, 1, None, 0),  # 0x31
+    (LD_iNNi_A, 3, 0x00001, 0x00000, False, True, None, 1, None, 0),  # 0x32
+    None,
+    (INC_iHLi, 1, 0x00060, 0x38000, False, True, None, None, None, 0),  # 0x34
+    (DEC_iHLi, 1, 0x00060, 0x38000, False, True, None, None, None, 0),  # 0x35
+    None, None,
+    (JR_C_NN, 2, 0x04000, 0x00000, False, True, None, None, 1, 2),  # 0x38
+    (ADD_HL_RR, 1, 0x01860, 0x04060, False, True, None, None, None, 0),  # 0x39
+    (LD_A_iNNi, 3, 0x00000, 0x00001, False, True, None, 1, None, 0),  # 0x3a
+    None,
+    (INC_R, 1, 0x00001, 0x38001, False, True, None, None, None, 0),  # 0x3c
+    (DEC_R, 1, 0x00001, 0x38001, False, True, None, None, None, 0),  # 0x3d
+    (LD_R_N, 2, 0x00000, 0x00001, False, True, 1, None, None, 0),  # 0x3e
+    None,
+    (LD_R_R, 1, 0x00002, 0x00002, False, True, None, None, None, 0),  # 0x40
+    (LD_R_R, 1, 0x00004, 0x00002, False, True, None, None, None, 0),  # 0x41
+    (LD_R_R, 1, 0x00008, 0x00002, False, True, None, None, None, 0),  # 0x42
+    (LD_R_R, 1, 0x00010, 0x00002, False, True, None, None, None, 0),  # 0x43
+    (LD_R_R, 1, 0x00020, 0x00002, False, True, None, None, None, 0),  # 0x44
+    (LD_R_R, 1, 0x00040, 0x00002, False, True, None, None, None, 0),  # 0x45
+    (LD_R_iHLi, 1, 0x00060, 0x00002, False, True, None, None, None, 0),  # 0x46
+    (LD_R_R, 1, 0x00001, 0x00002, False, True, None, None, None, 0),  # 0x47
+    (LD_R_R, 1, 0x00002, 0x00004, False, True, None, None, None, 0),  # 0x48
+    (LD_R_R, 1, 0x00004, 0x00004, False, True, None, None, None, 0),  # 0x49
+    (LD_R_R, 1, 0x00008, 0x00004, False, True, None, None, None, 0),  # 0x4a
+    (LD_R_R, 1, 0x00010, 0x00004, False, True, None, None, None, 0),  # 0x4b
+    (LD_R_R, 1, 0x00020, 0x00004, False, True, None, None, None, 0),  # 0x4c
+    (LD_R_R, 1, 0x00040, 0x00004, False, True, None, None, None, 0),  # 0x4d
+    (LD_R_iHLi, 1, 0x00060, 0x00004, False, True, None, None, None, 0),  # 0x4e
+    (LD_R_R, 1, 0x00001, 0x00004, False, True, None, None, None, 0),  # 0x4f
+    (LD_R_R, 1, 0x00002, 0x00008, False, True, None, None, None, 0),  # 0x50
+    (LD_R_R, 1, 0x00004, 0x00008, False, True, None, None, None, 0),  # 0x51
+    (LD_R_R, 1, 0x00008, 0x00008, False, True, None, None, None, 0),  # 0x52
+    (LD_R_R, 1, 0x00010, 0x00008, False, True, None, None, None, 0),  # 0x53
+    (LD_R_R, 1, 0x00020, 0x00008, False, True, None, None, None, 0),  # 0x54
+    (LD_R_R, 1, 0x00040, 0x00008, False, True, None, None, None, 0),  # 0x55
+    (LD_R_iHLi, 1, 0x00060, 0x00008, False, True, None, None, None, 0),  # 0x56
+    (LD_R_R, 1, 0x00001, 0x00008, False, True, None, None, None, 0),  # 0x57
+    (LD_R_R, 1, 0x00002, 0x00010, False, True, None, None, None, 0),  # 0x58
+    (LD_R_R, 1, 0x00004, 0x00010, False, True, None, None, None, 0),  # 0x59
+    (LD_R_R, 1, 0x00008, 0x00010, False, True, None, None, None, 0),  # 0x5a
+    (LD_R_R, 1, 0x00010, 0x00010, False, True, None, None, None, 0),  # 0x5b
+    (LD_R_R, 1, 0x00020, 0x00010, False, True, None, None, None, 0),  # 0x5c
+    (LD_R_R, 1, 0x00040, 0x00010, False, True, None, None, None, 0),  # 0x5d
+    (LD_R_iHLi, 1, 0x00060, 0x00010, False, True, None, None, None, 0),  # 0x5e
+    (LD_R_R, 1, 0x00001, 0x00010, False, True, None, None, None, 0),  # 0x5f
+    (LD_R_R, 1, 0x00002, 0x00020, False, True, None, None, None, 0),  # 0x60
+    (LD_R_R, 1, 0x00004, 0x00020, False, True, None, None, None, 0),  # 0x61
+    (LD_R_R, 1, 0x00008, 0x00020, False, True, None, None, None, 0),  # 0x62
+    (LD_R_R, 1, 0x00010, 0x00020, False, True, None, None, None, 0),  # 0x63
+    (LD_R_R, 1, 0x00020, 0x00020, False, True, None, None, None, 0),  # 0x64
+    (LD_R_R, 1, 0x00040, 0x00020, False, True, None, None, None, 0),  # 0x65
+    (LD_R_iHLi, 1, 0x00060, 0x00020, False, True, None, None, None, 0),  # 0x66
+    (LD_R_R, 1, 0x00001, 0x00020, False, True, None, None, None, 0),  # 0x67
+    (LD_R_R, 1, 0x00002, 0x00040, False, True, None, None, None, 0),  # 0x68
+    (LD_R_R, 1, 0x00004, 0x00040, False, True, None, None, None, 0),  # 0x69
+    (LD_R_R, 1, 0x00008, 0x00040, False, True, None, None, None, 0),  # 0x6a
+    (LD_R_R, 1, 0x00010, 0x00040, False, True, None, None, None, 0),  # 0x6b
+    (LD_R_R, 1, 0x00020, 0x00040, False, True, None, None, None, 0),  # 0x6c
+    (LD_R_R, 1, 0x00040, 0x00040, False, True, None, None, None, 0),  # 0x6d
+    (LD_R_iHLi, 1, 0x00060, 0x00040, False, True, None, None, None, 0),  # 0x6e
+    (LD_R_R, 1, 0x00001, 0x00040, False, True, None, None, None, 0),  # 0x6f
+    (LD_iHLi_R, 1, 0x00062, 0x00000, False, True, None, None, None, 0),  # 0x70
+    (LD_iHLi_R, 1, 0x00064, 0x00000, False, True, None, None, None, 0),  # 0x71
+    (LD_iHLi_R, 1, 0x00068, 0x00000, False, True, None, None, None, 0),  # 0x72
+    (LD_iHLi_R, 1, 0x00070, 0x00000, False, True, None, None, None, 0),  # 0x73
+    (LD_iHLi_R, 1, 0x00060, 0x00000, False, True, None, None, None, 0),  # 0x74
+    (LD_iHLi_R, 1, 0x00060, 0x00000, False, True, None, None, None, 0),  # 0x75
+    None,
+    (LD_iHLi_R, 1, 0x00061, 0x00000, False, True, None, None, None, 0),  # 0x77
+    (LD_R_R, 1, 0x00002, 0x00001, False, True, None, None, None, 0),  # 0x78
+    (LD_R_R, 1, 0x00004, 0x00001, False, True, None, None, None, 0),  # 0x79
+    (LD_R_R, 1, 0x00008, 0x00001, False, True, None, None, None, 0),  # 0x7a
+    (LD_R_R, 1, 0x00010, 0x00001, False, True, None, None, None, 0),  # 0x7b
+    (LD_R_R, 1, 0x00020, 0x00001, False, True, None, None, None, 0),  # 0x7c
+    (LD_R_R, 1, 0x00040, 0x00001, False, True, None, None, None, 0),  # 0x7d
+    (LD_R_iHLi, 1, 0x00060, 0x00001, False, True, None, None, None, 0),  # 0x7e
+    (LD_R_R, 1, 0x00001, 0x00001, False, True, None, None, None, 0),  # 0x7f
+    (ADD_A_R, 1, 0x00003, 0x3c001, False, True, None, None, None, 0),  # 0x80
+    (ADD_A_R, 1, 0x00005, 0x3c001, False, True, None, None, None, 0),  # 0x81
+    (ADD_A_R, 1, 0x00009, 0x3c001, False, True, None, None, None, 0),  # 0x82
+    (ADD_A_R, 1, 0x00011, 0x3c001, False, True, None, None, None, 0),  # 0x83
+    (ADD_A_R, 1, 0x00021, 0x3c001, False, True, None, None, None, 0),  # 0x84
+    (ADD_A_R, 1, 0x00041, 0x3c001, False, True, None, None, None, 0),  # 0x85
+    (ADD_A_iHLi, 1, 0x00061, 0x3c001, False, True, None, None, None, 0),  # 0x86
+    (ADD_A_R, 1, 0x00001, 0x3c001, False, True, None, None, None, 0),  # 0x87
+    (ADC_A_R, 1, 0x04003, 0x3c001, False, True, None, None, None, 0),  # 0x88
+    (ADC_A_R, 1, 0x04005, 0x3c001, False, True, None, None, None, 0),  # 0x89
+    (ADC_A_R, 1, 0x04009, 0x3c001, False, True, None, None, None, 0),  # 0x8a
+    (ADC_A_R, 1, 0x04011, 0x3c001, False, True, None, None, None, 0),  # 0x8b
+    (ADC_A_R, 1, 0x04021, 0x3c001, False, True, None, None, None, 0),  # 0x8c
+    (ADC_A_R, 1, 0x04041, 0x3c001, False, True, None, None, None, 0),  # 0x8d
+    None,
+    (ADC_A_R, 1, 0x04001, 0x3c001, False, True, None, None, None, 0),  # 0x8f
+    (SUB_R, 1, 0x00003, 0x3c001, False, True, None, None, None, 0),  # 0x90
+    (SUB_R, 1, 0x00005, 0x3c001, False, True, None, None, None, 0),  # 0x91
+    (SUB_R, 1, 0x00009, 0x3c001, False, True, None, None, None, 0),  # 0x92
+    (SUB_R, 1, 0x00011, 0x3c001, False, True, None, None, None, 0),  # 0x93
+    (SUB_R, 1, 0x00021, 0x3c001, False, True, None, None, None, 0),  # 0x94
+    (SUB_R, 1, 0x00041, 0x3c001, False, True, None, None, None, 0),  # 0x95
+    None,
+    (SUB_R, 1, 0x00001, 0x3c001, False, True, None, None, None, 0),  # 0x97
+    (SBC_A_R, 1, 0x04003, 0x3c001, False, True, None, None, None, 0),  # 0x98
+    (SBC_A_R, 1, 0x04005, 0x3c001, False, True, None, None, None, 0),  # 0x99
+    (SBC_A_R, 1, 0x04009, 0x3c001, False, True, None, None, None, 0),  # 0x9a
+    (SBC_A_R, 1, 0x04011, 0x3c001, False, True, None, None, None, 0),  # 0x9b
+    (SBC_A_R, 1, 0x04021, 0x3c001, False, True, None, None, None, 0),  # 0x9c
+    (SBC_A_R, 1, 0x04041, 0x3c001, False, True, None, None, None, 0),  # 0x9d
+    None,
+    (SBC_A_R, 1, 0x04001, 0x3c001, False, True, None, None, None, 0),  # 0x9f
+    (AND_R, 1, 0x00003, 0x3c001, False, True, None, None, None, 0),  # 0xa0
+    (AND_R, 1, 0x00005, 0x3c001, False, True, None, None, None, 0),  # 0xa1
+    (AND_R, 1, 0x00009, 0x3c001, False, True, None, None, None, 0),  # 0xa2
+    (AND_R, 1, 0x00011, 0x3c001, False, True, None, None, None, 0),  # 0xa3
+    (AND_R, 1, 0x00021, 0x3c001, False, True, None, None, None, 0),  # 0xa4
+    (AND_R, 1, 0x00041, 0x3c001, False, True, None, None, None, 0),  # 0xa5
+    None,
+    (AND_R, 1, 0x00001, 0x3c001, False, True, None, None, None, 0),  # 0xa7
+    (XOR_R, 1, 0x00003, 0x3c001, False, True, None, None, None, 0),  # 0xa8
+    (XOR_R, 1, 0x00005, 0x3c001, False, True, None, None, None, 0),  # 0xa9
+    (XOR_R, 1, 0x00009, 0x3c001, False, True, None, None, None, 0),  # 0xaa
+    (XOR_R, 1, 0x00011, 0x3c001, False, True, None, None, None, 0),  # 0xab
+    (XOR_R, 1, 0x00021, 0x3c001, False, True, None, None, None, 0),  # 0xac
+    (XOR_R, 1, 0x00041, 0x3c001, False, True, None, None, None, 0),  # 0xad
+    None,
+    (XOR_R, 1, 0x00001, 0x3c001, False, True, None, None, None, 0),  # 0xaf
+    (OR_R, 1, 0x00003, 0x3c001, False, True, None, None, None, 0),  # 0xb0
+    (OR_R, 1, 0x00005, 0x3c001, False, True, None, None, None, 0),  # 0xb1
+    (OR_R, 1, 0x00009, 0x3c001, False, True, None, None, None, 0),  # 0xb2
+    (OR_R, 1, 0x00011, 0x3c001, False, True, None, None, None, 0),  # 0xb3
+    (OR_R, 1, 0x00021, 0x3c001, False, True, None, None, None, 0),  # 0xb4
+    (OR_R, 1, 0x00041, 0x3c001, False, True, None, None, None, 0),  # 0xb5
+    (OR_iHLi, 1, 0x00061, 0x3c001, False, True, None, None, None, 0),  # 0xb6
+    (OR_R, 1, 0x00001, 0x3c001, False, True, None, None, None, 0),  # 0xb7
+    (CP_R, 1, 0x00003, 0x3c000, False, True, None, None, None, 0),  # 0xb8
+    (CP_R, 1, 0x00005, 0x3c000, False, True, None, None, None, 0),  # 0xb9
+    (CP_R, 1, 0x00009, 0x3c000, False, True, None, None, None, 0),  # 0xba
+    (CP_R, 1, 0x00011, 0x3c000, False, True, None, None, None, 0),  # 0xbb
+    (CP_R, 1, 0x00021, 0x3c000, False, True, None, None, None, 0),  # 0xbc
+    (CP_R, 1, 0x00041, 0x3c000, False, True, None, None, None, 0),  # 0xbd
+    (CP_iHLi, 1, 0x00061, 0x3c000, False, True, None, None, None, 0),  # 0xbe
+    (CP_R, 1, 0x00001, 0x3c000, False, True, None, None, None, 0),  # 0xbf
+    (RET_C, 1, 0x08000, 0x00000, True, True, None, None, None, 0),  # 0xc0
+    (POP_RR, 1, 0x00000, 0x00006, False, True, None, None, None, 0),  # 0xc1
+    (JP_C_NN, 3, 0x08000, 0x00000, False, True, None, 1, None, 1),  # 0xc2
+    (JP_NN, 3, 0x00000, 0x00000, False, False, None, 1, None, 1),  # 0xc3
+    (CALL_C_NN, 3, 0x08000, 0x00000, False, True, None, 1, None, 3),  # 0xc4
+    (PUSH_RR, 1, 0x00006, 0x00000, False, True, None, None, None, 0),  # 0xc5
+    (ADD_A_N, 2, 0x00001, 0x3c001, False, True, 1, None, None, 0),  # 0xc6
+    None,
+    (RET_C, 1, 0x08000, 0x00000, True, True, None, None, None, 0),  # 0xc8
+    (RET, 1, 0x00000, 0x00000, True, False, None, None, None, 0),  # 0xc9
+    (JP_C_NN, 3, 0x08000, 0x00000, False, True, None, 1, None, 1),  # 0xca
+    (FIELDS_CB, 1),  # 0xcb
+    (CALL_C_NN, 3, 0x08000, 0x00000, False, True, None, 1, None, 3),  # 0xcc
+    (CALL_NN, 3, 0x00000, 0x00000, False, False, None, 1, None, 3),  # 0xcd
+    (ADC_A_N, 2, 0x04001, 0x3c001, False, True, 1, None, None, 0),  # 0xce
+    None,
+    (RET_C, 1, 0x04000, 0x00000, True, True, None, None, None, 0),  # 0xd0
+    (POP_RR, 1, 0x00000, 0x00018, False, True, None, None, None, 0),  # 0xd1
+    (JP_C_NN, 3, 0x04000, 0x00000, False, True, None, 1, None, 1),  # 0xd2
+    None,
+    (CALL_C_NN, 3, 0x04000, 0x00000, False, True, None, 1, None, 3),  # 0xd4
+    (PUSH_RR, 1, 0x00018, 0x00000, False, True, None, None, None, 0),  # 0xd5
+    (SUB_N, 2, 0x00001, 0x3c001, False, True, 1, None, None, 0),  # 0xd6
+    None,
+    (RET_C, 1, 0x04000, 0x00000, True, True, None, None, None, 0),  # 0xd8
+    None,
+    (JP_C_NN, 3, 0x04000, 0x00000, False, True, None, 1, None, 1),  # 0xda
+    None,
+    (CALL_C_NN, 3, 0x04000, 0x00000, False, True, None, 1, None, 3),  # 0xdc
+    (FIELDS_DD, 1),  # 0xdd
+    None, None,
+    (RET_C, 1, 0x10000, 0x00000, True, True, None, None, None, 0),  # 0xe0
+    (POP_RR, 1, 0x00000, 0x00060, False, True, None, None, None, 0),  # 0xe1
+    (JP_C_NN, 3, 0x10000, 0x00000, False, True, None, 1, None, 1),  # 0xe2
+    (EX_iSPi_HL, 1, 0x00060, 0x00060, False, True, None, None, None, 0),  # 0xe3
+    (CALL_C_NN, 3, 0x10000, 0x00000, False, True, None, 1, None, 3),  # 0xe4
+    (PUSH_RR, 1, 0x00060, 0x00000, False, True, None, None, None, 0),  # 0xe5
+    (AND_N, 2, 0x00001, 0x3c001, False, True, 1, None, None, 0),  # 0xe6
+    None,
+    (RET_C, 1, 0x10000, 0x00000, True, True, None, None, None, 0),  # 0xe8
+    None,
+    (JP_C_NN, 3, 0x10000, 0x00000, False, True, None, 1, None, 1),  # 0xea
+    (EX_DE_HL, 1, 0x00078, 0x00078, False, True, None, None, None, 0),  # 0xeb
+    (CALL_C_NN, 3, 0x10000, 0x00000, False, True, None, 1, None, 3),  # 0xec
+    (FIELDS_ED, 1),  # 0xed
+    None, None,
+    (RET_C, 1, 0x20000, 0x00000, True, True, None, None, None, 0),  # 0xf0
+    (POP_RR, 1, 0x00000, 0x3c001, False, True, None, None, None, 0),  # 0xf1
+    (JP_C_NN, 3, 0x20000, 0x00000, False, True, None, 1, None, 1),  # 0xf2
+    (DI, 1, 0x00000, 0x00000, False, True, None, None, None, 0),  # 0xf3
+    (CALL_C_NN, 3, 0x20000, 0x00000, False, True, None, 1, None, 3),  # 0xf4
+    (PUSH_RR, 1, 0x3c001, 0x00000, False, True, None, None, None, 0),  # 0xf5
+    None, None,
+    (RET_C, 1, 0x20000, 0x00000, True, True, None, None, None, 0),  # 0xf8
+    (LD_SP_HL, 1, 0x00060, 0x00000, False, True, None, None, None, 0),  # 0xf9
+    (JP_C_NN, 3, 0x20000, 0x00000, False, True, None, 1, None, 1),  # 0xfa
+    (EI, 1, 0x00000, 0x00000, False, True, None, None, None, 0),  # 0xfb
+    (CALL_C_NN, 3, 0x20000, 0x00000, False, True, None, 1, None, 3),  # 0xfc
+    (FIELDS_FD, 1),  # 0xfd
+    (CP_N, 2, 0x00001, 0x3c000, False, True, 1, None, None, 0),  # 0xfe
+    None,
+)
+
+
+def raise_unrecognised(mem, addr, length):
+    raise Exception("Unrecognised opcode at 0x%04x: %s" % (
+        addr, ' '.join('0x%02x' % mem[(addr + i) & 0xffff] for i in range(length))
+    ))
+
+
+def decode_fields(mem, addr):
+    entry = FIELDS_MAIN[mem[addr]]
+    opcode_pos = 0
+    while entry is not None and len(entry) == 2:
+        # a prefix
+        table, opcode_pos = entry
+        entry = table[mem[(addr + opcode_pos) & 0xffff]]
+    if entry is None:
+        raise_unrecognised(mem, addr, opcode_pos + 1)
+
+    (
+        cls, length, uses_mask, overwrites_mask, is_routine_exit, falls_through,
+        byte_pos, word_pos, offset_pos, target_kind
+    ) = entry
+    if byte_pos is not None:
+        param = mem[(addr + byte_pos) & 0xffff]
+    elif word_pos is not None:
+        param = mem[(addr + word_pos) & 0xffff] | (mem[(addr + word_pos + 1) & 0xffff] << 8)
+    else:
+        param = -1
+    if offset_pos is not None:
+        offset = mem[(addr + offset_pos) & 0xffff]
+        if offset >= 128:
+            offset -= 256
+    else:
+        offset = 0
+
+    jump_target = call_target = None
+    if target_kind == TARGET_JUMP_WORD:
+        jump_target = param
+    elif target_kind == TARGET_JUMP_OFFSET:
+        jump_target = (addr + length + offset) & 0xffff
+    elif target_kind == TARGET_CALL_WORD:
+        call_target = param
+
+    return (
+        cls, length, uses_mask, overwrites_mask, is_routine_exit, falls_through,
+        param, offset, jump_target, call_target
+    )
@@ -0,0 +1,150 @@
+# Inlining of small leaf routines: a routine that calls nothing, runs straight through
+# with no jumps, leaves the stack as it found it and ends in its only exit (an
+# unconditional RET) is spliced into every unconditional call to it, rather than being
+# called as a Javascript function.
+#
+# Each inlined copy is generated with the liveness at its own call site: working back from
+# the values live at the call's return address, so that results which that caller never
+# uses are dropped from the copy.
+
+from collections import defaultdict
+
+from codegen import RewrittenCode
+from instructions import mask_to_values
+
+
+class Inliner(object):
+    # Decide which routines of an analysis to inline. threshold is the largest number of
+    # instructions (not counting the RET) that an inlined routine can have.
+
+    def __init__(self, analyzer, threshold):
+        self.analyzer = analyzer
+        instructions_by_address = analyzer.instructions_by_address
+
+        # routine address -> addresses of the instructions to inline, in order
+        self.bodies = {}
+        for addr, routine in sorted(analyzer.routines.items()):
+            body = self.get_inlinable_body(routine, threshold)
+            if body is not None:
+                self.bodies[addr] = body
+
+        # routine address -> addresses of the calls to inline it at
+        self.call_sites = defaultdict(list)
+        # routines that are still called (conditionally) as functions
+        self.still_called = set()
+        for addr in instructions_by_address:
+            call_target = instructions_by_address.call_target(addr)
+            if call_target in self.bodies:
+                if self.is_unconditional(addr):
+                    self.call_sites[call_target].append(addr)
+                else:
+                    self.still_called.add(call_target)
+
+        for addr in list(self.bodies):
+            if not self.call_sites[addr]:
+                del self.bodies[addr]
+                del self.call_sites[addr]
+
+    def get_inlinable_body(self, routine, threshold):
+        instructions_by_address = self.analyzer.instructions_by_address
+        if routine.calls or len(routine.exit_points) != 1:
+            return None
+        if not self.analyzer.get_stack_analysis(routine.start_addr).is_balanced:
+            # it may reach past its own pushes - such as popping its return address, or
+            # EX (SP),HL - which an inlined copy, having no return address, cannot do
+            return None
+
+        body = []
+        addr = routine.start_addr
+        while not instructions_by_address.is_routine_exit(addr):
+            if (
+                len(body) == threshold
+                or instructions_by_address.jump_target(addr) is not None
+                or instructions_by_address.static_destination_addresses(addr)
+                != [instructions_by_address.next_address(addr)]
+            ):
+                return None
+            body.append(addr)
+            addr = instructions_by_address.next_address(addr)
+
+        if addr not in routine.exit_points or instructions_by_address.static_destination_addresses(addr):
+            # conditional return
+            return None
+        return body
+
+    def is_unconditional(self, addr):
+        instructions_by_address = self.analyzer.instructions_by_address
+        return (
+            instructions_by_address.next_address(addr)
+            not in instructions_by_address.static_destination_addresses(addr)
+        )
+
+    def is_inlined_call(self, addr):
+        # True if the call at addr is to be replaced with the called routine's body
+        call_target = self.analyzer.instructions_by_address.call_target(addr)
+        return call_target in self.bodies and self.is_unconditional(addr)
+
+    def is_emitted(self, addr):
+        # True if the routine at addr is still needed as a function
+        return addr not in self.bodies or addr in self.still_called
+
+    def code_for_call(self, addr, live):
+        # the body of the routine called at addr, for the values live at its return address
+        instructions_by_address = self.analyzer.instructions_by_address
+        uses_masks = instructions_by_address.uses_masks
+        overwrites_masks = instructions_by_address.overwrites_masks
+        body = self.bodies[instructions_by_address.call_target(addr)]
+
+        used_results_masks = []
+        for body_addr in reversed(body):
+            used_results_masks.append(overwrites_masks[body_addr] & live)
+            live = uses_masks[body_addr] | (live & ~overwrites_masks[body_addr])
+        used_results_masks.reverse()
+
+        code = []
+        for body_addr, used_results_mask in zip(body, used_results_masks):
+            instruction = instructions_by_address[body_addr]
+            instruction.used_results = mask_to_values(used_results_mask)
+            try:
+                code.append(instruction.to_javascript())
+            except NotImplementedError:
+                # no code for just these results; fall back on the code that the
+                # routine itself uses
+                code.append(instructions_by_address[body_addr].to_javascript())
+        return '\n'.join(line for line in code if line)
+
+    def report(self):
+        # lines describing the inlined routines, and the change in code size (counted in
+        # Z80 instructions: each call site gains the body in place of the call, and each
+        # routine that is no longer called loses its own copy)
+        lines = []
+        change = 0
+        for addr, body in sorted(self.bodies.items()):
+            sites = len(self.call_sites[addr])
+            change += sites * (len(body) - 1)
+            if addr not in self.still_called:
+                change -= len(body) + 1
+            lines.append("Inlined r%04x (%d instructions) at %d call sites%s" % (
+                addr, len(body), sites,
+                "" if addr not in self.still_called else ", still called conditionally"
+            ))
+        if lines:
+            lines.append("Code size change from inlining: %+d instructions" % change)
+        return lines
+
+
+class InlinedCode(RewrittenCode):
+    # The code for one routine's instructions, as given by code (a codegen.InstructionCode),
+    # with calls to inlined routines replaced by their bodies, for the liveness given by
+    # liveness (a summary.RoutineLiveness)
+
+    def __init__(self, inliner, liveness, code):
+        self.inliner = inliner
+        self.liveness = liveness
+        super(InlinedCode, self).__init__(code)
+
+    def code_for_address(self, addr):
+        if self.inliner.is_inlined_call(addr):
+            return_address = self.inliner.analyzer.instructions_by_address.return_address(addr)
+            return self.inliner.code_for_call(addr, self.liveness.get_live_in(return_address))
+        return self.code.code_for_address(addr)
@@ -0,0 +1,146 @@
+from array import array
+
+from functools import partial
+
+from decoder import decode_fields
+from instructions import get_instruction, mask_to_values
+from smc import modified_operand_to_javascript
+
+
+# bits of InstructionTable.flags
+IS_DECODED = 0x01
+IS_ROUTINE_EXIT = 0x02
+# set if the address following the instruction is one of its static destinations
+FALLS_THROUGH = 0x04
+
+
+class InstructionTable(object):
+    # Compact store of decoded instructions, held as one column per attribute indexed by
+    # the 16-bit address rather than as one Instruction object per address. Analysis
+    # passes read the columns directly; indexing the table (table[addr]) re-decodes the
+    # instruction at that address from memory as a full Instruction object, for code
+    # generation. Instructions are added with decode(addr), which fills in the columns
+    # straight from the generated decoder without building an Instruction.
+
+    def __init__(self, mem):
+        self.mem = mem
+
+        self.flags = bytearray(0x10000)
+        self.lengths = bytearray(0x10000)
+        self.class_ids = array('H', [0]) * 0x10000
+        self.params = array('i', [-1]) * 0x10000
+        self.offsets = array('h', [0]) * 0x10000
+        self.jump_targets = array('i', [-1]) * 0x10000
+        self.call_targets = array('i', [-1]) * 0x10000
+        self.uses_masks = array('I', [0]) * 0x10000
+        self.overwrites_masks = array('I', [0]) * 0x10000
+        self.used_results_masks = array('I', [0]) * 0x10000
+
+        # instruction classes, indexed by class id; id 0 means no instruction
+        self.classes = [None]
+        self.class_ids_by_class = {}
+        self.count = 0
+
+        # address of instruction -> (address, size) of its operand, for instructions whose
+        # operands are modified by self-modifying code
+        self.modified_operands = {}
+
+    def __getstate__(self):
+        # The memory image is left out of pickles (such as those in the analysis cache):
+        # the table is only valid for memory whose bytes match at its addresses, and is
+        # given the current image again when restored (see Analyzer.restore_analysis_state)
+        state = self.__dict__.copy()
+        del state['mem']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.mem = None
+
+    def decode(self, addr):
+        # decode the instruction at addr from memory and add it to the table, without
+        # constructing an Instruction object
+        self.store(addr, *decode_fields(self.mem, addr))
+
+    def store(
+        self, addr, cls, length, uses_mask, overwrites_mask, is_routine_exit, falls_through,
+        param, offset, jump_target, call_target
+    ):
+        if not self.flags[addr] & IS_DECODED:
+            self.count += 1
+
+        try:
+            class_id = self.class_ids_by_class[cls]
+        except KeyError:
+            class_id = len(self.classes)
+            self.classes.append(cls)
+            self.class_ids_by_class[cls] = class_id
+
+        flags = IS_DECODED
+        if is_routine_exit:
+            flags |= IS_ROUTINE_EXIT
+        if falls_through:
+            flags |= FALLS_THROUGH
+
+        self.flags[addr] = flags
+        self.lengths[addr] = length
+        self.class_ids[addr] = class_id
+        self.params[addr] = param
+        self.offsets[addr] = offset
+        self.jump_targets[addr] = -1 if jump_target is None else jump_target
+        self.call_targets[addr] = -1 if call_target is None else call_target
+        self.uses_masks[addr] = uses_mask
+        self.overwrites_masks[addr] = overwrites_mask
+
+    def __contains__(self, addr):
+        return bool(self.flags[addr] & IS_DECODED)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        flags = self.flags
+        return (addr for addr in range(0x10000) if flags[addr] & IS_DECODED)
+
+    def __getitem__(self, addr):
+        if not self.flags[addr] & IS_DECODED:
+            raise KeyError(addr)
+
+        instruction = get_instruction(self.mem, addr)
+        instruction.used_results = mask_to_values(self.used_results_masks[addr])
+        if addr in self.modified_operands:
+            instruction.to_javascript = partial(
+                modified_operand_to_javascript, instruction, self.mem, self.modified_operands[addr]
+            )
+        return instruction
+
+    def get_class(self, addr):
+        return self.classes[self.class_ids[addr]]
+
+    def is_routine_exit(self, addr):
+        return bool(self.flags[addr] & IS_ROUTINE_EXIT)
+
+    def next_address(self, addr):
+        return (addr + self.lengths[addr]) & 0xffff
+
+    def jump_target(self, addr):
+        target = self.jump_targets[addr]
+        return None if target == -1 else target
+
+    def call_target(self, addr):
+        target = self.call_targets[addr]
+        return None if target == -1 else target
+
+    def return_address(self, addr):
+        return self.next_address(addr)
+
+    def static_destination_addresses(self, addr):
+        destinations = []
+        target = self.call_targets[addr]
+        if target == -1:
+            target = self.jump_targets[addr]
+        if target != -1:
+            destinations.append(target)
+        if self.flags[addr] & FALLS_THROUGH:
+            destinations.append(self.next_address(addr))
+        return destinations
@@ -1,21 +1,40 @@
+import re
 from functools import partial
 
 
+# Increment this whenever a change to the instruction definitions would change the results
+# of analysis, so that cached analysis results are not reused
+INSTRUCTION_SET_VERSION = 8
+
+
 def get_mem(mem, addr):
     return mem[addr & 0xffff]
 
 
 class Instruction(object):
     is_routine_exit = False
+    # whether the instruction only jumps / calls / returns when a condition is met, as
+    # given by condition_to_javascript
+    has_condition = False
 
     def __init__(self, mem, addr):
         self.addr = addr
         self.used_results = None
 
+        # Resolve uses / overwrites to bitmasks over TRACKED_VALUES once, at decode time;
+        # analysis works from these rather than the sets. (Any register / condition
+        # parameters that the sets depend on have been assigned by the time we get here.)
+        self.uses_mask = values_to_mask(self.uses)
+        self.overwrites_mask = values_to_mask(self.overwrites)
+
     @property
     def static_destination_addresses(self):
         return [(self.addr + self.length) & 0xffff]
 
+    def code_before_branch_to_javascript(self):
+        # code to run ahead of testing the condition of a conditional jump
+        return ''
+
     @property
     def jump_target(self):
         return None
@@ -91,10 +110,17 @@ class InstructionWithTwoRegPairs(Instruction):
 
 
 class InstructionWithCondition(Instruction):
+    has_condition = True
+
     def __init__(self, condition, mem, addr):
         self.condition = condition
         super(InstructionWithCondition, self).__init__(mem, addr)
 
+    def condition_to_javascript(self):
+        # Javascript expression that is true when the condition is met
+        flag, sense = FLAG_FROM_CONDITION[self.condition]
+        return flag if sense else "!%s" % flag
+
 
 class InstructionWithNoParam(Instruction):
     length = 1
@@ -127,7 +153,7 @@ class InstructionWithOffsetParam(Instruction):
         super(InstructionWithOffsetParam, self).__init__(mem, addr)
         offset_param = get_mem(mem, addr + 1)
 
-        if offset_param > 128:
+        if offset_param >= 128:
             self.offset = offset_param - 256
         else:
             self.offset = offset_param
@@ -140,7 +166,7 @@ class ExtendedInstructionWithOffsetParam(Instruction):
         super(ExtendedInstructionWithOffsetParam, self).__init__(mem, addr)
         offset_param = get_mem(mem, addr + 2)
 
-        if offset_param > 128:
+        if offset_param >= 128:
             self.offset = offset_param - 256
         else:
             self.offset = offset_param
@@ -153,7 +179,7 @@ class DoubleExtendedInstructionWithOffsetParam(Instruction):
         super(DoubleExtendedInstructionWithOffsetParam, self).__init__(mem, addr)
         offset_param = get_mem(mem, addr + 2)
 
-        if offset_param > 128:
+        if offset_param >= 128:
             self.offset = offset_param - 256
         else:
             self.offset = offset_param
@@ -166,7 +192,7 @@ class ExtendedInstructionWithOffsetAndByteParams(Instruction):
         super(ExtendedInstructionWithOffsetAndByteParams, self).__init__(mem, addr)
         offset_param = get_mem(mem, addr + 2)
 
-        if offset_param > 128:
+        if offset_param >= 128:
             self.offset = offset_param - 256
         else:
             self.offset = offset_param
@@ -226,6 +252,180 @@ TRACKED_VALUES = [
     'cFlag', 'zFlag', 'pvFlag', 'sFlag',
 ]
 
+# Bit assigned to each tracked value when sets of values are represented as integer bitmasks
+VALUE_MASKS = dict((value, 1 << i) for i, value in enumerate(TRACKED_VALUES))
+
+
+def values_to_mask(values):
+    mask = 0
+    for value in values:
+        mask |= VALUE_MASKS[value]
+    return mask
+
+
+def mask_to_values(mask):
+    return set(value for value in TRACKED_VALUES if mask & VALUE_MASKS[value])
+
+
+# Lookup tables for flags that would otherwise take a chain of operations to compute, as
+# name -> list of values; each one used in the code is defined at the top of the output.
+# There are no SZ / SZP tables as in emulators that keep a packed F register: flags are
+# separate booleans here, and only the ones that are live are set, so S, Z and C are each
+# one comparison on the result - cheaper than a table lookup followed by a bit test - and
+# only parity (for the logic operations) needs a table.
+PARITY_TABLE = 'parityFlags'
+FLAG_TABLES = {
+    PARITY_TABLE: [bin(i).count('1') % 2 == 0 for i in range(0x100)],
+}
+
+
+def flag_table_declarations(code):
+    # Javascript definitions of the flag tables used in code
+    lines = []
+    for name in sorted(FLAG_TABLES):
+        if re.search(r'\b%s\[' % name, code):
+            values = ['true' if value else 'false' for value in FLAG_TABLES[name]]
+            lines.append("var %s = [" % name)
+            for i in range(0, len(values), 16):
+                lines.append("\t%s," % ', '.join(values[i:i + 16]))
+            lines.append("];")
+    return lines
+
+
+def alu_to_javascript(operation, operand, used_results):
+    # Code for an 8-bit arithmetic / logic operation on A ('add', 'adc', 'sub', 'sbc',
+    # 'cp', 'and', 'or' or 'xor') with the operand given as a Javascript expression,
+    # setting whichever of A and the flags are in used_results. The parity flag of a
+    # logic operation is looked up in PARITY_TABLE.
+    statements = []
+    if operation in ('and', 'or', 'xor'):
+        operator = {'and': '&', 'or': '|', 'xor': '^'}[operation]
+        if 'A' in used_results:
+            statements.append("r[A] %s= %s;" % (operator, operand))
+            result = 'r[A]'
+        else:
+            statements.append("tmp = r[A] %s %s;" % (operator, operand))
+            result = 'tmp'
+        if 'cFlag' in used_results:
+            statements.append("cFlag = false;")
+        if 'zFlag' in used_results:
+            statements.append("zFlag = (%s === 0x00);" % result)
+        if 'sFlag' in used_results:
+            statements.append("sFlag = !!(%s & 0x80);" % result)
+        if 'pvFlag' in used_results:
+            statements.append("pvFlag = %s[%s];" % (PARITY_TABLE, result))
+        return ' '.join(statements)
+
+    operator = '+' if operation in ('add', 'adc') else '-'
+    if operation in ('adc', 'sbc'):
+        statements.append("tmp = r[A] %s %s %s cFlag;" % (operator, operand, operator))
+    else:
+        statements.append("tmp = r[A] %s %s;" % (operator, operand))
+    if 'cFlag' in used_results:
+        statements.append("cFlag = (tmp > 0xff);" if operator == '+' else "cFlag = (tmp < 0);")
+    if 'zFlag' in used_results:
+        statements.append("zFlag = ((tmp & 0xff) === 0x00);")
+    if 'sFlag' in used_results:
+        statements.append("sFlag = !!(tmp & 0x80);")
+    if 'pvFlag' in used_results:
+        # overflow: the operands have the same sign (or, subtracting, different signs)
+        # and the result's sign differs from A's
+        if operator == '+':
+            statements.append("pvFlag = !!((r[A] ^ tmp) & (%s ^ tmp) & 0x80);" % operand)
+        else:
+            statements.append("pvFlag = !!((r[A] ^ %s) & (r[A] ^ tmp) & 0x80);" % operand)
+    if 'A' in used_results and operation != 'cp':
+        statements.append("r[A] = tmp;")
+    return ' '.join(statements)
+
+
+def inc_dec_to_javascript(operation, reg, used_results):
+    # Code for INC / DEC ('inc' or 'dec') of the 8-bit register reg, setting whichever of
+    # it and the flags are in used_results
+    if reg in used_results:
+        statements = ["r[%s]%s;" % (reg, '++' if operation == 'inc' else '--')]
+        result = 'r[%s]' % reg
+    else:
+        statements = ["tmp = (r[%s] %s 1) & 0xff;" % (reg, '+' if operation == 'inc' else '-')]
+        result = 'tmp'
+    if 'zFlag' in used_results:
+        statements.append("zFlag = (%s === 0x00);" % result)
+    if 'sFlag' in used_results:
+        statements.append("sFlag = !!(%s & 0x80);" % result)
+    if 'pvFlag' in used_results:
+        # overflow from 0x7f to 0x80, or from 0x80 to 0x7f
+        statements.append("pvFlag = (%s === 0x%02x);" % (
+            result, 0x80 if operation == 'inc' else 0x7f
+        ))
+    return ' '.join(statements)
+
+
+def block_transfer_to_javascript(operator, used_results):
+    # Code for LDIR (operator '+') or LDDR (operator '-'). The copy is done with
+    # mem.copyWithin, or mem.fill where each byte copies the one just written (DE = HL + 1
+    # for LDIR, HL - 1 for LDDR); a copy that wraps around the end of memory, or whose
+    # destination overlaps its source in any other way that the Z80 would see its own
+    # writes, is done a byte at a time
+    if operator == '+':
+        # bytes rp[HL] ... rp[HL] + tmp - 1 -> rp[DE] ... rp[DE] + tmp - 1
+        byte_at_a_time = "rp[HL] + tmp > 0x10000 || rp[DE] + tmp > 0x10000 || (rp[DE] > rp[HL] + 1 && rp[DE] < rp[HL] + tmp)"
+        fill = "rp[DE] === rp[HL] + 1"
+        fill_code = "mem.fill(mem[rp[HL]], rp[DE], rp[DE] + tmp);"
+        copy_code = "mem.copyWithin(rp[DE], rp[HL], rp[HL] + tmp);"
+    else:
+        # bytes rp[HL] - tmp + 1 ... rp[HL] -> rp[DE] - tmp + 1 ... rp[DE]
+        byte_at_a_time = "rp[HL] + 1 < tmp || rp[DE] + 1 < tmp || (rp[DE] < rp[HL] - 1 && rp[DE] > rp[HL] - tmp)"
+        fill = "rp[DE] === rp[HL] - 1"
+        fill_code = "mem.fill(mem[rp[HL]], rp[DE] - tmp + 1, rp[DE] + 1);"
+        copy_code = "mem.copyWithin(rp[DE] - tmp + 1, rp[HL] - tmp + 1, rp[HL] + 1);"
+
+    # each way of copying leaves BC zero, so that no other is tried after it (starting with
+    # BC zero - a count of 0x10000 - the copy either wraps or leaves memory as it is)
+    update = "rp[DE] %s= tmp; rp[HL] %s= tmp; rp[BC] = 0x0000;" % (operator, operator)
+    code = (
+        "tmp = rp[BC] || 0x10000; "
+        "if (%s) {"
+        "while(true) {mem[rp[DE]] = mem[rp[HL]]; rp[DE]%s; rp[HL]%s; rp[BC]--; if (rp[BC] === 0) break;}"
+        "} "
+        "if (rp[BC] !== 0 && %s) {%s %s} "
+        "if (rp[BC] !== 0) {%s %s}"
+    ) % (
+        byte_at_a_time, operator * 2, operator * 2, fill, fill_code, update, copy_code, update
+    )
+    if 'pvFlag' in used_results:
+        code += " pvFlag = false;"
+    return code
+
+
+def index_address(reg_pair, offset):
+    # the Javascript expression for the address (IX+d) / (IY+d)
+    if offset < 0:
+        return "(rp[%s] - 0x%02x) & 0xffff" % (reg_pair, -offset)
+    else:
+        return "(rp[%s] + 0x%02x) & 0xffff" % (reg_pair, offset)
+
+
+def pop_to_javascript(reg_pair, value, used_results):
+    # the code for POP reg_pair, given the popped word as a Javascript expression
+    if reg_pair == 'AF':
+        code = []
+        if 'A' in used_results:
+            code.append("r[A] = %s >> 8;" % value)
+        for flag, bit in [('sFlag', 0x80), ('zFlag', 0x40), ('pvFlag', 0x04), ('cFlag', 0x01)]:
+            if flag in used_results:
+                code.append("%s = !!(%s & 0x%02x);" % (flag, value, bit))
+        return ' '.join(code)
+
+    h, l = REGS_FROM_PAIR[reg_pair]
+    if used_results == {h, l}:
+        return "rp[%s] = %s;" % (reg_pair, value)
+    elif h in used_results:
+        return "r[%s] = %s >> 8;" % (h, value)
+    elif l in used_results:
+        return "r[%s] = %s & 0xff;" % (l, value)
+    else:
+        return ''
+
 
 class ADC_A_N(InstructionWithByteParam):
     def asm_repr(self):
@@ -237,6 +437,9 @@ class ADC_A_N(InstructionWithByteParam):
 
     overwrites = {'A', 'cFlag', 'zFlag', 'pvFlag', 'sFlag'}
 
+    def to_javascript(self):
+        return alu_to_javascript('adc', '0x%02x' % self.param, self.used_results)
+
 
 class ADC_A_R(InstructionWithReg, InstructionWithNoParam):
     def asm_repr(self):
@@ -248,6 +451,9 @@ class ADC_A_R(InstructionWithReg, InstructionWithNoParam):
 
     overwrites = {'A', 'cFlag', 'zFlag', 'pvFlag', 'sFlag'}
 
+    def to_javascript(self):
+        return alu_to_javascript('adc', 'r[%s]' % self.reg, self.used_results)
+
 
 class ADD_A_iHLi(InstructionWithNoParam):
     def asm_repr(self):
@@ -260,7 +466,7 @@ class ADD_A_iHLi(InstructionWithNoParam):
         if self.used_results == {'A'}:
             return "r[A] += mem[rp[HL]];"
         else:
-            super(ADD_A_iHLi, self).to_javascript()
+            return alu_to_javascript('add', 'mem[rp[HL]]', self.used_results)
 
 
 class ADD_A_iIXIYpNi(InstructionWithRegPair, ExtendedInstructionWithOffsetParam):
@@ -277,6 +483,10 @@ class ADD_A_iIXIYpNi(InstructionWithRegPair, ExtendedInstructionWithOffsetParam)
 
     overwrites = {'A', 'cFlag', 'zFlag', 'pvFlag', 'sFlag'}
 
+    def to_javascript(self):
+        operand = 'mem[%s]' % index_address(self.reg_pair, self.offset)
+        return alu_to_javascript('add', operand, self.used_results)
+
 
 class ADD_A_N(InstructionWithByteParam):
     def asm_repr(self):
@@ -289,7 +499,7 @@ class ADD_A_N(InstructionWithByteParam):
         if self.used_results == {'A'}:
             return "r[A] += 0x%02x;" % self.param
         else:
-            super(ADD_A_N, self).to_javascript()
+            return alu_to_javascript('add', '0x%02x' % self.param, self.used_results)
 
 
 class ADD_A_R(InstructionWithReg, InstructionWithNoParam):
@@ -306,7 +516,7 @@ class ADD_A_R(InstructionWithReg, InstructionWithNoParam):
         if self.used_results == {'A'}:
             return "r[A] += r[%s];" % self.reg
         else:
-            super(ADD_A_R, self).to_javascript()
+            return alu_to_javascript('add', 'r[%s]' % self.reg, self.used_results)
 
 
 class ADD_HL_RR(InstructionWithRegPair, InstructionWithNoParam):
@@ -364,10 +574,8 @@ class AND_N(InstructionWithByteParam):
             return "r[A] &= 0x%02x;" % self.param
         elif self.used_results == {'A', 'cFlag'}:
             return "r[A] &= 0x%02x; cFlag = false;" % self.param
-        elif self.used_results == {'zFlag', 'sFlag', 'pvFlag', 'A', 'cFlag'}:
-            return "/* FIXME: I bet we don't need all these flags */ r[A] &= 0x%02x;" % self.param
         else:
-            super(AND_N, self).to_javascript()
+            return alu_to_javascript('and', '0x%02x' % self.param, self.used_results)
 
 
 class AND_R(InstructionWithReg, InstructionWithNoParam):
@@ -384,7 +592,7 @@ class AND_R(InstructionWithReg, InstructionWithNoParam):
         if self.reg == 'A' and self.used_results == {'A', 'cFlag'}:
             return "cFlag = false;"
         else:
-            super(AND_R, self).to_javascript()
+            return alu_to_javascript('and', 'r[%s]' % self.reg, self.used_results)
 
 
 class BIT_N_iHLi(InstructionWithBit, ExtendedInstructionWithNoParam):
@@ -506,7 +714,7 @@ class CP_iHLi(InstructionWithNoParam):
         if self.used_results == {'cFlag'}:
             return "cFlag = (r[A] < mem[rp[HL]]);"
         else:
-            super(CP_iHLi, self).to_javascript()
+            return alu_to_javascript('cp', 'mem[rp[HL]]', self.used_results)
 
 
 class CP_N(InstructionWithByteParam):
@@ -524,7 +732,7 @@ class CP_N(InstructionWithByteParam):
         if self.used_results == {'zFlag', 'cFlag'}:
             return "zFlag = (r[A] == 0x%02x); cFlag = (r[A] < 0x%02x);" % (self.param, self.param)
         else:
-            super(CP_N, self).to_javascript()
+            return alu_to_javascript('cp', '0x%02x' % self.param, self.used_results)
 
 
 class CP_R(InstructionWithReg, InstructionWithNoParam):
@@ -537,6 +745,9 @@ class CP_R(InstructionWithReg, InstructionWithNoParam):
 
     overwrites = {'cFlag', 'zFlag', 'pvFlag', 'sFlag'}
 
+    def to_javascript(self):
+        return alu_to_javascript('cp', 'r[%s]' % self.reg, self.used_results)
+
 
 class DEC_iIXIYpNi(InstructionWithRegPair, ExtendedInstructionWithOffsetParam):
     def asm_repr(self):
@@ -570,6 +781,27 @@ class DEC_iHLi(InstructionWithNoParam):
     overwrites = {'zFlag', 'pvFlag', 'sFlag'}
 
 
+class DEC_IXIY(InstructionWithRegPair, ExtendedInstructionWithNoParam):
+    def asm_repr(self):
+        return "DEC %s" % self.reg_pair
+
+    @property
+    def uses(self):
+        h, l = REGS_FROM_PAIR[self.reg_pair]
+        return {h, l}
+
+    @property
+    def overwrites(self):
+        h, l = REGS_FROM_PAIR[self.reg_pair]
+        return {h, l}
+
+    def to_javascript(self):
+        if self.used_results == self.overwrites:
+            return "rp[%s]--;" % self.reg_pair
+        else:
+            super(DEC_IXIY, self).to_javascript()
+
+
 class DEC_IXIYH(InstructionWithRegPair, ExtendedInstructionWithNoParam):
     def asm_repr(self):
         h, l = REGS_FROM_PAIR[self.reg_pair]
@@ -605,10 +837,8 @@ class DEC_R(InstructionWithReg, InstructionWithNoParam):
             return "r[%s]--; zFlag = (r[%s] === 0x00);" % (self.reg, self.reg)
         elif self.used_results == {self.reg}:
             return "r[%s]--;" % self.reg
-        elif self.used_results == {self.reg, 'zFlag', 'sFlag', 'pvFlag'}:
-            return "r[%s]--; zFlag = (r[%s] === 0x00); sFlag = !!(r[%s] & 0x80); pvFlag = ((r[%s] & 0x7f) == 0x7f);" % (self.reg, self.reg, self.reg, self.reg)
         else:
-            super(DEC_R, self).to_javascript()
+            return inc_dec_to_javascript('dec', self.reg, self.used_results)
 
 
 class DEC_RR(InstructionWithRegPair, InstructionWithNoParam):
@@ -650,13 +880,27 @@ class DJNZ_NN(InstructionWithOffsetParam):
 
     @property
     def static_destination_addresses(self):
-        return [self.jump_target]
+        return [
+            self.jump_target,
+            (self.addr + self.length) & 0xffff,
+        ]
 
     def asm_repr(self):
         return "DJNZ 0x%04x" % self.jump_target
 
     uses = {'B'}
     overwrites = {'B'}
+    has_condition = True
+
+    def code_before_branch_to_javascript(self):
+        # the decrement, which happens before the condition is tested
+        return "r[B]--;"
+
+    def condition_to_javascript(self):
+        return "r[B] !== 0"
+
+    def to_javascript(self):
+        return "r[B]--; if (r[B] !== 0) {pc = 0x%04x; break;}" % self.jump_target
 
 
 class EI(InstructionWithNoParam):
@@ -710,6 +954,27 @@ class INC_iHLi(InstructionWithNoParam):
     overwrites = {'zFlag', 'pvFlag', 'sFlag'}
 
 
+class INC_IXIY(InstructionWithRegPair, ExtendedInstructionWithNoParam):
+    def asm_repr(self):
+        return "INC %s" % self.reg_pair
+
+    @property
+    def uses(self):
+        h, l = REGS_FROM_PAIR[self.reg_pair]
+        return {h, l}
+
+    @property
+    def overwrites(self):
+        h, l = REGS_FROM_PAIR[self.reg_pair]
+        return {h, l}
+
+    def to_javascript(self):
+        if self.used_results == self.overwrites:
+            return "rp[%s]++;" % self.reg_pair
+        else:
+            super(INC_IXIY, self).to_javascript()
+
+
 class INC_R(InstructionWithReg, InstructionWithNoParam):
     def asm_repr(self):
         return "INC %s" % self.reg
@@ -730,7 +995,7 @@ class INC_R(InstructionWithReg, InstructionWithNoParam):
         elif self.used_results == {'zFlag'}:
             return "zFlag = (r[%s] == 0xff);" % self.reg
         else:
-            super(INC_R, self).to_javascript()
+            return inc_dec_to_javascript('inc', self.reg, self.used_results)
 
 
 class INC_RR(InstructionWithRegPair, InstructionWithNoParam):
@@ -1218,10 +1483,18 @@ class LDIR(ExtendedInstructionWithNoParam):
     overwrites = {'B', 'C', 'D', 'E', 'H', 'L', 'pvFlag'}
 
     def to_javascript(self):
-        if 'pvFlag' not in self.used_results:
-            return "while(true) {mem[rp[DE]] = mem[rp[HL]]; rp[DE]++; rp[HL]++; rp[BC]--; if (rp[BC] === 0) break;}"
-        else:
-            super(LDIR, self).to_javascript()
+        return block_transfer_to_javascript('+', self.used_results)
+
+
+class LDDR(ExtendedInstructionWithNoParam):
+    def asm_repr(self):
+        return "LDDR"
+
+    uses = {'B', 'C', 'D', 'E', 'H', 'L'}
+    overwrites = {'B', 'C', 'D', 'E', 'H', 'L', 'pvFlag'}
+
+    def to_javascript(self):
+        return block_transfer_to_javascript('-', self.used_results)
 
 
 class OR_iHLi(InstructionWithNoParam):
@@ -1235,7 +1508,7 @@ class OR_iHLi(InstructionWithNoParam):
         if self.used_results == {'zFlag'}:
             return "zFlag = (r[A] | mem[rp[HL]]) === 0;"
         else:
-            super(OR_iHLi, self).to_javascript()
+            return alu_to_javascript('or', 'mem[rp[HL]]', self.used_results)
 
 
 class OR_iIXIYpNi(InstructionWithRegPair, ExtendedInstructionWithOffsetParam):
@@ -1252,6 +1525,10 @@ class OR_iIXIYpNi(InstructionWithRegPair, ExtendedInstructionWithOffsetParam):
 
     overwrites = {'A', 'cFlag', 'zFlag', 'pvFlag', 'sFlag'}
 
+    def to_javascript(self):
+        operand = 'mem[%s]' % index_address(self.reg_pair, self.offset)
+        return alu_to_javascript('or', operand, self.used_results)
+
 
 class OR_R(InstructionWithReg, InstructionWithNoParam):
     def asm_repr(self):
@@ -1264,18 +1541,12 @@ class OR_R(InstructionWithReg, InstructionWithNoParam):
     overwrites = {'A', 'cFlag', 'zFlag', 'pvFlag', 'sFlag'}
 
     def to_javascript(self):
-        if self.reg == 'A':
-            if self.used_results == {'zFlag', 'sFlag', 'pvFlag', 'cFlag'}:
-                return "/* FIXME: I bet we don't need all these flags */ zFlag = (r[A] === 0);"
-            elif self.used_results == {'zFlag', 'A', 'cFlag'}:
-                return "zFlag = (r[A] === 0); cFlag = false;"
-            else:
-                super(OR_R, self).to_javascript()
+        if self.reg == 'A' and self.used_results == {'zFlag', 'A', 'cFlag'}:
+            return "zFlag = (r[A] === 0); cFlag = false;"
+        elif self.reg != 'A' and self.used_results == {'A'}:
+            return "r[A] |= r[%s];" % self.reg
         else:
-            if self.used_results == {'A'}:
-                return "r[A] |= r[%s];" % self.reg
-            else:
-                super(OR_R, self).to_javascript()
+            return alu_to_javascript('or', 'r[%s]' % self.reg, self.used_results)
 
 
 class OUT_iCi_R(InstructionWithReg, ExtendedInstructionWithNoParam):
@@ -1338,6 +1609,10 @@ class POP_IXIY(InstructionWithRegPair, ExtendedInstructionWithNoParam):
         else:
             super(POP_IXIY, self).to_javascript()
 
+    def stack_local_to_javascript(self, local):
+        # the code to restore the value that a PUSH kept in a local, rather than on the stack
+        return pop_to_javascript(self.reg_pair, local, self.used_results)
+
 
 class POP_RR(InstructionWithRegPair, InstructionWithNoParam):
     def asm_repr(self):
@@ -1368,6 +1643,10 @@ class POP_RR(InstructionWithRegPair, InstructionWithNoParam):
             else:
                 super(POP_RR, self).to_javascript()
 
+    def stack_local_to_javascript(self, local):
+        # the code to restore the value that a PUSH kept in a local, rather than on the stack
+        return pop_to_javascript(self.reg_pair, local, self.used_results)
+
 
 class PUSH_RR(InstructionWithRegPair, InstructionWithNoParam):
     def asm_repr(self):
@@ -1390,6 +1669,13 @@ class PUSH_RR(InstructionWithRegPair, InstructionWithNoParam):
             h, l = REGS_FROM_PAIR[self.reg_pair]
             return "rp[SP]--; mem[rp[SP]] = r[%s]; rp[SP]--; mem[rp[SP]] = r[%s];" % (h, l)
 
+    def stack_local_to_javascript(self, local):
+        # the code to keep the pushed value in a local, rather than on the stack
+        if self.reg_pair == 'AF':
+            return "%s = r[A] << 8 | (sFlag << 7) | (zFlag << 6) | (pvFlag << 2) | cFlag;" % local
+        else:
+            return "%s = rp[%s];" % (local, self.reg_pair)
+
 
 class RES_N_iHLi(InstructionWithBit, ExtendedInstructionWithNoParam):
     def asm_repr(self):
@@ -1569,6 +1855,9 @@ class SBC_A_R(InstructionWithReg, InstructionWithNoParam):
 
     overwrites = {'A', 'cFlag', 'zFlag', 'pvFlag', 'sFlag'}
 
+    def to_javascript(self):
+        return alu_to_javascript('sbc', 'r[%s]' % self.reg, self.used_results)
+
 
 class SBC_HL_RR(InstructionWithRegPair, ExtendedInstructionWithNoParam):
     def asm_repr(self):
@@ -1672,7 +1961,7 @@ class SUB_N(InstructionWithByteParam):
         elif self.used_results == {'A', 'zFlag'}:
             return "r[A] -= 0x%02x; zFlag = !r[A];" % self.param
         else:
-            super(SUB_N, self).to_javascript()
+            return alu_to_javascript('sub', '0x%02x' % self.param, self.used_results)
 
 
 class SUB_R(InstructionWithReg, InstructionWithNoParam):
@@ -1689,7 +1978,7 @@ class SUB_R(InstructionWithReg, InstructionWithNoParam):
         if self.used_results == {'A'}:
             return "r[A] -= r[%s];" % self.reg
         else:
-            super(SUB_R, self).to_javascript()
+            return alu_to_javascript('sub', 'r[%s]' % self.reg, self.used_results)
 
 
 class XOR_iIXIYpNi(InstructionWithRegPair, ExtendedInstructionWithOffsetParam):
@@ -1706,6 +1995,10 @@ class XOR_iIXIYpNi(InstructionWithRegPair, ExtendedInstructionWithOffsetParam):
 
     overwrites = {'A', 'cFlag', 'zFlag', 'pvFlag', 'sFlag'}
 
+    def to_javascript(self):
+        operand = 'mem[%s]' % index_address(self.reg_pair, self.offset)
+        return alu_to_javascript('xor', operand, self.used_results)
+
 
 class XOR_R(InstructionWithReg, InstructionWithNoParam):
     def asm_repr(self):
@@ -1723,7 +2016,7 @@ class XOR_R(InstructionWithReg, InstructionWithNoParam):
         elif self.reg == 'A' and self.used_results == {'A', 'cFlag'}:
             return "r[A] = 0x00; cFlag = false;"
         else:
-            super(XOR_R, self).to_javascript()
+            return alu_to_javascript('xor', 'r[%s]' % self.reg, self.used_results)
 
 
 INSTRUCTIONS_BY_CB_OPCODE = {
@@ -2047,10 +2340,13 @@ INSTRUCTIONS_BY_DDFD_OPCODE = {
 
     0x21: LD_IXIY_NN,
 
+    0x23: INC_IXIY,
+
     0x25: DEC_IXIYH,
     0x26: LD_IXIYH_N,
 
     0x2a: LD_IXIY_iNNi,
+    0x2b: DEC_IXIY,
 
     0x35: DEC_iIXIYpNi,
     0x36: LD_iIXIYpNi_N,
@@ -2101,6 +2397,16 @@ def get_dd_instruction(mem, addr):
     return instruction('IX', mem, addr)
 
 
+def get_fd_instruction(mem, addr):
+    sub_opcode = get_mem(mem, addr + 1)
+    try:
+        instruction = INSTRUCTIONS_BY_DDFD_OPCODE[sub_opcode]
+    except KeyError:
+        raise Exception("Unrecognised FD sub-opcode at 0x%04x: 0xfd 0x%02x" % (addr, sub_opcode))
+
+    return instruction('IY', mem, addr)
+
+
 INSTRUCTIONS_BY_ED_OPCODE = {
     0x41: partial(OUT_iCi_R, 'B'),
     0x42: partial(SBC_HL_RR, 'BC'),
@@ -2132,6 +2438,8 @@ INSTRUCTIONS_BY_ED_OPCODE = {
     0xab: OUTD,
 
     0xb0: LDIR,
+
+    0xb8: LDDR,
 }
 
 
@@ -2393,7 +2701,7 @@ INSTRUCTIONS_BY_OPCODE = {
     0xfa: partial(JP_C_NN, 'M'),
     0xfb: EI,
     0xfc: partial(CALL_C_NN, 'M'),
-
+    0xfd: get_fd_instruction,
     0xfe: CP_N,
 }
 
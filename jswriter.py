@@ -0,0 +1,31 @@
+class JavascriptWriter(object):
+    # Writes lines of Javascript to a stream, indented to the current nesting depth.
+    # Indentation strings are built once per depth rather than per line.
+
+    def __init__(self, stream, indent_with='\t'):
+        self.stream = stream
+        self.indent_with = indent_with
+        self.depth = 0
+        self.prefix = ''
+        self.newline_prefix = '\n'
+
+    def indent(self):
+        self.set_depth(self.depth + 1)
+
+    def dedent(self):
+        self.set_depth(self.depth - 1)
+
+    def set_depth(self, depth):
+        self.depth = depth
+        self.prefix = self.indent_with * depth
+        self.newline_prefix = '\n' + self.prefix
+
+    def write_line(self, line=''):
+        if line:
+            self.stream.write(self.prefix + line + '\n')
+        else:
+            self.stream.write('\n')
+
+    def write_code(self, code):
+        # write a fragment that may span several lines, indenting each of them
+        self.stream.write(self.prefix + code.replace('\n', self.newline_prefix) + '\n')
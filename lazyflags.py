@@ -0,0 +1,248 @@
+# Lazy flag evaluation: rather than assigning cFlag / zFlag / sFlag / pvFlag as soon as an
+# instruction produces them, keep the expression that the flag would have been assigned
+# (in terms of the locals and memory that the instruction operated on) and only
+# evaluate it where it is needed:
+#
+# - a conditional jump / return / call that tests a pending flag tests the expression
+#   in its place, e.g. 'a = (a - 1) & 0xff; if (a === 0x00) ...', and the flag itself is
+#   never assigned unless it is still live afterwards;
+# - a pending flag is assigned just before anything that would change the expression's
+#   value, before any other instruction that reads the flag, before calls and returns,
+#   and at the end of a block that leads to a block with other predecessors - in each
+#   case only if the liveness analysis says that the flag is still live there.
+#
+# Pending flags are carried from a block into its successors when it is their only
+# predecessor, so a flag produced before an if / else can be tested on both sides.
+
+import re
+
+from codegen import RewrittenCode
+from instructions import VALUE_MASKS
+from structure import negate, strip_parentheses
+
+
+FLAGS = ['cFlag', 'zFlag', 'sFlag', 'pvFlag']
+
+# a flag assignment at the start of a statement (possibly after a comment)
+FLAG_ASSIGNMENT_PATTERN = re.compile(
+    r'(?:^|(?<=[;{])|(?<=\*/))\s*(cFlag|zFlag|sFlag|pvFlag) = ([^;]*);'
+)
+# the test of a conditional return / call, or of a conditional jump in a pc dispatcher
+CONDITION_PATTERN = re.compile(r'^if \((!?)(cFlag|zFlag|sFlag|pvFlag)\) ')
+IDENTIFIER_PATTERN = re.compile(r'\b[A-Za-z_]\w*\b')
+ASSIGNMENT_PATTERN = re.compile(
+    r'(\b[A-Za-z_]\w*|\])\s*(?:(?:[-+*/%&|^]|<<|>>>?)?=(?!=)|\+\+|--)'
+)
+CALL_PATTERN = re.compile(r'\br[0-9a-f]{4}\(')
+# a call to a method of mem that writes to it, such as mem.copyWithin(...)
+MEMORY_CALL_PATTERN = re.compile(r'\bmem\.\w+\(')
+
+
+def get_assigned_names(code):
+    # names of the variables that code may assign to; '[' stands for any element of an
+    # array (such as mem), and '*' for anything at all (as a call might change anything)
+    names = set()
+    for match in ASSIGNMENT_PATTERN.finditer(code):
+        name = match.group(1)
+        names.add('[' if name == ']' else name)
+    if MEMORY_CALL_PATTERN.search(code):
+        names.add('[')
+    if CALL_PATTERN.search(code):
+        names.add('*')
+    return names
+
+
+def get_dependencies(expression):
+    # the names that the value of an expression depends on, as for get_assigned_names
+    names = set(IDENTIFIER_PATTERN.findall(expression))
+    if '[' in expression:
+        names.add('[')
+    return names
+
+
+def is_clobbered_by(dependencies, assigned_names):
+    return '*' in assigned_names or not dependencies.isdisjoint(assigned_names)
+
+
+def reads_flag(code, flag):
+    # True if code reads the flag, other than to assign a new value to it
+    return re.search(r'\b%s\b(?!\s*=(?!=))' % flag, code) is not None
+
+
+def flag_condition(expression, negated):
+    # the condition testing that a flag with the given pending expression is set (or not)
+    if expression.startswith('!!'):
+        # no need to convert to a boolean to test it
+        expression = expression[2:]
+    if negated:
+        return negate(expression)
+    return strip_parentheses(expression)
+
+
+def join_code(first, second):
+    if first and second:
+        return first + '\n' + second
+    return first or second
+
+
+def is_at_top_level(code, position):
+    depth = 0
+    for char in code[:position]:
+        if char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+    return depth == 0
+
+
+class LazyFlags(RewrittenCode):
+    # The code for one routine's instructions, as given by code (a codegen.InstructionCode
+    # or another pass), with flag evaluation deferred to where the flags are used, as live
+    # by liveness (a summary.RoutineLiveness)
+
+    def __init__(self, analyzer, routine, liveness, code):
+        self.analyzer = analyzer
+        self.routine = routine
+        self.liveness = liveness
+        super(LazyFlags, self).__init__(code)
+
+        self.code_by_address = {}
+        # for each jump: the flags pending before it, those of them that are evaluated
+        # before it anyway, and the code to do so
+        self.pending_by_jump_address = {}
+        self.evaluated_by_jump_address = {}
+        self.code_before_branch_by_address = {}
+
+        cfg = routine.cfg
+        pending_by_block = {}
+        for block in cfg.reverse_postorder:
+            predecessors = cfg.predecessors[block]
+            if block is not cfg.entry_block and len(predecessors) == 1:
+                pending = dict(pending_by_block[predecessors[0]])
+            else:
+                pending = {}
+
+            for addr in block.addresses:
+                self.defer_flags(addr, pending)
+
+            # pass the pending flags on to the following blocks if they can only be
+            # reached from here; otherwise evaluate the ones still needed
+            if pending and any(
+                successor is cfg.entry_block or len(cfg.predecessors[successor]) > 1
+                for successor in block.successors
+            ):
+                addr = block.last_addr
+                evaluated = set()
+                code = self.evaluate(pending, list(pending), self.get_live_out(addr), evaluated)
+                if not code:
+                    pass
+                elif addr in self.pending_by_jump_address:
+                    # nothing that a jump changes (such as B for DJNZ) is left pending,
+                    # so this can be done before it
+                    self.evaluated_by_jump_address[addr] |= evaluated
+                    self.code_before_branch_by_address[addr] = join_code(
+                        self.code_before_branch_by_address[addr], code
+                    )
+                    self.code_by_address[addr] = join_code(code, self.code_by_address[addr])
+                else:
+                    self.code_by_address[addr] = join_code(self.code_by_address[addr], code)
+            pending_by_block[block] = pending
+
+    def get_live_out(self, addr):
+        return self.liveness.get_live_out(addr)
+
+    def evaluate(self, pending, flags, live, evaluated):
+        # return the code to assign those of the given pending flags that are in the live
+        # mask, adding them to the evaluated set; remove all the given flags from pending
+        assignments = []
+        for flag in FLAGS:
+            if flag in flags:
+                expression = pending.pop(flag)
+                if live & VALUE_MASKS[flag]:
+                    assignments.append("%s = %s;" % (flag, expression))
+                    evaluated.add(flag)
+        return ' '.join(assignments)
+
+    def defer_flags(self, addr, pending):
+        # Generate the code for the instruction at addr given the flags pending before it,
+        # and update pending to the flags pending after it
+        instructions_by_address = self.analyzer.instructions_by_address
+        code = self.code.code_for_address(addr)
+        live_in = self.liveness.get_live_in(addr)
+        before = []
+
+        # the instruction's condition is tested before anything else happens; note the
+        # expression for it, in case it is not still pending by then
+        match = CONDITION_PATTERN.match(code)
+        body = code[match.end():] if match else code
+        condition_expression = pending.get(match.group(2)) if match else None
+
+        is_jump = instructions_by_address.jump_target(addr) is not None
+        if is_jump:
+            self.pending_by_jump_address[addr] = dict(pending)
+
+        # other reads of pending flags need the flag itself
+        evaluated = set()
+        before.append(self.evaluate(
+            pending, [flag for flag in pending if reads_flag(body, flag)], live_in, evaluated
+        ))
+
+        if CALL_PATTERN.search(code) or instructions_by_address.is_routine_exit(addr):
+            # leaving the routine, or calling something that may use and change any flag
+            before.append(self.evaluate(
+                pending, list(pending), self.get_live_out(addr), evaluated
+            ))
+
+        if condition_expression is not None and match.group(2) not in evaluated:
+            negated, flag = match.groups()
+            code = "if (%s) %s" % (flag_condition(condition_expression, negated), body)
+
+        assigned_names = get_assigned_names(code)
+        before.append(self.evaluate(pending, [
+            flag for flag, expression in pending.items()
+            if is_clobbered_by(get_dependencies(expression), assigned_names)
+        ], live_in, evaluated))
+
+        # flags that this instruction assigns replace any pending ones
+        for flag in FLAGS:
+            if flag in assigned_names:
+                pending.pop(flag, None)
+
+        # defer this instruction's own flag assignments where the expression stays valid
+        # to the end of the instruction
+        deferred = []
+        for match in FLAG_ASSIGNMENT_PATTERN.finditer(code):
+            flag, expression = match.groups()
+            dependencies = get_dependencies(expression)
+            if (
+                is_at_top_level(code, match.start())
+                and dependencies.isdisjoint(FLAGS)
+                and not is_clobbered_by(dependencies, get_assigned_names(code[match.end():]))
+            ):
+                deferred.append(match)
+                pending[flag] = expression
+        for match in reversed(deferred):
+            code = code[:match.start()] + code[match.end():]
+
+        before = ' '.join(code for code in before if code)
+        if is_jump:
+            self.evaluated_by_jump_address[addr] = evaluated
+            # flags are evaluated ahead of anything that the jump does before its test
+            self.code_before_branch_by_address[addr] = join_code(
+                before, self.code.code_before_branch(addr)
+            )
+        self.code_by_address[addr] = join_code(before, code.strip())
+
+    def code_for_address(self, addr):
+        return self.code_by_address[addr]
+
+    def condition_for_address(self, addr):
+        condition = self.code.condition_for_address(addr)
+        pending = self.pending_by_jump_address[addr]
+        flag = condition.lstrip('!')
+        if flag in pending and flag not in self.evaluated_by_jump_address[addr]:
+            return flag_condition(pending[flag], condition.startswith('!'))
+        return condition
+
+    def code_before_branch(self, addr):
+        return self.code_before_branch_by_address[addr]
@@ -0,0 +1,272 @@
+# Loop optimisations over a routine's structured statements (see structure.py), once its
+# control flow has been recovered.
+#
+# Counted loops: a do / while loop that steps a register down by one at its foot and goes
+# round until it reaches zero - as a DJNZ, or a DEC r / JR NZ, does - and that neither
+# reads the register nor leaves the loop anywhere else, runs as many times as the register
+# holds at the top (or 256 times for zero). It is written as a for loop over a local
+# counter, leaving the register at zero:
+#
+#   do {                                   for (var n8005 = b || 0x100; n8005 > 0; n8005--) {
+#       ...                          ->        ...
+#       b = (b - 1) & 0xff;                }
+#   } while (b !== 0);                     b = 0x00;
+#
+# Loop-invariant code motion: within any loop, a register pair read as (h << 8 | l) where
+# neither local is assigned in the loop, and a read from mem whose address is made up only
+# of such locals and constants where the loop writes no memory and calls nothing that
+# could, are evaluated once in a local declared ahead of the loop. Both are free of side
+# effects, so evaluating them when the loop would not have is harmless.
+
+import re
+
+from constants import ASSIGNED_NAME_PATTERN, CALL_PATTERN, IDENTIFIER_PATTERN
+from pointers import find_closing_bracket
+from promote import LOCAL_NAMES, PROMOTED_PAIRS
+
+
+# the step at the foot of a counted loop: a register local or (unpromoted) register
+DECREMENT_PATTERN = re.compile(
+    r'^(?:(?P<local>[a-z]\w*) = \((?P=local) - 1\) & 0xff|(?P<register>r\[[A-Z]+\])--);$'
+)
+# the test at the foot of a counted loop
+NONZERO_PATTERN = re.compile(r'^(?P<counter>[a-z]\w*|r\[[A-Z]+\]) !==? 0(?:x00)?$')
+RETURN_PATTERN = re.compile(r'\breturn\b')
+PAIR_PATTERN = re.compile(r'\(([a-z]\w*) << 8 \| ([a-z]\w*)\)')
+# assignments following a mem[...] lookup
+ASSIGNMENT_OPERATOR_PATTERN = re.compile(r'\s*(?:(?:[-+*/%&|^]|<<|>>>?)?=(?!=)|\+\+|--)')
+MEM_PATTERN = re.compile(r'\bmem\[')
+
+# functions of the host that leave registers and memory alone
+PURE_CALLS = set(['out('])
+
+# register -> the rp[] pair that it is part of, for unpromoted code
+PAIRS_BY_REGISTER = dict(
+    (register, pair) for pair, registers in PROMOTED_PAIRS.items() for register in registers
+)
+# (high, low) register locals -> the name of the pair they make up
+PAIR_NAMES = dict(
+    ((LOCAL_NAMES[high], LOCAL_NAMES[low]), pair.lower())
+    for pair, (high, low) in PROMOTED_PAIRS.items()
+)
+
+
+def get_texts(statements):
+    # all the Javascript in statements, at any depth: code, and the conditions tested
+    texts = []
+    for statement in statements:
+        kind = statement[0]
+        if kind == 'code':
+            texts.append(statement[1])
+        elif kind == 'if':
+            texts.append(statement[1])
+            texts += get_texts(statement[2]) + get_texts(statement[3])
+        elif kind == 'do':
+            texts += get_texts(statement[2])
+            texts.append(statement[3])
+        elif kind in ('loop', 'block', 'for'):
+            texts += get_texts(statement[2])
+    return texts
+
+
+def rewrite_texts(statements, rewrite):
+    # statements with rewrite applied to all the Javascript in them, at any depth
+    result = []
+    for statement in statements:
+        kind = statement[0]
+        if kind == 'code':
+            result.append(('code', rewrite(statement[1])))
+        elif kind == 'if':
+            result.append((
+                'if', rewrite(statement[1]),
+                rewrite_texts(statement[2], rewrite), rewrite_texts(statement[3], rewrite)
+            ))
+        elif kind == 'do':
+            result.append((
+                'do', statement[1], rewrite_texts(statement[2], rewrite), rewrite(statement[3])
+            ))
+        elif kind in ('loop', 'block', 'for'):
+            result.append(
+                (kind, statement[1], rewrite_texts(statement[2], rewrite)) + statement[3:]
+            )
+        else:
+            result.append(statement)
+    return result
+
+
+def get_defined_labels(statements, labels=None):
+    if labels is None:
+        labels = set()
+    for statement in statements:
+        kind = statement[0]
+        if kind == 'if':
+            get_defined_labels(statement[2], labels)
+            get_defined_labels(statement[3], labels)
+        elif kind in ('loop', 'block', 'do', 'for'):
+            labels.add(statement[1])
+            get_defined_labels(statement[2], labels)
+    return labels
+
+
+def get_jumps(statements, labels=None):
+    # the labels that break / continue statements at any depth go to
+    if labels is None:
+        labels = set()
+    for statement in statements:
+        kind = statement[0]
+        if kind in ('break', 'continue'):
+            labels.add(statement[1])
+        elif kind == 'if':
+            get_jumps(statement[2], labels)
+            get_jumps(statement[3], labels)
+        elif kind in ('loop', 'block', 'do', 'for'):
+            get_jumps(statement[2], labels)
+    return labels
+
+
+def has_calls(texts):
+    # True if any of the texts call a function that could change registers or memory
+    return any(
+        match.group(0) not in PURE_CALLS for text in texts for match in CALL_PATTERN.finditer(text)
+    )
+
+
+def get_mem_reads(text):
+    # (start, end) of each mem[...] lookup in text that is not assigned to, and whether any
+    # is assigned to
+    reads = []
+    writes = False
+    for match in MEM_PATTERN.finditer(text):
+        end = find_closing_bracket(text, match.end() - 1) + 1
+        if ASSIGNMENT_OPERATOR_PATTERN.match(text, end):
+            writes = True
+        else:
+            reads.append((match.start(), end))
+    return reads, writes
+
+
+def leaves_only_at_foot(body):
+    # True if the only way out of the body of a loop is to run off its end
+    return (
+        get_jumps(body) <= get_defined_labels(body)
+        and not any(RETURN_PATTERN.search(text) for text in get_texts(body))
+    )
+
+
+def mentions_register(texts, counter):
+    # True if any of the texts read or write counter - a register local, or a register
+    # in r (which rp, and any call, can also reach)
+    if counter.startswith('r['):
+        register = counter[2:-1]
+        pair_access = "rp[%s]" % PAIRS_BY_REGISTER.get(register, register)
+        return has_calls(texts) or any(
+            counter in text or pair_access in text for text in texts
+        )
+    pattern = re.compile(r'\b%s\b' % re.escape(counter))
+    return any(pattern.search(text) for text in texts)
+
+
+def make_counted_loop(statement):
+    # the statements for a do / while loop as a counted for loop, or None if it is not one
+    _, label, body, condition = statement
+    match = NONZERO_PATTERN.match(condition)
+    if match is None or not body or body[-1][0] != 'code':
+        return None
+    counter = match.group('counter')
+    step = DECREMENT_PATTERN.match(body[-1][1])
+    if step is None or counter not in (step.group('local'), step.group('register')):
+        return None
+    body = body[:-1]
+    if mentions_register(get_texts(body), counter) or not leaves_only_at_foot(body):
+        return None
+    return [('for', label, body, counter), ('code', "%s = 0x00;" % counter)]
+
+
+def hoist_invariants(label, body):
+    # the declarations to go ahead of the loop with the given label and body, and its body
+    # with the invariant expressions replaced by the locals declared
+    texts = get_texts(body)
+    assigned = set(
+        match.group(1) for text in texts for match in ASSIGNED_NAME_PATTERN.finditer(text)
+    )
+    declarations = []
+    names_by_expression = {}
+
+    def declare(expression, name):
+        if expression not in names_by_expression:
+            names_by_expression[expression] = name
+            declarations.append(('code', "var %s = %s;" % (name, expression)))
+
+    for text in texts:
+        for match in PAIR_PATTERN.finditer(text):
+            high, low = match.groups()
+            if high not in assigned and low not in assigned:
+                declare(match.group(0), "%s_%s" % (
+                    PAIR_NAMES.get((high, low), high + low), label
+                ))
+    if names_by_expression:
+        body = rewrite_texts(body, lambda text: PAIR_PATTERN.sub(
+            lambda match: names_by_expression.get(match.group(0), match.group(0)), text
+        ))
+        texts = get_texts(body)
+
+    reads = []
+    for text in texts:
+        text_reads, writes = get_mem_reads(text)
+        if writes:
+            return declarations, body
+        reads += [text[start:end] for start, end in text_reads]
+    if has_calls(texts):
+        return declarations, body
+
+    mem_names = {}
+    for read in reads:
+        address = read[4:-1]
+        if '[' in address or any(
+            name in assigned for name in IDENTIFIER_PATTERN.findall(address)
+        ):
+            continue
+        if read not in mem_names:
+            mem_names[read] = "m%d_%s" % (len(mem_names), label)
+            declare(read, mem_names[read])
+
+    def replace_reads(text):
+        result = []
+        start = 0
+        for read_start, read_end in get_mem_reads(text)[0]:
+            name = mem_names.get(text[read_start:read_end])
+            if name is not None and read_start >= start:
+                result.append(text[start:read_start])
+                result.append(name)
+                start = read_end
+        result.append(text[start:])
+        return ''.join(result)
+
+    if mem_names:
+        body = rewrite_texts(body, replace_reads)
+    return declarations, body
+
+
+def optimise_loops(statements):
+    # statements with counted loops written as for loops, and invariant expressions
+    # hoisted out of every loop, innermost first
+    result = []
+    for statement in statements:
+        kind = statement[0]
+        if kind == 'if':
+            result.append((
+                'if', statement[1], optimise_loops(statement[2]), optimise_loops(statement[3])
+            ))
+        elif kind == 'block':
+            result.append(('block', statement[1], optimise_loops(statement[2])))
+        elif kind in ('loop', 'do'):
+            statement = (kind, statement[1], optimise_loops(statement[2])) + statement[3:]
+            loop_statements = (kind == 'do' and make_counted_loop(statement)) or [statement]
+            loop = loop_statements[0]
+            declarations, body = hoist_invariants(loop[1], loop[2])
+            result += declarations
+            result.append((loop[0], loop[1], body) + loop[3:])
+            result += loop_statements[1:]
+        else:
+            result.append(statement)
+    return result
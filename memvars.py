@@ -0,0 +1,251 @@
+# Memory variables: player state held at fixed addresses - read and written by
+# LD A,(nn), LD (nn),A, LD HL,(nn), LD (nn),HL and the like - is kept in module-level
+# Javascript variables rather than in mem, with a cell that is only ever accessed as a
+# 16-bit word held as a single number:
+#
+#   l = mem[0x407b]; h = mem[0x407c];  ->  l = m407b & 0xff; h = m407b >> 8;
+#
+# This is only safe for addresses that nothing else reaches: no instruction may read or
+# write them through a computed pointer (including an LD A,(nn) or the like whose nn is
+# modified by self-modifying code), and they may not be part of an instruction.
+# Computed pointers are followed with a PointerAnalysis, which takes a pointer read from
+# memory (such as one into a tune's data) never to point at a variable; hence this is
+# only done when asked for.
+#
+# A variable that nothing writes to - such as a pointer into a tune, once its init routine
+# has been precomputed - is a constant, and its reads are replaced with its value.
+
+import re
+
+from codegen import RewrittenCode
+from constants import fold
+from pointers import ANY
+
+
+# instruction class name -> bytes accessed at the address it names
+FIXED_ADDRESS_INSTRUCTIONS = {
+    'LD_A_iNNi': 1,
+    'LD_iNNi_A': 1,
+    'LD_HL_iNNi': 2,
+    'LD_iNNi_HL': 2,
+    'LD_BCDE_iNNi': 2,
+    'LD_iNNi_BCDE': 2,
+    'LD_IXIY_iNNi': 2,
+}
+
+TARGET = r'(?:\w+|rp?\[\w+\])'
+WORD_READ_PATTERN = re.compile(
+    r'(%s) = mem\[(0x[0-9a-f]+)\];(\s*)(%s) = mem\[(0x[0-9a-f]+)\];' % (TARGET, TARGET)
+)
+WORD_WRITE_PATTERN = re.compile(
+    r'mem\[(0x[0-9a-f]+)\] = ([^;]+);(\s*)mem\[(0x[0-9a-f]+)\] = ([^;]+);'
+)
+BYTE_WRITE_PATTERN = re.compile(
+    r'mem\[(0x[0-9a-f]+)\](?: ((?:[-+&|^]|<<|>>)?)= ([^;]+)|(\+\+|--));'
+)
+BYTE_READ_PATTERN = re.compile(r'mem\[(0x[0-9a-f]+)\]')
+SIMPLE_OPERAND_PATTERN = re.compile(r'^(?:\w+|rp?\[\w+\])$')
+
+
+def parenthesise(expression):
+    expression = expression.strip()
+    if SIMPLE_OPERAND_PATTERN.match(expression):
+        return expression
+    return '(%s)' % expression
+
+
+class MemoryVariables(object):
+    # Find the memory variables of an analysis, as called from outside at entry_points
+
+    def __init__(self, analyzer, entry_points):
+        self.analyzer = analyzer
+        instructions_by_address = analyzer.instructions_by_address
+
+        byte_cells = set()
+        word_cells = set()
+        fixed_addresses = set()
+        code_bytes = set()
+        for addr in instructions_by_address:
+            code_bytes.update(
+                (addr + i) & 0xffff for i in range(instructions_by_address.lengths[addr])
+            )
+            if addr in instructions_by_address.modified_operands:
+                # its address is not fixed, so its accesses are followed as pointers
+                continue
+            width = FIXED_ADDRESS_INSTRUCTIONS.get(
+                instructions_by_address.get_class(addr).__name__
+            )
+            if width == 1:
+                byte_cells.add(instructions_by_address.params[addr])
+            elif width == 2:
+                word_cells.add(instructions_by_address.params[addr])
+            if width:
+                fixed_addresses.add(addr)
+
+        pointers = analyzer.get_pointer_analysis(entry_points)
+        reached = pointers.get_accessed_addresses(
+            addr for addr in instructions_by_address if addr not in fixed_addresses
+        )
+        written = pointers.get_accessed_addresses(instructions_by_address, writes_only=True)
+        if reached is ANY or written is ANY:
+            # something may write anywhere
+            reached = written = set(range(0x10000))
+        excluded = reached | code_bytes
+        data_accesses = pointers.get_data_accesses(instructions_by_address)
+        if data_accesses:
+            analyzer.log(
+                "Warning: %d instructions access memory through pointers read from memory, "
+                "taken not to reach memory variables (first: %s)"
+                % (len(data_accesses), instructions_by_address[data_accesses[0]])
+            )
+
+        cells = set(addr for addr in byte_cells if addr not in excluded)
+        for addr in word_cells:
+            cells.update(
+                cell for cell in (addr, (addr + 1) & 0xffff) if cell not in excluded
+            )
+
+        # addresses of variables holding a byte, and of those holding a word
+        self.words = set(
+            addr for addr in word_cells
+            if addr in cells and addr + 1 in cells
+            and not {addr, addr + 1} & byte_cells
+            and not {addr - 1, addr + 1} & word_cells
+        )
+        self.bytes = cells - self.words - set(addr + 1 for addr in self.words)
+        # addresses of the variables (of either size) that are never written
+        self.constants = set(
+            addr for addr in self.bytes | self.words
+            if addr not in written and (addr not in self.words or addr + 1 not in written)
+        )
+
+    def __bool__(self):
+        return bool(self.words or self.bytes)
+
+    __nonzero__ = __bool__
+
+    def report(self):
+        lines = []
+        if self.words:
+            lines.append("Word variables: %s" % ', '.join(
+                "0x%04x" % addr for addr in sorted(self.words)
+            ))
+        if self.bytes:
+            lines.append("Byte variables: %s" % ', '.join(
+                "0x%04x" % addr for addr in sorted(self.bytes)
+            ))
+        if self.constants:
+            lines.append("Constants: %s" % ', '.join(
+                "0x%04x" % addr for addr in sorted(self.constants)
+            ))
+        return lines
+
+    def get_value(self, mem, addr):
+        # the value of the variable at addr, in mem
+        if addr in self.words:
+            return "0x%04x" % (mem[addr] | (mem[(addr + 1) & 0xffff] << 8))
+        return "0x%02x" % mem[addr]
+
+    def declarations(self):
+        return [
+            "var m%04x = %s;" % (addr, self.get_value(self.analyzer.mem, addr))
+            for addr in sorted((self.words | self.bytes) - self.constants)
+        ]
+
+    def is_variable(self, addr):
+        return addr in self.bytes or addr in self.words or addr - 1 in self.words
+
+    def get_assignments(self, mem, addresses):
+        # statements setting the variables holding the given addresses to their values in mem
+        variables = set(
+            addr if addr in self.bytes or addr in self.words else addr - 1 for addr in addresses
+        )
+        return [
+            "m%04x = %s;" % (addr, self.get_value(mem, addr))
+            for addr in sorted(variables - self.constants)
+        ]
+
+    def get_byte(self, addr):
+        # the expression for reading the byte at addr, or None if it is not a variable
+        mem = self.analyzer.mem
+        if addr in self.constants or (addr - 1 in self.constants and addr - 1 in self.words):
+            return "0x%02x" % mem[addr]
+        elif addr in self.bytes:
+            return "m%04x" % addr
+        elif addr in self.words:
+            return "(m%04x & 0xff)" % addr
+        elif addr - 1 in self.words:
+            return "(m%04x >> 8)" % (addr - 1)
+
+    def set_byte(self, addr, value):
+        # the statement for writing value to the byte at addr
+        if addr in self.bytes:
+            return "m%04x = %s;" % (addr, value)
+        elif addr in self.words:
+            return "m%04x = m%04x & 0xff00 | %s;" % (addr, addr, parenthesise(value))
+        else:
+            return "m%04x = %s << 8 | m%04x & 0xff;" % (addr - 1, parenthesise(value), addr - 1)
+
+    def rewrite(self, code):
+        # rewrite the accesses in code to the memory that variables stand for
+        def word_read(match):
+            low, addr, space, high, high_addr = match.groups()
+            addr = int(addr, 16)
+            if addr not in self.words or int(high_addr, 16) != addr + 1:
+                return match.group(0)
+            if addr in self.constants:
+                return "%s = %s;%s%s = %s;" % (
+                    low, self.get_byte(addr), space, high, self.get_byte(addr + 1)
+                )
+            return "%s = m%04x & 0xff;%s%s = m%04x >> 8;" % (low, addr, space, high, addr)
+
+        def word_write(match):
+            addr, low, space, high_addr, high = match.groups()
+            addr = int(addr, 16)
+            if addr not in self.words or int(high_addr, 16) != addr + 1:
+                return match.group(0)
+            return "m%04x = %s;" % (addr, fold(
+                "%s << 8 | %s" % (parenthesise(high), parenthesise(low))
+            ))
+
+        def byte_write(match):
+            addr, operator, value, step = match.groups()
+            addr = int(addr, 16)
+            current = self.get_byte(addr)
+            if current is None:
+                return match.group(0)
+            if step:
+                value = "(%s %s 1) & 0xff" % (current, step[0])
+            elif operator in ('+', '-'):
+                value = "(%s %s %s) & 0xff" % (current, operator, parenthesise(value))
+            elif operator:
+                value = "%s %s %s" % (current, operator, parenthesise(value))
+            return self.set_byte(addr, value)
+
+        def byte_read(match):
+            current = self.get_byte(int(match.group(1), 16))
+            return match.group(0) if current is None else current
+
+        code = WORD_READ_PATTERN.sub(word_read, code)
+        code = WORD_WRITE_PATTERN.sub(word_write, code)
+        code = BYTE_WRITE_PATTERN.sub(byte_write, code)
+        return BYTE_READ_PATTERN.sub(byte_read, code)
+
+
+class MemoryVariableCode(RewrittenCode):
+    # The code for one routine's instructions, as given by code (a codegen.InstructionCode
+    # or another pass), with the memory that variables stand for accessed through them
+
+    def __init__(self, variables, code):
+        self.variables = variables
+        super(MemoryVariableCode, self).__init__(code)
+        self.return_code = variables.rewrite(code.return_code)
+
+    def code_for_address(self, addr):
+        return self.variables.rewrite(self.code.code_for_address(addr))
+
+    def condition_for_address(self, addr):
+        return self.variables.rewrite(self.code.condition_for_address(addr))
+
+    def code_before_branch(self, addr):
+        return self.variables.rewrite(self.code.code_before_branch(addr))
@@ -0,0 +1,514 @@
+# Pointer analysis: find the values that registers may hold at each instruction, as far as
+# they can be worked out from constants in the code, and from them the memory addresses
+# that each instruction may read or write.
+#
+# This runs the (buffer form) Javascript of each instruction over states in which every
+# register and flag holds a number, DATA - a value read from memory, or computed from
+# one - or ANY, a value that the analysis has lost track of. A pointer whose value is DATA
+# (typically one read from the data that a player is playing) is taken to point somewhere
+# other than the addresses that the code itself names; a pointer whose value is ANY may
+# point anywhere at all. A byte read from memory marked read-only has the value it has in
+# the memory image.
+#
+# Each instruction may be reached with several states, so that the counter and pointer of
+# a loop stay in step. Values that are no longer live are replaced with DATA to keep the
+# number of states down; past STATE_LIMIT states at one instruction, they are merged into
+# one, with ANY for every register on which they differ. Each routine is analysed once for
+# each different state that it is called with. Values pushed onto the stack are tracked
+# until the routine returns; the stack itself is taken to be data.
+
+import re
+from collections import defaultdict, deque
+
+from constants import split_statements
+from instructions import FLAG_TABLES, REGS_FROM_PAIR, TRACKED_VALUES, VALUE_MASKS
+from stack import uses_stack
+
+
+DATA = 'data'
+ANY = None
+
+NAMES = TRACKED_VALUES + ['tmp']
+INDEXES = dict((name, i) for i, name in enumerate(NAMES))
+STACK = len(NAMES)
+FLAGS = ['cFlag', 'zFlag', 'pvFlag', 'sFlag']
+
+# the most states kept at one instruction before they are merged
+STATE_LIMIT = 64
+
+OPERAND_PATTERN = re.compile(r'\brp?\[(\w+)\]|\b(tmp|cFlag|zFlag|pvFlag|sFlag)\b')
+ASSIGNMENT_PATTERN = re.compile(r'^([-+&|^]|<<|>>)?=(?!=)\s*(.*)$')
+CONDITION_PATTERN = re.compile(r'^if \((!?)(\w+)\) ')
+
+
+def find_closing_bracket(code, start):
+    # index of the bracket closing the one opened at code[start]
+    depth = 0
+    for i in range(start, len(code)):
+        if code[i] in '([{':
+            depth += 1
+        elif code[i] in ')]}':
+            depth -= 1
+            if depth == 0:
+                return i
+    raise ValueError("Unbalanced brackets in %r" % code)
+
+
+def split_arguments(arguments):
+    # split a function call's arguments at the top-level commas
+    result = []
+    depth = 0
+    start = 0
+    for i, char in enumerate(arguments):
+        if char in '([{':
+            depth += 1
+        elif char in ')]}':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            result.append(arguments[start:i].strip())
+            start = i + 1
+    result.append(arguments[start:].strip())
+    return result
+
+
+def to_python(expression):
+    # translate a Javascript expression (as generated for instructions) to Python
+    expression = expression.replace('===', '==').replace('!==', '!=')
+    expression = re.sub(r'!(?!=)', ' not ', expression)
+    expression = expression.replace('&&', ' and ').replace('||', ' or ')
+    return expression.replace('true', 'True').replace('false', 'False')
+
+
+def combine(values):
+    # the value of an expression whose operands have the given values, if they are not
+    # all known
+    if any(value is ANY for value in values):
+        return ANY
+    return DATA
+
+
+def is_known(value):
+    return value is not ANY and value is not DATA
+
+
+def merge(states):
+    # one state covering all the given states
+    merged = list(states[0])
+    for state in states[1:]:
+        for i, value in enumerate(state):
+            if merged[i] != value:
+                merged[i] = ANY
+    return tuple(merged)
+
+
+def covers(merged, state):
+    return all(m is ANY or m == value for m, value in zip(merged, state))
+
+
+class StateSet(object):
+    # The states that an instruction is reached with
+
+    def __init__(self):
+        self.states = set()
+        self.merged = None
+
+    def add(self, state):
+        # add a state; return True if this adds anything new
+        if self.merged is not None:
+            if covers(self.merged, state):
+                return False
+            self.merged = merge([self.merged, state])
+            self.states = set([self.merged])
+            return True
+        if state in self.states:
+            return False
+        self.states.add(state)
+        if len(self.states) > STATE_LIMIT:
+            self.merged = merge(list(self.states))
+            self.states = set([self.merged])
+        return True
+
+
+class Interpreter(object):
+    # Run instruction code over a state (a dict of name -> value), noting the memory that
+    # it accesses as (is_write, address) pairs
+
+    def __init__(self, constant_memory=None):
+        self.accesses = []
+        # address -> value for memory that is never written
+        self.constant_memory = constant_memory or {}
+
+    def read(self, address):
+        # the value of the byte at address; memory other than constant_memory is taken
+        # to be data
+        if is_known(address):
+            return self.constant_memory.get(address & 0xffff, DATA)
+        return DATA
+
+    def write(self, address, value):
+        pass
+
+    def out(self, port, value):
+        pass
+
+    def get(self, state, operand):
+        name = operand[operand.index('[') + 1:-1] if '[' in operand else operand
+        if operand.startswith('rp['):
+            high, low = [state[reg] for reg in REGS_FROM_PAIR[name]]
+            if is_known(high) and is_known(low):
+                return (high << 8) | low
+            return combine([high, low])
+        return state[name]
+
+    def set(self, state, operand, value):
+        name = operand[operand.index('[') + 1:-1] if '[' in operand else operand
+        if operand.startswith('rp['):
+            high, low = REGS_FROM_PAIR[name]
+            if is_known(value):
+                value &= 0xffff
+                state[high], state[low] = value >> 8, value & 0xff
+            else:
+                state[high] = state[low] = value
+        elif operand.startswith('r['):
+            state[name] = value & 0xff if is_known(value) else value
+        elif name in state:
+            state[name] = value
+
+    def evaluate(self, expression, state):
+        # the value of an expression, noting any memory that it reads
+        while 'mem[' in expression:
+            start = expression.index('mem[')
+            end = find_closing_bracket(expression, start + 3)
+            address = self.evaluate(expression[start + 4:end], state)
+            self.accesses.append((False, address))
+            value = self.read(address)
+            expression = '%s %s %s' % (
+                expression[:start], value if is_known(value) else '_data', expression[end + 1:]
+            )
+
+        values = []
+
+        def replace(match):
+            value = self.get(state, match.group(0))
+            values.append(value)
+            if isinstance(value, bool):
+                return str(value)
+            return '_data' if not is_known(value) else str(value)
+
+        expression = OPERAND_PATTERN.sub(replace, expression)
+        if '_data' in expression:
+            return combine(values)
+        if '>>>' in expression:
+            return ANY
+        try:
+            return eval(to_python(expression), dict(FLAG_TABLES, __builtins__={}))
+        except Exception:
+            return ANY
+
+    def run(self, code, state):
+        # return the list of states that code can leave state in
+        states = [state]
+        for statement in split_statements(code):
+            statement = statement.strip()
+            states = [
+                result for state in states for result in self.run_statement(statement, state)
+            ]
+        return states
+
+    def run_statement(self, statement, state):
+        if statement.startswith('/*') or statement in ('return;', 'break;'):
+            return [state]
+
+        if statement.startswith('if ('):
+            end = find_closing_bracket(statement, 3)
+            condition = self.evaluate(statement[4:end], state)
+            body = statement[end + 1:].strip()
+            if body.startswith('{'):
+                body = body[1:-1]
+            if is_known(condition):
+                return self.run(body, state) if condition else [state]
+            return self.run(body, dict(state)) + [state]
+
+        if statement.startswith('mem['):
+            target = statement[:find_closing_bracket(statement, 3) + 1]
+        else:
+            target = re.match(r'^(rp?\[\w+\]|\w+)', statement).group(1)
+        rest = statement[len(target):].strip().rstrip(';').strip()
+
+        match = ASSIGNMENT_PATTERN.match(rest)
+        if rest in ('++', '--'):
+            expression = "%s %s 1" % (target, rest[0])
+        elif match and match.group(1):
+            expression = "%s %s (%s)" % (target, match.group(1), match.group(2))
+        elif match:
+            expression = match.group(2)
+        elif statement.startswith('out('):
+            port, value = split_arguments(statement[4:find_closing_bracket(statement, 3)])
+            self.out(self.evaluate(port, state), self.evaluate(value, state))
+            return [state]
+        else:
+            self.evaluate(statement.rstrip(';'), state)
+            return [state]
+
+        value = self.evaluate(expression, state)
+        if target.startswith('mem['):
+            address = self.evaluate(target[4:-1], state)
+            self.accesses.append((True, address))
+            self.write(address, value)
+        else:
+            self.set(state, target, value)
+        return [state]
+
+
+class PointerAnalysis(object):
+    # Analyse the routines of an analysis, as called from outside at entry_points
+
+    def __init__(self, analyzer, entry_points):
+        self.analyzer = analyzer
+        self.instructions_by_address = analyzer.instructions_by_address
+        self.constant_memory = analyzer.get_constant_memory()
+
+        # the values that each routine, or anything that it calls, may change
+        self.changes = {}
+        for addr in analyzer.routines:
+            changed = set()
+            seen = set()
+            stack = [addr]
+            while stack:
+                routine_addr = stack.pop()
+                if routine_addr in seen or routine_addr not in analyzer.routines:
+                    continue
+                seen.add(routine_addr)
+                changed |= analyzer.routines[routine_addr].overwrites
+                stack.extend(analyzer.routines[routine_addr].calls)
+            self.changes[addr] = changed | set(['tmp'])
+
+        # (routine address, entry state) -> set of exit states; None while being analysed
+        self.summaries = {}
+        # address -> set of (is_write, address accessed)
+        self.accesses_by_address = defaultdict(set)
+        # address -> name -> set of values that it has on reaching the instruction
+        self.values_by_address = defaultdict(lambda: defaultdict(set))
+
+        for addr in entry_points:
+            state = tuple([DATA] * len(NAMES)) + ((),)
+            self.get_exit_states(addr, self.normalise(state, self.get_live_in(addr)))
+
+    def get_live_in(self, addr):
+        return self.analyzer.live_in_by_address.get(addr, 0)
+
+    def normalise(self, state, live):
+        # replace the values that are not in the live mask with DATA
+        return tuple(
+            value if i == STACK or (name != 'tmp' and live & VALUE_MASKS[name]) else DATA
+            for i, (name, value) in enumerate(zip(NAMES + ['stack'], state))
+        )
+
+    def get_exit_states(self, routine_addr, entry_state):
+        key = (routine_addr, entry_state)
+        if key in self.summaries:
+            exit_states = self.summaries[key]
+            if exit_states is None:
+                # a recursive call: assume that anything it changes is lost
+                return set([tuple(
+                    ANY if name in self.changes.get(routine_addr, NAMES) else value
+                    for name, value in zip(NAMES, entry_state)
+                ) + (entry_state[STACK],)])
+            return exit_states
+        self.summaries[key] = None
+
+        instructions_by_address = self.instructions_by_address
+        states_by_address = defaultdict(StateSet)
+        exit_states = set()
+        worklist = deque()
+
+        def propagate(addr, state):
+            if addr in instructions_by_address:
+                state = self.normalise(state, self.get_live_in(addr))
+                if states_by_address[addr].add(state):
+                    worklist.append((addr, state))
+
+        propagate(routine_addr, entry_state)
+        while worklist:
+            addr, state = worklist.popleft()
+            values = self.values_by_address[addr]
+            for name, value in zip(NAMES, state):
+                values[name].add(value)
+
+            for dest, result in self.run(addr, state):
+                if dest is None:
+                    exit_states.add(result)
+                else:
+                    propagate(dest, result)
+
+        self.summaries[key] = exit_states
+        return exit_states
+
+    def get_condition(self, addr, state):
+        # whether the condition of a conditional instruction holds in state (True, False
+        # or None if not known), or True for an unconditional one
+        code = self.instructions_by_address[addr].to_javascript()
+        match = CONDITION_PATTERN.match(code or '')
+        if not match:
+            return True
+        value = state[INDEXES[match.group(2)]]
+        if not is_known(value):
+            return None
+        return (not value) if match.group(1) else bool(value)
+
+    def run(self, addr, state):
+        # Run the instruction at addr from state; return a list of (destination, state)
+        # for the states it can leave, with None as the destination for a routine exit
+        instructions_by_address = self.instructions_by_address
+        cls_name = instructions_by_address.get_class(addr).__name__
+        next_addr = instructions_by_address.next_address(addr)
+        call_target = instructions_by_address.call_target(addr)
+        jump_target = instructions_by_address.jump_target(addr)
+
+        if cls_name == 'DJNZ_NN':
+            registers = list(state)
+            b = registers[INDEXES['B']]
+            registers[INDEXES['B']] = (b - 1) & 0xff if is_known(b) else b
+            state = tuple(registers)
+            destinations = instructions_by_address.static_destination_addresses(addr)
+            if is_known(b) and b == 1:
+                destinations = [dest for dest in destinations if dest != jump_target]
+            return [(dest, state) for dest in destinations]
+
+        if call_target is not None or jump_target is not None or instructions_by_address.is_routine_exit(addr):
+            condition = self.get_condition(addr, state)
+            results = []
+            if condition is not False:
+                if call_target is not None:
+                    results.extend((next_addr, result) for result in self.call(call_target, state))
+                elif jump_target is not None:
+                    results.append((jump_target, state))
+                else:
+                    results.append((None, state))
+            if condition is not True:
+                results.append((next_addr, state))
+            return results
+
+        stack = state[STACK]
+        values = dict(zip(NAMES, state))
+        interpreter = Interpreter(self.constant_memory)
+        if cls_name in ('LDIR', 'LDDR'):
+            results = [self.block_transfer(interpreter, values, 1 if cls_name == 'LDIR' else -1)]
+        elif cls_name in ('PUSH_RR', 'POP_RR', 'POP_IXIY', 'EX_iSPi_HL'):
+            results, stack = self.run_stack_instruction(interpreter, addr, values, stack)
+        else:
+            code = self.get_code(addr)
+            if code is None:
+                for name in self.get_overwritten(addr):
+                    values[name] = ANY
+                results = [values]
+            else:
+                results = interpreter.run(code, values)
+
+        for is_write, address in interpreter.accesses:
+            self.accesses_by_address[addr].add((is_write, address))
+        destinations = instructions_by_address.static_destination_addresses(addr)
+        return [
+            (dest, tuple(result[name] for name in NAMES) + (stack,))
+            for result in results for dest in destinations
+        ]
+
+    def get_code(self, addr):
+        try:
+            return self.instructions_by_address[addr].to_javascript()
+        except NotImplementedError:
+            return None
+
+    def get_overwritten(self, addr):
+        mask = self.instructions_by_address.overwrites_masks[addr]
+        return [name for name in TRACKED_VALUES if mask & VALUE_MASKS[name]]
+
+    def call(self, routine_addr, state):
+        # the states following a call to routine_addr from state
+        stack = state[STACK]
+        entry_state = self.normalise(state[:STACK] + ((),), self.get_live_in(routine_addr))
+        changes = self.changes.get(routine_addr, set(NAMES))
+        return [
+            tuple(
+                exit_value if name in changes else value
+                for name, value, exit_value in zip(NAMES, state, exit_state)
+            ) + (stack,)
+            for exit_state in self.get_exit_states(routine_addr, entry_state)
+        ]
+
+    def block_transfer(self, interpreter, values, step):
+        # LDIR (step 1) / LDDR (step -1)
+        source = interpreter.get(values, 'rp[HL]')
+        destination = interpreter.get(values, 'rp[DE]')
+        count = interpreter.get(values, 'rp[BC]')
+        for is_write, start in ((False, source), (True, destination)):
+            if not is_known(start):
+                interpreter.accesses.append((is_write, start))
+            elif not is_known(count):
+                interpreter.accesses.append((is_write, ANY))
+            else:
+                interpreter.accesses.extend(
+                    (is_write, (start + i * step) & 0xffff) for i in range(count or 0x10000)
+                )
+        for pair in ('HL', 'DE'):
+            interpreter.set(
+                values, 'rp[%s]' % pair,
+                interpreter.evaluate('rp[%s] %s rp[BC]' % (pair, '+' if step > 0 else '-'), values)
+            )
+        interpreter.set(values, 'rp[BC]', 0)
+        values['pvFlag'] = False
+        return values
+
+    def run_stack_instruction(self, interpreter, addr, values, stack):
+        # PUSH / POP / EX (SP),HL: keep the values on the stack in the state
+        instruction = self.instructions_by_address[addr]
+        reg_pair = instruction.reg_pair if hasattr(instruction, 'reg_pair') else 'HL'
+        if reg_pair == 'AF':
+            pair = ['A'] + FLAGS
+        else:
+            pair = list(REGS_FROM_PAIR[reg_pair])
+
+        cls_name = type(instruction).__name__
+        if cls_name == 'PUSH_RR':
+            interpreter.accesses.extend([(True, DATA), (True, DATA)])
+            return [values], stack + (tuple(values[name] for name in pair),)
+
+        interpreter.accesses.extend([(False, DATA), (False, DATA)])
+        if stack:
+            popped, stack = stack[-1], stack[:-1]
+        else:
+            popped = tuple([DATA] * len(pair))
+        if cls_name == 'EX_iSPi_HL':
+            interpreter.accesses.extend([(True, DATA), (True, DATA)])
+            stack = stack + (tuple(values[name] for name in pair),)
+        if len(popped) != len(pair):
+            # pushed as another register pair
+            popped = tuple([ANY] * len(pair))
+        for name, value in zip(pair, popped):
+            values[name] = value
+        return [values], stack
+
+    def get_data_accesses(self, addrs, writes_only=False):
+        # the addresses of the instructions at addrs that may access (or just write) memory
+        # through a pointer read from memory - other than the stack - which this analysis
+        # takes not to reach anything that the code names
+        return sorted(
+            addr for addr in addrs
+            if any(
+                address is DATA and (is_write or not writes_only)
+                for is_write, address in self.accesses_by_address.get(addr, ())
+            ) and not uses_stack(self.instructions_by_address.get_class(addr))
+        )
+
+    def get_accessed_addresses(self, addrs, writes_only=False):
+        # the addresses that the instructions at addrs may access (or just write), or ANY
+        addresses = set()
+        for addr in addrs:
+            for is_write, address in self.accesses_by_address.get(addr, ()):
+                if writes_only and not is_write:
+                    continue
+                if address is ANY:
+                    return ANY
+                if address is not DATA:
+                    addresses.add(address)
+        return addresses
@@ -0,0 +1,331 @@
+# AY port decoding at compile time: a write to a port known at compile time that the
+# 128K Spectrum decodes as the AY's register select or data port - as with OUT (C),A once
+# BC has been folded to 0xfffd - sets the host's AY state directly, rather than calling
+# out() to decode the port when it runs:
+#
+#   out(0xfffd, a);  ->  selectedAYRegister = a;
+#   out(0xbffd, mem[0x40ae]);  ->  ayRegisters[selectedAYRegister] = mem[0x40ae]; ...
+#
+# The state is that kept by the out() of the hosts in this repository (such as
+# stc_player.js): selectedAYRegister, and ayRegisters, with ayRegisters[14] set to true
+# whenever the envelope shape (register 13) is written. Writes to any other port, or to
+# a port that is only known when the code runs, still go through out().
+#
+# A loop that writes a run of AY registers from memory - selecting each register with
+# OUT (C),A, writing it with OUTD or OUTI and stepping A to the next - is written as one
+# copy into ayRegisters, with none of the port handling or flag updates of each pass:
+#
+#   l442f: do {                                for (var i = 0; i <= a; i++) {
+#       selectedAYRegister = a;          ->        ayRegisters[i] = mem[...];}
+#       ayRegisters[selectedAYRegister] = ...;  if (a >= 13) ayRegisters[14] = true;
+#       ...                                     selectedAYRegister = 0x00; ...
+#   } while (!(a & 0x80));
+#
+# This is done for the two shapes of loop that the players in this repository use -
+# OUTD / DEC A / JP P, counting down to register 0, and OUTI / INC A / CP n / JR NZ,
+# counting up to register n - 1 - where the pointer analysis shows both ports known and
+# the counter and pointer never taking the loop past register 0x7f or the end of memory.
+
+import re
+
+from codegen import RewrittenCode
+from instructions import VALUE_MASKS
+from pointers import find_closing_bracket, is_known, split_arguments
+
+
+PORT_MASK = 0xc002
+SELECT_PORT = 0xc000
+DATA_PORT = 0x8000
+# the register whose writes restart the envelope
+ENVELOPE_SHAPE_REGISTER = 13
+
+OUT_PATTERN = re.compile(r'\bout\(')
+NUMBER_PATTERN = re.compile(r'^(?:0x[0-9a-fA-F]+|\d+)$')
+
+
+def select_register(register):
+    # the statement selecting an AY register, given as a Javascript expression
+    return "selectedAYRegister = %s;" % register
+
+
+def write_register(value, register=None):
+    # the statement(s) writing value to the AY register register (a number), or to the
+    # selected one if that is not known at compile time
+    if register is None:
+        return (
+            "ayRegisters[selectedAYRegister] = %s; "
+            "if (selectedAYRegister === %d) ayRegisters[14] = true;"
+        ) % (value, ENVELOPE_SHAPE_REGISTER)
+    elif register == ENVELOPE_SHAPE_REGISTER:
+        return "ayRegisters[%d] = %s; ayRegisters[14] = true;" % (register, value)
+    else:
+        return "ayRegisters[%d] = %s;" % (register, value)
+
+
+def get_port_kind(port):
+    # SELECT_PORT or DATA_PORT if the 128K Spectrum decodes port as that AY port, or None
+    kind = port & PORT_MASK
+    if kind in (SELECT_PORT, DATA_PORT):
+        return kind
+    return None
+
+
+def rewrite_outs(code):
+    # rewrite the out() calls in code to AY ports known at compile time
+    result = []
+    start = 0
+    for match in OUT_PATTERN.finditer(code):
+        end = find_closing_bracket(code, match.end() - 1)
+        if not code[end + 1:].startswith(';'):
+            continue
+        port, value = split_arguments(code[match.end():end])
+        kind = get_port_kind(int(port, 0)) if NUMBER_PATTERN.match(port) else None
+        if kind is None:
+            continue
+        result.append(code[start:match.start()])
+        result.append(select_register(value) if kind == SELECT_PORT else write_register(value))
+        start = end + 2
+    result.append(code[start:])
+    return ''.join(result)
+
+
+class AYPortCode(RewrittenCode):
+    # The code for one routine's instructions, as given by code (a codegen.InstructionCode
+    # or another pass), with writes to AY ports known at compile time made directly
+
+    def __init__(self, code):
+        super(AYPortCode, self).__init__(code)
+
+    def code_for_address(self, addr):
+        return rewrite_outs(self.code.code_for_address(addr))
+
+    def code_before_branch(self, addr):
+        return rewrite_outs(self.code.code_before_branch(addr))
+
+
+# instruction class names that may come between the parts of a register loop, so long as
+# they only set B (to the port for the next OUT)
+PORT_SETTING_INSTRUCTIONS = set(['LD_R_N', 'LD_R_R'])
+
+
+class AYRegisterLoop(object):
+    # A loop (a block that jumps back to itself) writing a run of AY registers from memory.
+    # step is -1 for OUTD / DEC A / JP P, or 1 for OUTI / INC A / CP end / JR NZ
+
+    def __init__(self, block, step, end, port_setter, write_addr, jump_addr, values):
+        self.block = block
+        self.step = step
+        self.end = end
+        # addresses of the last instruction in the loop to set B (or None), of the OUTD /
+        # OUTI, and of the jump back
+        self.port_setter = port_setter
+        self.write_addr = write_addr
+        self.jump_addr = jump_addr
+        # the values that A takes at the start of the loop
+        self.counter_values = values
+
+    def to_javascript(self, live, port_setter_code):
+        # The code for the whole loop, given the values live after it and the code for
+        # its last write to B; or None if it leaves a live value that this cannot set
+        if live & VALUE_MASKS['B'] and (
+            self.port_setter is None or self.port_setter < self.write_addr
+        ):
+            # left as the OUTD / OUTI leaves it
+            return None
+        if self.step < 0:
+            # registers A ... 0 from the bytes HL - A ... HL
+            code = [
+                "for (var i = 0; i <= r[A]; i++) {"
+                "ayRegisters[i] = mem[(rp[HL] - r[A] + i) & 0xffff];}",
+                self.envelope_code("r[A] >= %d" % ENVELOPE_SHAPE_REGISTER),
+                select_register("0x00"),
+            ]
+            if live & (VALUE_MASKS['H'] | VALUE_MASKS['L']):
+                code.append("rp[HL] = rp[HL] - r[A] - 1;")
+            final_a = 0xff
+            flags = {'zFlag': 'false', 'sFlag': 'true', 'pvFlag': 'false'}
+        else:
+            # registers A ... end - 1 from the bytes HL ... HL + end - 1 - A
+            code = [
+                "for (var i = r[A]; i < 0x%02x; i++) {"
+                "ayRegisters[i] = mem[(rp[HL] - r[A] + i) & 0xffff];}" % self.end,
+                self.envelope_code("r[A] <= %d" % ENVELOPE_SHAPE_REGISTER),
+                select_register("0x%02x" % (self.end - 1)),
+            ]
+            if live & (VALUE_MASKS['H'] | VALUE_MASKS['L']):
+                code.append("rp[HL] = rp[HL] + 0x%02x - r[A];" % self.end)
+            final_a = self.end
+            flags = {'zFlag': 'true', 'sFlag': 'false', 'pvFlag': 'false', 'cFlag': 'false'}
+
+        if live & VALUE_MASKS['A']:
+            code.append("r[A] = 0x%02x;" % final_a)
+        # B is set as the loop last sets it even if it is not live, as the instruction
+        # doing so is taken to set it
+        code.append(port_setter_code)
+        for flag in ['cFlag', 'zFlag', 'sFlag', 'pvFlag']:
+            if flag in flags and live & VALUE_MASKS[flag]:
+                code.append("%s = %s;" % (flag, flags[flag]))
+        return '\n'.join(line for line in code if line)
+
+    def envelope_code(self, condition):
+        # restart the envelope if the loop writes register 13 - which, as it counts
+        # towards register 0 or up to end - 1, it does for the counter values given by
+        # condition
+        last = 0 if self.step < 0 else self.end - 1
+        writes = [
+            min(value, last) <= ENVELOPE_SHAPE_REGISTER <= max(value, last)
+            for value in self.counter_values
+        ]
+        if all(writes):
+            return "ayRegisters[14] = true;"
+        elif any(writes):
+            return "if (%s) ayRegisters[14] = true;" % condition
+        return ''
+
+
+def get_known_values(values, name):
+    # the values that a register may take, if they are all known; otherwise None
+    if not values[name] or not all(is_known(value) for value in values[name]):
+        return None
+    return sorted(values[name])
+
+
+def get_ports(values):
+    # the ports that BC may hold, if they are all known; otherwise None
+    high, low = get_known_values(values, 'B'), get_known_values(values, 'C')
+    if high is None or low is None:
+        return None
+    return [(b << 8) | c for b in high for c in low]
+
+
+def find_register_loop(analyzer, pointers, block):
+    # the AYRegisterLoop that block is, or None
+    instructions_by_address = analyzer.instructions_by_address
+    jump_addr = block.last_addr
+    if (
+        instructions_by_address.jump_target(jump_addr) != block.start_addr
+        or instructions_by_address.next_address(jump_addr)
+        not in instructions_by_address.static_destination_addresses(jump_addr)
+    ):
+        return None
+
+    # the parts of the loop, in the order that they must come in
+    parts = []
+    port_setter = None
+    for addr in block.addresses[:-1]:
+        instruction = instructions_by_address[addr]
+        name = type(instruction).__name__
+        if name in PORT_SETTING_INSTRUCTIONS:
+            if getattr(instruction, 'reg', getattr(instruction, 'r1', None)) != 'B':
+                return None
+            port_setter = addr
+        elif name == 'OUT_iCi_R' and instruction.reg == 'A':
+            parts.append(('select', addr))
+        elif name in ('OUTD', 'OUTI'):
+            parts.append((name, addr))
+        elif name in ('DEC_R', 'INC_R') and instruction.reg == 'A':
+            parts.append((name, addr))
+        elif name == 'CP_N':
+            parts.append((name, instruction.param))
+        else:
+            return None
+    jump = instructions_by_address[jump_addr]
+    kinds = [kind for kind, _ in parts]
+    if kinds == ['select', 'OUTD', 'DEC_R'] and jump.condition == 'P':
+        step, end = -1, None
+    elif kinds == ['select', 'OUTI', 'INC_R', 'CP_N'] and jump.condition == 'NZ':
+        step, end = 1, parts[3][1]
+    else:
+        return None
+
+    # both ports must be known, and the counter and pointer must stay in range
+    select_addr, write_addr = parts[0][1], parts[1][1]
+    select_ports = get_ports(pointers.values_by_address[select_addr])
+    write_ports = get_ports(pointers.values_by_address[write_addr])
+    if (
+        not select_ports or not write_ports
+        or any(get_port_kind(port) != SELECT_PORT for port in select_ports)
+        or any(get_port_kind(port) != DATA_PORT for port in write_ports)
+    ):
+        return None
+    values = pointers.values_by_address[block.start_addr]
+    counter = get_known_values(values, 'A')
+    high, low = get_known_values(values, 'H'), get_known_values(values, 'L')
+    if counter is None or high is None or low is None:
+        return None
+    pointer_min, pointer_max = (high[0] << 8) | low[0], (high[-1] << 8) | low[-1]
+    if step < 0 and (counter[-1] >= 0x80 or pointer_min < counter[-1]):
+        return None
+    if step > 0 and (counter[-1] >= end or pointer_max + end > 0x10000):
+        return None
+
+    return AYRegisterLoop(block, step, end, port_setter, write_addr, jump_addr, counter)
+
+
+class AYRegisterLoops(object):
+    # The AY register loops of an analysis, as called from outside at entry_points
+
+    def __init__(self, analyzer, entry_points):
+        pointers = analyzer.get_pointer_analysis(entry_points)
+        # address of the loop's block -> AYRegisterLoop
+        self.loops_by_address = {}
+        for routine in analyzer.routines.values():
+            if routine.start_addr in analyzer.precomputed:
+                continue
+            for block in routine.cfg.blocks:
+                if block not in block.successors:
+                    continue
+                loop = find_register_loop(analyzer, pointers, block)
+                if loop is not None:
+                    self.loops_by_address[block.start_addr] = loop
+
+    def report(self):
+        return [
+            "AY register loop at 0x%04x written as one copy" % addr
+            for addr in sorted(self.loops_by_address)
+        ]
+
+
+class AYRegisterLoopCode(RewrittenCode):
+    # The code for one routine's instructions, as given by code (a codegen.InstructionCode
+    # or another pass), with the AY register loops found by loops (an AYRegisterLoops)
+    # written as a bulk copy, leaving the values live after them as given by liveness (a
+    # summary.RoutineLiveness)
+
+    def __init__(self, loops, liveness, code):
+        super(AYRegisterLoopCode, self).__init__(code)
+        self.code_by_address = {}
+        self.condition_by_address = {}
+        for block in liveness.routine.cfg.blocks:
+            loop = loops.loops_by_address.get(block.start_addr)
+            if loop is None:
+                continue
+            live = liveness.get_live_in(
+                liveness.analyzer.instructions_by_address.next_address(loop.jump_addr)
+            )
+            port_setter_code = (
+                code.code_for_address(loop.port_setter) if loop.port_setter is not None else ''
+            )
+            loop_code = loop.to_javascript(live, port_setter_code)
+            if loop_code is None:
+                continue
+            for addr in block.addresses:
+                self.code_by_address[addr] = ''
+            self.code_by_address[block.start_addr] = loop_code
+            # the loop never goes round
+            self.condition_by_address[loop.jump_addr] = 'false'
+
+    def code_for_address(self, addr):
+        if addr in self.code_by_address:
+            return self.code_by_address[addr]
+        return self.code.code_for_address(addr)
+
+    def condition_for_address(self, addr):
+        if addr in self.condition_by_address:
+            return self.condition_by_address[addr]
+        return self.code.condition_for_address(addr)
+
+    def code_before_branch(self, addr):
+        if addr in self.condition_by_address:
+            return ''
+        return self.code.code_before_branch(addr)
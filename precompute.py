@@ -0,0 +1,258 @@
+# Compile-time evaluation of a routine. A player's init routine does the same thing every
+# time it is run on a given tune - reading the tune's header, filling in its tables and
+# setting up the sound chip - so it can be run once, inside the compiler, and emitted as
+# code that sets up the state that it leaves:
+#
+#   function r4000() {
+#       mem.set([0x77, 0xf1, 0x8f, 0xf1, ...], 0x4070);
+#       out(0xfffd, 0x07); out(0xbffd, 0x3f);
+#       ...
+#   }
+#
+# The routine is run from the memory image, with SP and any other registers and flags that
+# it reads given by the caller, and each instruction decoded from memory as it stands and run as the
+# Javascript that it would be emitted as. Anything that the routine does that depends on
+# state from outside it - or that cannot be followed, such as a jump through a register -
+# is an error.
+
+from instructions import (
+    REGS_FROM_PAIR, TRACKED_VALUES, VALUE_MASKS, get_instruction, mask_to_values,
+)
+from pointers import FLAGS, Interpreter, is_known
+from ports import DATA_PORT, SELECT_PORT, get_port_kind, select_register, write_register
+
+
+# the most instructions to run before giving up
+STEP_LIMIT = 10000000
+
+
+class ConcreteInterpreter(Interpreter):
+    # An Interpreter over a memory image, noting values sent to ports
+
+    def __init__(self, precomputation):
+        super(ConcreteInterpreter, self).__init__()
+        self.precomputation = precomputation
+
+    def read(self, address):
+        if not is_known(address):
+            self.precomputation.fail("reads memory through an unknown pointer")
+        return self.precomputation.mem[address & 0xffff]
+
+    def write(self, address, value):
+        if not (is_known(address) and is_known(value)):
+            self.precomputation.fail("writes an unknown value to memory")
+        self.precomputation.mem[address & 0xffff] = value & 0xff
+        self.precomputation.written.add(address & 0xffff)
+
+    def out(self, port, value):
+        if not (is_known(port) and is_known(value)):
+            self.precomputation.fail("writes an unknown value to a port")
+        self.precomputation.outs.append((port & 0xffff, value & 0xff))
+
+
+class Precomputation(object):
+    # Run the routine at addr of an analysis, with SP set to stack_pointer and the registers
+    # and flags named in registers (register pairs by the names of both halves) set to the
+    # values given. Anything else that the routine may read before writing is an error
+
+    def __init__(self, analyzer, addr, stack_pointer=0x0000, registers=None):
+        self.analyzer = analyzer
+        self.addr = addr
+        self.mem = bytearray(analyzer.mem)
+        # (port, value) for each value sent to a port, in order
+        self.outs = []
+        # addresses of the bytes of memory that the routine writes
+        self.written = set()
+        self.pc = addr
+
+        state = dict((name, 0) for name in TRACKED_VALUES)
+        state.update((name, False) for name in FLAGS)
+        state['tmp'] = 0
+        for name, value in (registers or {}).items():
+            if name in REGS_FROM_PAIR:
+                h, l = REGS_FROM_PAIR[name]
+                state[h], state[l] = (value >> 8) & 0xff, value & 0xff
+            elif name in FLAGS:
+                state[name] = bool(value)
+            elif name in TRACKED_VALUES:
+                state[name] = value & 0xff
+            else:
+                raise ValueError("Unknown register: %s" % name)
+        state['SPH'], state['SPL'] = stack_pointer >> 8, stack_pointer & 0xff
+        self.state = state
+
+        given = VALUE_MASKS['SPH'] | VALUE_MASKS['SPL']
+        for name in (registers or {}):
+            for value in REGS_FROM_PAIR.get(name, (name,)):
+                given |= VALUE_MASKS[value]
+        inputs = analyzer.get_routine_summaries().reads[addr] & ~given
+        if inputs:
+            raise NotImplementedError(
+                "Cannot run r%04x at compile time: it reads %s, which are not given"
+                % (addr, ', '.join(
+                    value for value in TRACKED_VALUES if inputs & VALUE_MASKS[value]
+                ))
+            )
+
+        stack_depth = self.run(stack_pointer)
+
+        # bytes below the stack pointer are left as they were
+        stack = set((stack_pointer - 1 - i) & 0xffff for i in range(stack_depth))
+        # (address, value) for each byte of memory that the routine writes - whether or
+        # not that changes it from the memory image, as the routine may be run again
+        self.changes = [
+            (address, self.mem[address]) for address in sorted(self.written - stack)
+        ]
+        # name -> value for each register and flag that the routine leaves known
+        self.registers = dict(
+            (name, self.state[name]) for name in TRACKED_VALUES if is_known(self.state[name])
+        )
+
+    def fail(self, reason):
+        raise NotImplementedError(
+            "Cannot run r%04x at compile time: 0x%04x %s" % (self.addr, self.pc, reason)
+        )
+
+    def decode(self, addr):
+        # the instruction at addr, as it now stands in memory
+        instructions_by_address = self.analyzer.instructions_by_address
+        if addr not in instructions_by_address:
+            self.fail("is not traced code")
+        instruction = get_instruction(self.mem, addr)
+        if type(instruction) is not instructions_by_address.get_class(addr):
+            self.fail("has been modified to another instruction")
+        instruction.used_results = mask_to_values(instructions_by_address.used_results_masks[addr])
+        return instruction
+
+    def is_condition_met(self, instruction, interpreter):
+        if not instruction.has_condition:
+            return True
+        value = interpreter.evaluate(instruction.condition_to_javascript(), self.state)
+        if not is_known(value):
+            self.fail("branches on an unknown condition")
+        return bool(value)
+
+    def run(self, stack_pointer):
+        # run the routine to its return; return the greatest depth of the stack
+        interpreter = ConcreteInterpreter(self)
+        return_addresses = []
+        stack_depth = 0
+
+        for step in range(STEP_LIMIT):
+            state = self.state
+            instruction = self.decode(self.pc)
+            next_addr = (self.pc + instruction.length) & 0xffff
+            cls_name = type(instruction).__name__
+
+            if cls_name == 'DJNZ_NN':
+                state['B'] = (state['B'] - 1) & 0xff
+                self.pc = instruction.jump_target if state['B'] else next_addr
+            elif instruction.call_target is not None:
+                if self.is_condition_met(instruction, interpreter):
+                    return_addresses.append(next_addr)
+                    self.pc = instruction.call_target
+                else:
+                    self.pc = next_addr
+            elif instruction.jump_target is not None:
+                if self.is_condition_met(instruction, interpreter):
+                    self.pc = instruction.jump_target
+                else:
+                    self.pc = next_addr
+            elif instruction.is_routine_exit:
+                if self.is_condition_met(instruction, interpreter):
+                    if not return_addresses:
+                        return stack_depth
+                    self.pc = return_addresses.pop()
+                else:
+                    self.pc = next_addr
+            else:
+                if instruction.static_destination_addresses != [next_addr]:
+                    self.fail("jumps to an unknown address")
+                if cls_name in ('LDIR', 'LDDR'):
+                    self.block_transfer(1 if cls_name == 'LDIR' else -1)
+                else:
+                    self.run_code(instruction, interpreter)
+                self.pc = next_addr
+
+            state = self.state
+            if not (is_known(state['SPH']) and is_known(state['SPL'])):
+                self.fail("loses track of the stack pointer")
+            sp = (state['SPH'] << 8) | state['SPL']
+            stack_depth = max(stack_depth, (stack_pointer - sp) & 0xffff)
+
+        self.fail("runs for too long")
+
+    def run_code(self, instruction, interpreter):
+        try:
+            code = instruction.to_javascript()
+        except NotImplementedError:
+            code = None
+        if code is None:
+            self.fail("has no code")
+        if 'while' in code:
+            self.fail("has a loop in its code")
+        states = interpreter.run(code, self.state)
+        if len(states) != 1:
+            self.fail("branches on an unknown condition")
+        self.state = states[0]
+
+    def block_transfer(self, step):
+        # LDIR (step 1) / LDDR (step -1)
+        state = self.state
+        if not all(is_known(state[reg]) for reg in ('B', 'C', 'D', 'E', 'H', 'L')):
+            self.fail("copies memory with unknown pointers")
+        source = (state['H'] << 8) | state['L']
+        destination = (state['D'] << 8) | state['E']
+        count = ((state['B'] << 8) | state['C']) or 0x10000
+        for i in range(count):
+            self.mem[(destination + i * step) & 0xffff] = self.mem[(source + i * step) & 0xffff]
+            self.written.add((destination + i * step) & 0xffff)
+        source = (source + count * step) & 0xffff
+        destination = (destination + count * step) & 0xffff
+        state['H'], state['L'] = source >> 8, source & 0xff
+        state['D'], state['E'] = destination >> 8, destination & 0xff
+        state['B'] = state['C'] = 0
+        state['pvFlag'] = False
+
+    def write_javascript(self, writer, results, memory_variables=None, ay_ports=False):
+        # write the body of a function setting up the state that the routine leaves, with
+        # the given registers / flags as its results; if ay_ports is True, values sent to
+        # AY ports are stored in the host's AY state directly
+        runs = []
+        variable_addresses = []
+        for address, value in self.changes:
+            if memory_variables and memory_variables.is_variable(address):
+                variable_addresses.append(address)
+            elif runs and runs[-1][0] + len(runs[-1][1]) == address and len(runs[-1][1]) < 16:
+                runs[-1][1].append(value)
+            else:
+                runs.append((address, [value]))
+
+        for address, values in runs:
+            writer.write_line("mem.set([%s], 0x%04x);" % (
+                ', '.join("0x%02x" % value for value in values), address
+            ))
+        if memory_variables:
+            for line in memory_variables.get_assignments(self.mem, variable_addresses):
+                writer.write_line(line)
+        selected_register = None
+        for port, value in self.outs:
+            kind = get_port_kind(port) if ay_ports else None
+            if kind == SELECT_PORT:
+                selected_register = value
+            elif kind == DATA_PORT and selected_register is not None:
+                writer.write_code(write_register("0x%02x" % value, selected_register))
+            elif kind == DATA_PORT:
+                writer.write_code(write_register("0x%02x" % value))
+            else:
+                writer.write_line("out(0x%04x, 0x%02x);" % (port, value))
+        if selected_register is not None:
+            writer.write_line(select_register("0x%02x" % selected_register))
+
+        for name in TRACKED_VALUES:
+            if name in results and name in self.registers:
+                value = self.registers[name]
+                if name in FLAGS:
+                    writer.write_line("%s = %s;" % (name, 'true' if value else 'false'))
+                else:
+                    writer.write_line("r[%s] = 0x%02x;" % (name, value))
@@ -0,0 +1,187 @@
+# Linear-sweep pre-decode of a whole 64K memory image: the length of the instruction that
+# would be decoded at every address, whether it exits the routine or falls through to the
+# next, and its static jump / call target where it has one. The tracer follows the control
+# flow from these arrays (see Analyzer.trace_routine). Since they say nothing about which
+# addresses are actually reached as code, they can also be used to pick out likely entry
+# points of an unknown snapshot before running a full trace.
+#
+# NumPy is used if it is installed; otherwise the same results are computed with a plain
+# Python loop over the image.
+
+from array import array
+
+from decoder import (
+    FIELDS_MAIN, TARGET_NONE, TARGET_JUMP_WORD, TARGET_JUMP_OFFSET, TARGET_CALL_WORD,
+)
+from instruction_table import IS_ROUTINE_EXIT, FALLS_THROUGH
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def is_prefix(entry):
+    # whether an entry of a decoder table is a prefix, as (table, opcode position)
+    return entry is not None and len(entry) == 2
+
+
+def get_flags(entry):
+    # the bits of PreDecode.flags (as for InstructionTable.flags) for an entry of a decoder
+    # table
+    if entry is None or is_prefix(entry):
+        return 0
+    return (IS_ROUTINE_EXIT if entry[4] else 0) | (FALLS_THROUGH if entry[5] else 0)
+
+
+def get_fields(mem, addr):
+    # Look up the length, flags and target kind of the instruction at addr, following
+    # prefixes; the length is 0 if it cannot be decoded
+    entry = FIELDS_MAIN[mem[addr]]
+    while is_prefix(entry):
+        table, opcode_pos = entry
+        entry = table[mem[(addr + opcode_pos) & 0xffff]]
+    if entry is None:
+        return 0, 0, TARGET_NONE
+    return entry[1], get_flags(entry), entry[9]
+
+
+def predecode_python(mem):
+    lengths = bytearray(0x10000)
+    flags = bytearray(0x10000)
+    targets = array('i', [-1]) * 0x10000
+    target_kinds = bytearray(0x10000)
+
+    for addr in range(0x10000):
+        length, flags[addr], kind = get_fields(mem, addr)
+        lengths[addr] = length
+        if length and kind != TARGET_NONE:
+            target_kinds[addr] = kind
+            if kind == TARGET_JUMP_OFFSET:
+                offset = mem[(addr + length - 1) & 0xffff]
+                if offset >= 128:
+                    offset -= 256
+                targets[addr] = (addr + length + offset) & 0xffff
+            else:
+                targets[addr] = (
+                    mem[(addr + length - 2) & 0xffff] | (mem[(addr + length - 1) & 0xffff] << 8)
+                )
+
+    return lengths, flags, target_kinds, targets
+
+
+def predecode_numpy(mem):
+    image = numpy.frombuffer(bytes(mem), dtype=numpy.uint8)
+    addresses = numpy.arange(0x10000, dtype=numpy.int32)
+
+    def lookup(table, opcode_pos):
+        # lengths, flags and target kinds at every address, decoding from the given opcode
+        # table
+        opcodes = numpy.roll(image, -opcode_pos)
+        lengths = numpy.array([
+            0 if entry is None or is_prefix(entry) else entry[1] for entry in table
+        ], dtype=numpy.uint8)[opcodes]
+        flags = numpy.array([get_flags(entry) for entry in table], dtype=numpy.uint8)[opcodes]
+        kinds = numpy.array([
+            TARGET_NONE if entry is None or is_prefix(entry) else entry[9] for entry in table
+        ], dtype=numpy.uint8)[opcodes]
+        for prefix, entry in enumerate(table):
+            if is_prefix(entry):
+                is_prefixed = opcodes == prefix
+                child_lengths, child_flags, child_kinds = lookup(*entry)
+                lengths = numpy.where(is_prefixed, child_lengths, lengths)
+                flags = numpy.where(is_prefixed, child_flags, flags)
+                kinds = numpy.where(is_prefixed, child_kinds, kinds)
+        return lengths, flags, kinds
+
+    lengths, flags, target_kinds = lookup(FIELDS_MAIN, 0)
+    target_kinds = numpy.where(lengths > 0, target_kinds, TARGET_NONE).astype(numpy.uint8)
+
+    ends = addresses + lengths
+    last_bytes = image[(ends - 1) & 0xffff].astype(numpy.int32)
+    words = image[(ends - 2) & 0xffff].astype(numpy.int32) | (last_bytes << 8)
+    offsets = numpy.where(last_bytes >= 128, last_bytes - 256, last_bytes)
+
+    targets = numpy.full(0x10000, -1, dtype=numpy.int32)
+    targets = numpy.where(target_kinds == TARGET_JUMP_OFFSET, (ends + offsets) & 0xffff, targets)
+    targets = numpy.where(
+        (target_kinds == TARGET_JUMP_WORD) | (target_kinds == TARGET_CALL_WORD), words, targets
+    )
+
+    return lengths, flags, target_kinds, targets
+
+
+class PreDecode(object):
+    def __init__(self, mem):
+        if numpy is not None:
+            self.lengths, self.flags, self.target_kinds, self.targets = predecode_numpy(mem)
+        else:
+            self.lengths, self.flags, self.target_kinds, self.targets = predecode_python(mem)
+
+    def length(self, addr):
+        # length of the instruction at addr, or 0 if it cannot be decoded
+        return int(self.lengths[addr])
+
+    def is_routine_exit(self, addr):
+        return bool(self.flags[addr] & IS_ROUTINE_EXIT)
+
+    def return_address(self, addr):
+        return (addr + int(self.lengths[addr])) & 0xffff
+
+    def target(self, addr):
+        target = int(self.targets[addr])
+        return None if target == -1 else target
+
+    def is_call(self, addr):
+        return self.target_kinds[addr] == TARGET_CALL_WORD
+
+    def is_jump(self, addr):
+        kind = self.target_kinds[addr]
+        return kind == TARGET_JUMP_WORD or kind == TARGET_JUMP_OFFSET
+
+    def jump_target(self, addr):
+        return self.target(addr) if self.is_jump(addr) else None
+
+    def call_target(self, addr):
+        return self.target(addr) if self.is_call(addr) else None
+
+    def static_destination_addresses(self, addr):
+        # as InstructionTable.static_destination_addresses
+        destinations = []
+        target = self.target(addr)
+        if target is not None:
+            destinations.append(target)
+        if self.flags[addr] & FALLS_THROUGH:
+            destinations.append(self.return_address(addr))
+        return destinations
+
+    def decodable_addresses(self):
+        # every address at which an instruction could be decoded
+        if numpy is not None:
+            return set(numpy.flatnonzero(self.lengths).tolist())
+        lengths = self.lengths
+        return set(addr for addr in range(0x10000) if lengths[addr])
+
+    def candidate_entry_points(self, addresses=None):
+        # Targets of CALL instructions at decodable addresses (restricted to the given
+        # addresses if any), that are themselves decodable; ordered by the number of call
+        # sites, most first, then by address
+        if numpy is not None:
+            is_call = self.target_kinds == TARGET_CALL_WORD
+            if addresses is not None:
+                in_range = numpy.zeros(0x10000, dtype=bool)
+                in_range[list(addresses)] = True
+                is_call &= in_range
+            counts = numpy.bincount(self.targets[is_call], minlength=0x10000)
+            counts[self.lengths == 0] = 0
+            candidates = numpy.flatnonzero(counts)
+            order = numpy.lexsort((candidates, -counts[candidates]))
+            return candidates[order].tolist()
+
+        counts = {}
+        for addr in (range(0x10000) if addresses is None else addresses):
+            if self.target_kinds[addr] == TARGET_CALL_WORD:
+                target = self.targets[addr]
+                if self.lengths[target]:
+                    counts[target] = counts.get(target, 0) + 1
+        return sorted(counts, key=lambda target: (-counts[target], target))
@@ -0,0 +1,422 @@
+# Register promotion: rewrite the Javascript for each routine to keep the Z80 registers in
+# local variables (a, b, c, ... ixh, iyl) rather than in the shared register buffer r / rp,
+# which the engine has to treat as memory. Byte registers are wrapped with explicit
+# '& 0xff', and register pairs only exist as '(h << 8 | l)' where a pair is read.
+#
+# Locals are only exchanged with the buffer at routine boundaries:
+# - on entry, a routine loads the registers that it (or anything it calls) may read
+#   before writing them;
+# - before a call, it stores the registers that it has written and the callee may read;
+# - after a call, it reloads the registers that the callee may have stored;
+# - on exit, it stores the registers that it has written and are live at the return
+#   address (its results) - or all registers it has written, if it is an entry point.
+#
+# SP stays in the buffer, as the stack lives in memory anyway.
+
+import re
+
+from codegen import RewrittenCode
+from instructions import VALUE_MASKS, values_to_mask
+
+
+PROMOTED_REGISTERS = ['A', 'B', 'C', 'D', 'E', 'H', 'L', 'IXH', 'IXL', 'IYH', 'IYL']
+PROMOTED_PAIRS = {
+    'BC': ('B', 'C'),
+    'DE': ('D', 'E'),
+    'HL': ('H', 'L'),
+    'IX': ('IXH', 'IXL'),
+    'IY': ('IYH', 'IYL'),
+}
+LOCAL_NAMES = dict((reg, reg.lower()) for reg in PROMOTED_REGISTERS)
+BYTE_LOCALS = set(LOCAL_NAMES.values())
+
+PROMOTED_MASK = values_to_mask(PROMOTED_REGISTERS)
+
+# temporary for pair arithmetic
+TEMP = 't'
+
+
+# A write to a register at the start of a statement (possibly after a comment):
+# r[X] = E; r[X] += E; r[X]++; and the same for rp[XY]
+WRITE_PATTERN = re.compile(
+    r'(?:^|(?<=[;{]))(\s*(?:/\*.*?\*/\s*)*)(rp?)\[(\w+)\](?:(\+\+|--)|\s*([-+&|^]?=)(?!=)\s*([^;]*));'
+)
+READ_PATTERN = re.compile(r'\b(rp?)\[(\w+)\]')
+PAIR_EXPRESSION_PATTERN = re.compile(r'^\((\w+) << 8 \| (\w+)\)$')
+BYTE_LITERAL_PATTERN = re.compile(r'^0x[0-9a-f]{1,2}$')
+WORD_LITERAL_PATTERN = re.compile(r'^0x[0-9a-f]{1,4}$')
+IDENTIFIER_PATTERN = re.compile(r'^\w+$')
+
+CALL_PATTERN = re.compile(r'^(?:if \((!?\w+)\) )?r([0-9a-f]{4})\(\);$')
+RETURN_PATTERN = re.compile(r'^(?:if \((!?\w+)\) )?return;$')
+COMMENT_PATTERN = re.compile(r'/\*.*?\*/', re.S)
+
+
+def pair_expression(pair):
+    high, low = PROMOTED_PAIRS[pair]
+    return "(%s << 8 | %s)" % (LOCAL_NAMES[high], LOCAL_NAMES[low])
+
+
+def rewrite_reads(code):
+    def replace(match):
+        kind, name = match.groups()
+        if kind == 'r' and name in LOCAL_NAMES:
+            return LOCAL_NAMES[name]
+        elif kind == 'rp' and name in PROMOTED_PAIRS:
+            return pair_expression(name)
+        else:
+            return match.group(0)
+
+    return READ_PATTERN.sub(replace, code)
+
+
+def is_mem_read(expression):
+    # True if the expression is a single mem[...] lookup
+    if not (expression.startswith('mem[') and expression.endswith(']')):
+        return False
+    depth = 0
+    for i, char in enumerate(expression):
+        if char == '[':
+            depth += 1
+        elif char == ']':
+            depth -= 1
+            if depth == 0 and i != len(expression) - 1:
+                return False
+    return True
+
+
+def is_byte_valued(expression):
+    return bool(
+        BYTE_LITERAL_PATTERN.match(expression)
+        or expression in BYTE_LOCALS
+        or is_mem_read(expression)
+    )
+
+
+def byte_write(local, operator, expression):
+    if operator == '++':
+        return "%s = (%s + 1) & 0xff;" % (local, local)
+    elif operator == '--':
+        return "%s = (%s - 1) & 0xff;" % (local, local)
+    elif operator == '=':
+        if is_byte_valued(expression):
+            return "%s = %s;" % (local, expression)
+        return "%s = (%s) & 0xff;" % (local, expression)
+    elif operator == '&=' or (operator in ('|=', '^=') and is_byte_valued(expression)):
+        return "%s %s %s;" % (local, operator, expression)
+    else:
+        return "%s = (%s %s %s) & 0xff;" % (local, local, operator[0], expression)
+
+
+def pair_write(pair, operator, expression):
+    # return the code for the write, and whether it uses the temporary
+    high, low = [LOCAL_NAMES[reg] for reg in PROMOTED_PAIRS[pair]]
+
+    if operator == '=':
+        if WORD_LITERAL_PATTERN.match(expression):
+            value = int(expression, 16)
+            return "%s = 0x%02x; %s = 0x%02x;" % (high, value >> 8, low, value & 0xff), False
+        match = PAIR_EXPRESSION_PATTERN.match(expression)
+        if match:
+            return "%s = %s; %s = %s;" % (high, match.group(1), low, match.group(2)), False
+        if IDENTIFIER_PATTERN.match(expression):
+            return "%s = (%s >> 8) & 0xff; %s = %s & 0xff;" % (high, expression, low, expression), False
+        value = expression
+    elif operator == '++':
+        value = "%s + 1" % pair_expression(pair)
+    elif operator == '--':
+        value = "%s - 1" % pair_expression(pair)
+    else:
+        value = "%s %s %s" % (pair_expression(pair), operator[0], expression)
+
+    return "%s = %s; %s = (%s >> 8) & 0xff; %s = %s & 0xff;" % (
+        TEMP, value, high, TEMP, low, TEMP
+    ), True
+
+
+def rewrite_registers(code):
+    # Rewrite one instruction's code to use register locals. Returns the new code, and
+    # whether it uses the temporary
+    uses_temp = [False]
+
+    def replace_write(match):
+        prefix, kind, name, step, operator, expression = match.groups()
+        if step:
+            operator = step
+        if expression is not None:
+            expression = rewrite_reads(expression.strip())
+
+        if kind == 'r' and name in LOCAL_NAMES:
+            write = byte_write(LOCAL_NAMES[name], operator, expression)
+        elif kind == 'rp' and name in PROMOTED_PAIRS:
+            write, temp = pair_write(name, operator, expression)
+            uses_temp[0] = uses_temp[0] or temp
+        else:
+            # not promoted; any registers read on the right hand side are rewritten below
+            return match.group(0)
+
+        return prefix + write
+
+    code = WRITE_PATTERN.sub(replace_write, code)
+    return rewrite_reads(code), uses_temp[0]
+
+
+def mask_to_registers(mask):
+    return [reg for reg in PROMOTED_REGISTERS if mask & VALUE_MASKS[reg]]
+
+
+def store_code(mask):
+    return ' '.join("r[%s] = %s;" % (reg, LOCAL_NAMES[reg]) for reg in mask_to_registers(mask))
+
+
+def load_code(mask):
+    return ' '.join("%s = r[%s];" % (LOCAL_NAMES[reg], reg) for reg in mask_to_registers(mask))
+
+
+class RegisterPromoter(object):
+    # Register promotion for the routines of an analysis. entry_points are the addresses
+    # of routines that are called from outside the generated code, which leave all the
+    # registers they write in the buffer.
+
+    def __init__(self, analyzer, entry_points, inliner=None):
+        self.analyzer = analyzer
+        # an inline.Inliner whose inlined calls write the caller's locals directly, or None
+        self.inliner = inliner
+        routines = analyzer.routines
+        called = set()
+        for routine in routines.values():
+            called.update(routine.calls)
+        self.entry_points = set(entry_points) | (set(routines) - called)
+
+        # promoted registers that each routine may read before writing, that it reads and
+        # writes itself, and that it stores to the buffer on exit
+        self.reads = {}
+        self.own_uses = {}
+        self.own_writes = {}
+        self.stores = {}
+        # promoted registers that may differ in the buffer after a call to each routine, and
+        # those of them changed by the routines that it calls
+        self.changes = {}
+        self.call_changes = {}
+
+        for routine in analyzer.get_routines_in_dependency_order(sorted(routines)):
+            self.summarise(routine)
+
+    def summarise(self, routine):
+        instructions_by_address = self.analyzer.instructions_by_address
+        uses_masks = instructions_by_address.uses_masks
+        overwrites_masks = instructions_by_address.overwrites_masks
+        blocks = routine.cfg.reverse_postorder
+
+        # upward-exposed reads within each block, counting a call as reading everything
+        # the called routine may read (and, conservatively, as writing nothing). An
+        # inlined call writes this routine's own locals; any other call may change the
+        # buffer
+        block_uses = {}
+        block_overwrites = {}
+        own_uses = 0
+        own_writes = 0
+        changes = 0
+        for block in blocks:
+            uses = 0
+            overwrites = 0
+            for addr in block.addresses:
+                call_target = instructions_by_address.call_target(addr)
+                used = uses_masks[addr]
+                if call_target is not None:
+                    used |= self.reads[call_target]
+                    if self.inliner is not None and self.inliner.is_inlined_call(addr):
+                        own_writes |= self.own_writes[call_target]
+                    else:
+                        changes |= self.changes[call_target]
+                uses |= used & ~overwrites
+                overwrites |= overwrites_masks[addr]
+            block_uses[block] = uses & PROMOTED_MASK
+            block_overwrites[block] = overwrites
+            own_uses |= uses
+            own_writes |= overwrites
+
+        live_in = dict((block, block_uses[block]) for block in blocks)
+        changed = True
+        while changed:
+            changed = False
+            for block in reversed(blocks):
+                live_out = 0
+                for successor in block.successors:
+                    live_out |= live_in[successor]
+                new_live_in = block_uses[block] | (live_out & ~block_overwrites[block])
+                if new_live_in != live_in[block]:
+                    live_in[block] = new_live_in
+                    changed = True
+
+        start_addr = routine.start_addr
+        own_writes &= PROMOTED_MASK
+        self.reads[start_addr] = live_in[routine.cfg.entry_block]
+        self.own_uses[start_addr] = own_uses & PROMOTED_MASK
+        self.own_writes[start_addr] = own_writes
+        if start_addr in self.entry_points:
+            self.stores[start_addr] = own_writes
+        else:
+            self.stores[start_addr] = own_writes & values_to_mask(routine.results)
+
+        self.call_changes[start_addr] = changes
+        self.changes[start_addr] = changes | self.stores[start_addr]
+
+    def get_summary(self, addr, clone=None):
+        # the promoted registers that the routine at addr - or clone (a clones.Clone of it),
+        # if given - may read before writing, stores on exit, and may change
+        if clone is None:
+            return self.reads[addr], self.stores[addr], self.changes[addr]
+        stores = self.own_writes[addr] & values_to_mask(clone.results)
+        return (
+            self.reads[addr] & clone.live_in_by_address[addr], stores,
+            self.call_changes[addr] | stores
+        )
+
+    def promote(self, routine, liveness, code, clones=None):
+        return RoutinePromotion(self, routine, liveness, code, clones)
+
+
+class RoutinePromotion(RewrittenCode):
+    # The code for one routine's instructions, as given by code (a codegen.InstructionCode)
+    # and rewritten to use register locals, for the liveness given by liveness (a
+    # summary.RoutineLiveness). Calls to clones, as chosen by clones (a clones.Clones, if
+    # given), exchange only the registers that the clones read and change
+
+    def __init__(self, promoter, routine, liveness, code, clones=None):
+        self.promoter = promoter
+        self.routine = routine
+        self.liveness = liveness
+        super(RoutinePromotion, self).__init__(code)
+        start_addr = routine.start_addr
+        own_writes = promoter.own_writes[start_addr]
+        referenced = own_writes | promoter.own_uses[start_addr]
+        reads, self.stores, _ = promoter.get_summary(start_addr, liveness.clone)
+        self.return_code = self.rewrite_return(None)
+
+        self.code_by_address = {}
+        self.uses_temp = False
+        # registers stored before, and reloaded after, each call
+        self.spills_by_address = {}
+        self.reloads_by_address = {}
+        for block in routine.cfg.blocks:
+            for addr in block.addresses:
+                code, uses_temp = rewrite_registers(self.code.code_for_address(addr))
+                self.uses_temp = self.uses_temp or uses_temp
+                match = CALL_PATTERN.match(code)
+                if match:
+                    call_addr = int(match.group(2), 16)
+                    clone = clones.clones_by_call_site.get(addr) if clones is not None else None
+                    call_reads, _, call_changes = promoter.get_summary(call_addr, clone)
+                    spill = own_writes & call_reads
+                    reload = referenced & call_changes
+                    self.spills_by_address[addr] = spill
+                    self.reloads_by_address[addr] = reload
+                    code = self.rewrite_call(match.group(1), call_addr, spill, reload)
+                else:
+                    match = RETURN_PATTERN.match(code)
+                    if match:
+                        code = self.rewrite_return(match.group(1))
+                self.code_by_address[addr] = code
+
+        self.locals = set()
+        for code in list(self.code_by_address.values()) + [self.return_code]:
+            code = COMMENT_PATTERN.sub('', code)
+            self.locals.update(
+                reg for reg in PROMOTED_REGISTERS
+                if re.search(r'\b%s\b' % LOCAL_NAMES[reg], code)
+            )
+        self.loads = (
+            (reads | self.get_undefined_stores())
+            & values_to_mask(self.locals)
+        )
+
+    def get_undefined_stores(self):
+        # Find the registers that may be stored to the buffer (before a call or on exit)
+        # on a path where the routine has not yet assigned them; these must be loaded on
+        # entry so that the caller's value is stored back.
+        instructions_by_address = self.promoter.analyzer.instructions_by_address
+        cfg = self.routine.cfg
+
+        def transfer(block, defined, undefined_stores):
+            for addr in block.addresses:
+                if addr in self.spills_by_address:
+                    undefined_stores |= self.spills_by_address[addr] & ~defined
+                    defined |= self.reloads_by_address[addr]
+                defined |= self.liveness.get_used_results_mask(addr) & PROMOTED_MASK
+            if not block.successors or instructions_by_address.is_routine_exit(block.last_addr):
+                undefined_stores |= self.stores & ~defined
+            return defined, undefined_stores
+
+        # registers assigned on every path to the start of each block
+        defined_in = {cfg.entry_block: 0}
+        defined_out = {}
+        changed = True
+        while changed:
+            changed = False
+            for block in cfg.reverse_postorder:
+                if block is not cfg.entry_block:
+                    defined = PROMOTED_MASK
+                    for predecessor in cfg.predecessors[block]:
+                        if predecessor in defined_out:
+                            defined &= defined_out[predecessor]
+                    defined_in[block] = defined
+                out, _ = transfer(block, defined_in[block], 0)
+                if defined_out.get(block) != out:
+                    defined_out[block] = out
+                    changed = True
+
+        undefined_stores = 0
+        for block in cfg.reverse_postorder:
+            _, undefined_stores = transfer(block, defined_in[block], undefined_stores)
+        return undefined_stores
+
+    def rewrite_call(self, condition, call_addr, spill, reload):
+        call = "r%04x();" % call_addr
+        if not (spill or reload):
+            code = [call]
+        else:
+            code = [line for line in (store_code(spill), call, load_code(reload)) if line]
+
+        if condition is None:
+            return '\n'.join(code)
+        elif len(code) == 1:
+            return "if (%s) %s" % (condition, call)
+        else:
+            return "if (%s) {%s}" % (condition, ' '.join(code))
+
+    def rewrite_return(self, condition):
+        if condition is None:
+            if self.stores:
+                return "%s\nreturn;" % store_code(self.stores)
+            return "return;"
+        elif self.stores:
+            return "if (%s) {%s return;}" % (condition, store_code(self.stores))
+        else:
+            return "if (%s) return;" % condition
+
+    def code_for_address(self, addr):
+        return self.code_by_address[addr]
+
+    def condition_for_address(self, addr):
+        return rewrite_reads(self.code.condition_for_address(addr))
+
+    def code_before_branch(self, addr):
+        return rewrite_registers(self.code.code_before_branch(addr))[0]
+
+    def declarations(self):
+        # open the routine with a var statement for the locals, loading those that need
+        # the caller's values
+        names = []
+        for reg in PROMOTED_REGISTERS:
+            if reg in self.locals:
+                if self.loads & VALUE_MASKS[reg]:
+                    names.append("%s = r[%s]" % (LOCAL_NAMES[reg], reg))
+                else:
+                    names.append(LOCAL_NAMES[reg])
+        if self.uses_temp:
+            names.append(TEMP)
+        declarations = self.code.declarations()
+        if names:
+            declarations.append("var %s;" % ', '.join(names))
+        return declarations
@@ -0,0 +1,55 @@
+/* Run a compiled STC player (as written by regression.py) on a tune, printing the AY
+registers after each frame as z80ref/run.js does.
+
+usage: node regression.js player.js tune.stc [frames] */
+
+var fs = require('fs');
+
+var registerBuffer = new ArrayBuffer(26);
+/* Expose registerBuffer as both register pairs and individual registers (little-endian) */
+var rp = new Uint16Array(registerBuffer);
+var r = new Uint8Array(registerBuffer);
+
+var BC = 1, DE = 2, HL = 3, IX = 4, IY = 5, SP = 6;
+var A = 1, B = 3, C = 2, D = 5, E = 4, H = 7, L = 6, IXH = 9, IXL = 8, IYH = 11, IYL = 10;
+var cFlag = false, zFlag = false, sFlag = false, pvFlag = false;
+
+var mem = new Uint8Array(0x10000);
+
+var ayRegisters = [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, false];
+var selectedAYRegister = 0;
+function out(port, val) {
+	if ((port & 0xc002) == 0xc000) {
+		/* AY register select */
+		selectedAYRegister = val;
+	} else if ((port & 0xc002) == 0x8000) {
+		/* AY register write */
+		ayRegisters[selectedAYRegister] = val;
+		if (selectedAYRegister == 13) ayRegisters[14] = true;
+	}
+}
+
+var player = fs.readFileSync(__dirname + '/stc_player.bin');
+var stc = fs.readFileSync(process.argv[3]);
+var frames = parseInt(process.argv[4] || '100000');
+
+/* load the STC player at 0x4000 and the STC data straight after it, at 0x443c */
+for (var i = 0; i < player.length; i++) {
+	mem[0x4000 + i] = player[i];
+}
+for (i = 0; i < stc.length; i++) {
+	mem[0x443c + i] = stc[i];
+}
+
+eval(fs.readFileSync(process.argv[2], 'utf8'));
+
+/* init player */
+rp[SP] = 0x3f00;
+r4000();
+
+for (var frame = 0; frame < frames; frame++) {
+	ayRegisters[14] = false;
+	rp[SP] = 0x3f00;
+	r4006();
+	console.log(ayRegisters.slice());
+}
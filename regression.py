@@ -0,0 +1,41 @@
+# Compile the STC player for one tune, for regression.sh:
+#
+#   python regression.py testfiles/shatners_bassoon.stc [option=value ...]
+#
+# Options are Analyzer keyword arguments (such as ay_ports=1 or inline_threshold=0), along
+# with precompute=1 to run the init routine at compile time and read_only=1 to take the
+# tune as never written. The Javascript for the init (0x4000) and play (0x4006) routines is
+# written to stdout.
+
+import sys
+
+from analyzer import Analyzer
+
+
+INTEGER_OPTIONS = set(['inline_threshold', 'clone_budget'])
+
+
+def parse_options(args):
+    options = {}
+    for arg in args:
+        name, value = arg.split('=', 1)
+        options[name] = int(value) if name in INTEGER_OPTIONS else bool(int(value))
+    return options
+
+
+if __name__ == '__main__':
+    options = parse_options(sys.argv[2:])
+    precompute = options.pop('precompute', False)
+    read_only = options.pop('read_only', False)
+
+    analyzer = Analyzer(**options)
+    song_addr = analyzer.load('stc_player.bin', 0x4000)
+    song_end = analyzer.load(sys.argv[1], song_addr)
+    if read_only:
+        analyzer.mark_read_only(song_addr, song_end)
+
+    analyzer.analyse([0x4000, 0x4006])
+    if precompute:
+        analyzer.precompute(0x4000, 0x3f00)
+
+    sys.stdout.write(analyzer.emit([0x4000, 0x4006]))
@@ -0,0 +1,53 @@
+#!/bin/sh
+# Compile the STC player for every tune in testfiles under each set of options below, and
+# compare the AY registers it gives on each frame with those from z80ref.
+#
+#   ./regression.sh [frames]
+#
+# The unit tests of the analysis passes are run separately:
+#
+#   python -m unittest discover tests
+
+FRAMES=${1:-3000}
+
+OPTIONS="
+precompute=0
+precompute=1
+precompute=1 read_only=1
+precompute=1 read_only=1 ay_ports=1
+precompute=1 read_only=1 memory_variables=1
+precompute=1 read_only=1 clone_budget=1000
+structure_control_flow=0
+promote_registers=0 promote_stack=0
+lazy_flags=0 fold_constants=0 inline_threshold=0
+ay_ports=1 clone_budget=1000
+optimise_loops=0
+"
+
+mkdir -p output
+failures=0
+for f in testfiles/*.stc
+do
+	name=$(basename $f .stc)
+	node z80ref/run.js $f $FRAMES > output/$name.ref.log
+	echo "$OPTIONS" | (
+	status=0
+	while read options
+	do
+		[ -z "$options" ] && continue
+		rm -f output/$name.js output/$name.log
+		if python regression.py $f $options > output/$name.js \
+			&& node regression.js output/$name.js $f $FRAMES > output/$name.log \
+			&& cmp -s output/$name.ref.log output/$name.log
+		then
+			echo "ok     $name: $options"
+		else
+			echo "FAILED $name: $options"
+			status=1
+		fi
+	done
+	exit $status
+	) || failures=$((failures + 1))
+done
+
+[ $failures -eq 0 ]
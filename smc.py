@@ -0,0 +1,119 @@
+# Self-modifying code: instructions whose operands are written by the code itself, as with
+# the STC player's init storing the address of the tune into the operand of a later
+# LD BC,nn. Decoding takes an operand's value from the initial memory image, which is out
+# of date as soon as it is written to; the operands of these instructions are read from
+# mem instead when the instruction runs:
+#
+#   rp[BC] = 0xee43;  ->  rp[BC] = (mem[0x40bc] << 8 | mem[0x40bb]);
+#
+# Stores are found with a PointerAnalysis, and the instruction table is told which operands
+# they modify, so that every Instruction it decodes from then on has code to match. Only
+# immediate operands (n, nn, and the n of LD (IX+d),n) can be handled like this; an
+# instruction with any other part modified - its opcode, an index offset or a jump / call
+# target - is still decoded from the memory image, and reported.
+
+import re
+
+from instructions import (
+    ExtendedInstructionWithByteParam, ExtendedInstructionWithOffsetAndByteParams,
+    ExtendedInstructionWithWordParam, InstructionWithByteParam, InstructionWithWordParam,
+    get_instruction,
+)
+from pointers import ANY
+
+
+# values to decode a modified operand as, to find where it appears in the instruction's
+# code; one that also appears in the code for the original operand is passed over
+SENTINELS = {
+    1: [0xa5, 0x5a, 0xc3, 0x3c],
+    2: [0xa55a, 0x5aa5, 0xc33c, 0x3cc3],
+}
+
+
+def get_operand(instructions_by_address, addr):
+    # the address and size in bytes of the immediate operand of the instruction at addr,
+    # or None if it has none
+    cls = instructions_by_address.get_class(addr)
+    if instructions_by_address.jump_target(addr) is not None:
+        return None
+    if instructions_by_address.call_target(addr) is not None:
+        return None
+    if issubclass(cls, InstructionWithByteParam):
+        return ((addr + 1) & 0xffff, 1)
+    elif issubclass(cls, ExtendedInstructionWithByteParam):
+        return ((addr + 2) & 0xffff, 1)
+    elif issubclass(cls, ExtendedInstructionWithOffsetAndByteParams):
+        return ((addr + 3) & 0xffff, 1)
+    elif issubclass(cls, InstructionWithWordParam):
+        return ((addr + 1) & 0xffff, 2)
+    elif issubclass(cls, ExtendedInstructionWithWordParam):
+        return ((addr + 2) & 0xffff, 2)
+    return None
+
+
+def find_modified_instructions(analyzer, entry_points):
+    # Find the instructions modified by the code called from outside at entry_points.
+    # Return a dict of instruction address -> (address of operand, size of operand) for
+    # those with only their operand modified, and a list of the addresses of the others.
+    instructions_by_address = analyzer.instructions_by_address
+
+    pointers = analyzer.get_pointer_analysis(entry_points)
+    written = pointers.get_accessed_addresses(instructions_by_address, writes_only=True)
+    if written is ANY:
+        # something may write anywhere; there is no telling what it modifies
+        analyzer.log("Warning: stores through unknown pointers; self-modifying code may be missed")
+        return {}, []
+    data_writes = pointers.get_data_accesses(instructions_by_address, writes_only=True)
+    if data_writes:
+        analyzer.log(
+            "Warning: %d instructions store through pointers read from memory, taken not to "
+            "modify code (first: %s)"
+            % (len(data_writes), instructions_by_address[data_writes[0]])
+        )
+
+    operands_by_address = {}
+    unhandled = []
+    for addr in instructions_by_address:
+        length = instructions_by_address.lengths[addr]
+        modified = set((addr + i) & 0xffff for i in range(length)) & written
+        if not modified:
+            continue
+        operand = get_operand(instructions_by_address, addr)
+        if operand is None or not modified <= set(
+            (operand[0] + i) & 0xffff for i in range(operand[1])
+        ):
+            unhandled.append(addr)
+        else:
+            operands_by_address[addr] = operand
+    return operands_by_address, unhandled
+
+
+def modified_operand_to_javascript(instruction, mem, operand):
+    # the code for instruction (decoded from mem), reading its operand - of the given
+    # (address, size) - from mem when it runs
+    code = type(instruction).to_javascript(instruction)
+
+    operand_addr, size = operand
+    if size == 1:
+        expression = "mem[0x%04x]" % operand_addr
+    else:
+        expression = "(mem[0x%04x] << 8 | mem[0x%04x])" % (
+            (operand_addr + 1) & 0xffff, operand_addr
+        )
+
+    for sentinel in SENTINELS[size]:
+        pattern = re.compile(r'\b0x0*%x\b' % sentinel)
+        if pattern.search(code):
+            continue
+        sentinel_mem = bytearray(mem)
+        for i in range(size):
+            sentinel_mem[(operand_addr + i) & 0xffff] = (sentinel >> (8 * i)) & 0xff
+        sentinel_instruction = get_instruction(sentinel_mem, instruction.addr)
+        sentinel_instruction.used_results = instruction.used_results
+        sentinel_code = sentinel_instruction.to_javascript()
+        if pattern.search(sentinel_code):
+            return pattern.sub(expression, sentinel_code)
+
+    raise NotImplementedError(
+        "Cannot find the modified operand in the code for %s" % instruction
+    )
@@ -0,0 +1,127 @@
+# Stack promotion: a PUSH, and the POP that takes back the value it pushed, keep that value
+# in a Javascript local rather than in mem, and leave SP alone:
+#
+#   rp[SP]--; mem[rp[SP]] = r[D]; rp[SP]--; mem[rp[SP]] = r[E];  ->  s0 = rp[DE];
+#   r[L] = mem[rp[SP]]; rp[SP]++; r[H] = mem[rp[SP]]; rp[SP]++;  ->  rp[HL] = s0;
+#
+# A forward pass over the routine's control flow graph finds the depth of the stack (in
+# words pushed since the routine was entered) before each instruction. If that depth is
+# the same on every path to an instruction, never drops below zero, and is zero at every
+# exit, the stack is balanced: a POP at depth n + 1 always takes back the value of the
+# last PUSH at depth n, which is kept in the local sn.
+#
+# A routine's stack stays in mem if it is not balanced, if anything in it uses SP other
+# than to push and pop (such as EX (SP),HL or LD SP,HL), or if it calls a routine whose
+# stack is not balanced - as that routine could reach into the caller's part of the stack.
+
+from codegen import RewrittenCode
+
+
+# instruction class name -> the change that it makes to the stack depth
+STACK_EFFECTS = {
+    'PUSH_RR': 1,
+    'POP_RR': -1,
+    'POP_IXIY': -1,
+}
+# instructions that use SP other than to push and pop (as do those with SP as their
+# register pair, such as LD SP,nn and ADD HL,SP)
+STACK_POINTER_INSTRUCTIONS = set(['EX_iSPi_HL', 'LD_SP_HL', 'LD_SP_IXIY'])
+
+# the deepest stack to keep in locals
+MAX_DEPTH = 16
+STACK_LOCALS = ['s%d' % depth for depth in range(MAX_DEPTH)]
+
+
+def uses_stack_pointer(instruction):
+    return (
+        type(instruction).__name__ in STACK_POINTER_INSTRUCTIONS
+        or getattr(instruction, 'reg_pair', None) == 'SP'
+    )
+
+
+def uses_stack(cls):
+    # whether instructions of class cls read or write the stack, other than as a call or
+    # return
+    return cls.__name__ in STACK_EFFECTS or cls.__name__ == 'EX_iSPi_HL'
+
+
+class StackAnalysis(object):
+    # The stack depth before each instruction of a routine, as called from analyzer
+
+    def __init__(self, analyzer, routine):
+        # address -> depth before the instruction there
+        self.depth_by_address = {}
+        # the greatest depth reached
+        self.depth = 0
+        # why the routine's stack is not balanced, or None if it is
+        self.problem = self.find_depths(analyzer, routine)
+
+    @property
+    def is_balanced(self):
+        return self.problem is None
+
+    def find_depths(self, analyzer, routine):
+        # Fill in depth_by_address; return the first problem found, if any
+        instructions_by_address = analyzer.instructions_by_address
+        cfg = routine.cfg
+
+        # every block but the entry block follows one of its predecessors in reverse
+        # postorder, so has a depth by the time it is reached
+        depth_by_block = {cfg.entry_block: 0}
+        for block in cfg.reverse_postorder:
+            depth = depth_by_block[block]
+            for addr in block.addresses:
+                instruction = instructions_by_address[addr]
+                self.depth_by_address[addr] = depth
+
+                if uses_stack_pointer(instruction):
+                    return "%s uses SP" % instruction
+                call_target = instructions_by_address.call_target(addr)
+                if (
+                    call_target is not None
+                    and not analyzer.get_stack_analysis(call_target).is_balanced
+                ):
+                    return "%s calls a routine whose stack is not balanced" % instruction
+
+                depth += STACK_EFFECTS.get(type(instruction).__name__, 0)
+                if depth < 0:
+                    return "%s pops more than the routine pushes" % instruction
+                elif depth > MAX_DEPTH:
+                    return "%s pushes more than %d words" % (instruction, MAX_DEPTH)
+                elif depth and instructions_by_address.is_routine_exit(addr):
+                    return "%s leaves %d words on the stack" % (instruction, depth)
+                self.depth = max(self.depth, depth)
+
+            for successor in block.successors:
+                if depth_by_block.setdefault(successor, depth) != depth:
+                    return "the stack depth at 0x%04x differs between paths" % successor.start_addr
+
+        return None
+
+
+class LocalStackCode(RewrittenCode):
+    # The code for one routine's instructions, as given by code (a codegen.InstructionCode
+    # or another pass), with pushes and pops made to and from locals as found by stack (a
+    # balanced StackAnalysis of the routine)
+
+    def __init__(self, analyzer, stack, code):
+        self.instructions_by_address = analyzer.instructions_by_address
+        self.stack = stack
+        super(LocalStackCode, self).__init__(code)
+
+    def code_for_address(self, addr):
+        instruction = self.instructions_by_address[addr]
+        effect = STACK_EFFECTS.get(type(instruction).__name__)
+        if effect is None:
+            return self.code.code_for_address(addr)
+        # a PUSH fills the word at the depth before it, and a POP empties the one below
+        depth = self.stack.depth_by_address[addr]
+        return instruction.stack_local_to_javascript(
+            STACK_LOCALS[depth if effect > 0 else depth - 1]
+        )
+
+    def declarations(self):
+        declarations = self.code.declarations()
+        if self.stack.depth:
+            declarations.append("var %s;" % ', '.join(STACK_LOCALS[:self.stack.depth]))
+        return declarations
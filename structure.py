@@ -0,0 +1,399 @@
+# Recover structured control flow for a routine - nested if / while / labeled blocks with
+# break and continue - from its control flow graph, so that it can be emitted without a
+# pc dispatch loop. This follows Ramsey, "Beyond Relooper: recursive translation of
+# unstructured control flow to structured control flow" (ICFP 2022):
+#
+# - a loop header (a block that is the target of a back edge) becomes a labeled
+#   while (true) loop, with back edges to it becoming 'continue' - or, where the only way
+#   round is from the foot of the loop, as with a DJNZ, a do / while loop testing the
+#   condition there;
+# - a merge node (a block with more than one forward predecessor) is placed after a labeled
+#   block nested within its immediate dominator, with forward edges to it becoming 'break';
+# - any other block has a single forward predecessor, which dominates it, and its code is
+#   placed inline at the point where that predecessor branches to it.
+#
+# This only works for reducible control flow; routines with a loop that can be entered
+# other than through its header raise IrreducibleControlFlow, and are left to the pc
+# dispatcher.
+
+from collections import defaultdict
+
+from codegen import InstructionCode
+
+
+class IrreducibleControlFlow(Exception):
+    pass
+
+
+# Statements making up the structured routine, as tuples:
+#   ('code', javascript)
+#   ('if', condition, then_statements, else_statements)
+#   ('loop', label, statements)
+#   ('do', label, statements, condition) - a loop that runs its statements, then goes
+#       round again if condition holds
+#   ('for', label, statements, counter) - a loop that runs its statements as many times
+#       as the register counter holds, or 256 times for zero (see loops.py)
+#   ('block', label, statements)
+#   ('break', label)
+#   ('continue', label)
+
+
+def continues(statements, label):
+    # True if any of these statements (at any depth) goes round the loop with this label
+    for statement in statements:
+        kind = statement[0]
+        if kind == 'continue' and statement[1] == label:
+            return True
+        elif kind == 'if' and (continues(statement[2], label) or continues(statement[3], label)):
+            return True
+        elif kind in ('loop', 'block', 'do', 'for') and continues(statement[2], label):
+            return True
+    return False
+
+
+def make_do_loop(label, statements):
+    # A loop whose body ends by testing whether to leave it - as a DJNZ or a DEC / JR NZ
+    # at its foot does - as a do / while loop followed by the code that leaves it;
+    # otherwise (or if anything else goes round the loop, which would then test the
+    # condition) as it is. One that never goes round at all - neither going back to the
+    # top nor running off the end of its statements, as when its jump back is never
+    # taken - is just its statements
+    if not continues(statements, label) and ends_with_transfer(statements):
+        return statements
+    if statements and statements[-1][0] == 'if' and not statements[-1][3]:
+        _, condition, exit_statements, _ = statements[-1]
+        body = statements[:-1]
+        if (
+            body and ends_with_transfer(exit_statements)
+            and not continues(body, label) and not continues(exit_statements, label)
+        ):
+            return [('do', label, body, negate(condition))] + exit_statements
+    return [('loop', label, statements)]
+
+
+def ends_with_transfer(statements):
+    # return True if control never runs off the end of these statements
+    if not statements:
+        return False
+    last = statements[-1]
+    if last[0] in ('break', 'continue', 'loop'):
+        # a while (true) loop is only ever left by a labeled break or continue
+        return True
+    if last[0] == 'code':
+        return last[1] == 'return;' or last[1].endswith('\nreturn;')
+    if last[0] == 'if':
+        return ends_with_transfer(last[2]) and ends_with_transfer(last[3])
+    return False
+
+
+COMPARISON_INVERSES = {
+    '===': '!==', '!==': '===', '==': '!=', '!=': '==',
+    '<': '>=', '>=': '<', '>': '<=', '<=': '>',
+}
+# longest first, so that e.g. '===' is not taken for '=='; shifts are skipped over
+OPERATORS = ['>>>', '===', '!==', '==', '!=', '<<', '>>', '<=', '>=', '<', '>']
+
+
+def is_parenthesised(expression):
+    # True if the whole expression is enclosed in one pair of parentheses
+    if not (expression.startswith('(') and expression.endswith(')')):
+        return False
+    depth = 0
+    for i, char in enumerate(expression):
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+            if depth == 0:
+                return i == len(expression) - 1
+    return False
+
+
+def strip_parentheses(expression):
+    while is_parenthesised(expression):
+        expression = expression[1:-1]
+    return expression
+
+
+def negate_comparison(expression):
+    # If the expression is a single comparison, return it with the opposite comparison
+    # operator; otherwise return None
+    depth = 0
+    found = None
+    i = 0
+    while i < len(expression):
+        char = expression[i]
+        if char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        elif depth == 0:
+            if char in '&|^?,':
+                # binds more loosely than a comparison
+                return None
+            for operator in OPERATORS:
+                if expression.startswith(operator, i):
+                    if operator in COMPARISON_INVERSES:
+                        if found is not None:
+                            return None
+                        found = (i, operator)
+                    i += len(operator)
+                    break
+            else:
+                i += 1
+            continue
+        i += 1
+
+    if found is None:
+        return None
+    i, operator = found
+    return expression[:i] + COMPARISON_INVERSES[operator] + expression[i + len(operator):]
+
+
+def negate(condition):
+    if condition.startswith('!') and condition[1:].isidentifier():
+        return condition[1:]
+    elif condition.isidentifier():
+        return '!' + condition
+    elif condition.startswith('!') and is_parenthesised(condition[1:]):
+        return strip_parentheses(condition[1:])
+
+    condition = strip_parentheses(condition)
+    comparison = negate_comparison(condition)
+    if comparison is not None:
+        return comparison
+    else:
+        return "!(%s)" % condition
+
+
+class RoutineStructurer(object):
+    # code is the codegen.InstructionCode (or a pass wrapping one) to take each
+    # instruction's Javascript from
+    def __init__(self, cfg, instructions_by_address, code=None):
+        self.cfg = cfg
+        self.instructions_by_address = instructions_by_address
+        if code is None:
+            code = InstructionCode(instructions_by_address)
+        self.code = code
+        self.rpo_index = cfg.rpo_index
+
+        self.loop_headers = set()
+        self.merge_nodes = set()
+        for block in cfg.reverse_postorder:
+            forward_predecessors = set()
+            for predecessor in set(cfg.predecessors[block]):
+                if self.rpo_index[predecessor] >= self.rpo_index[block]:
+                    if not cfg.dominates(block, predecessor):
+                        raise IrreducibleControlFlow(
+                            "Loop at 0x%04x has more than one entry" % block.start_addr
+                        )
+                    self.loop_headers.add(block)
+                else:
+                    forward_predecessors.add(predecessor)
+
+            if len(forward_predecessors) > 1:
+                self.merge_nodes.add(block)
+
+        # merge nodes immediately dominated by each block, latest in reverse postorder first
+        self.merge_children = defaultdict(list)
+        for block in cfg.reverse_postorder:
+            dominator = cfg.immediate_dominators[block]
+            if dominator is not block and block in self.merge_nodes:
+                self.merge_children[dominator].append(block)
+        for children in self.merge_children.values():
+            children.sort(key=lambda block: self.rpo_index[block], reverse=True)
+
+    def structure(self):
+        return self.code_for_node(self.cfg.entry_block, None)
+
+    # In the following, 'follows' is the block that control reaches by running off the end
+    # of the statements being generated, or None if that would leave the routine
+
+    def code_for_node(self, block, follows):
+        if block in self.loop_headers:
+            label = "l%04x" % block.start_addr
+            return make_do_loop(
+                label, self.node_within(block, self.merge_children[block], block)
+            )
+        else:
+            return self.node_within(block, self.merge_children[block], follows)
+
+    def node_within(self, block, merge_children, follows):
+        if not merge_children:
+            return self.block_code(block, follows)
+
+        # the latest merge node goes after a block containing everything before it
+        merge_node = merge_children[0]
+        return [(
+            'block', "b%04x" % merge_node.start_addr,
+            self.node_within(block, merge_children[1:], merge_node)
+        )] + self.code_for_node(merge_node, follows)
+
+    def branch(self, source, target, follows):
+        if target is follows:
+            return []
+        elif self.rpo_index[target] <= self.rpo_index[source]:
+            return [('continue', "l%04x" % target.start_addr)]
+        elif target in self.merge_nodes:
+            return [('break', "b%04x" % target.start_addr)]
+        else:
+            return self.code_for_node(target, follows)
+
+    def block_code(self, block, follows):
+        instructions_by_address = self.instructions_by_address
+        code = self.code
+        statements = []
+        for addr in block.addresses[:-1]:
+            instruction_code = code.code_for_address(addr)
+            if instruction_code:
+                statements.append(('code', instruction_code))
+
+        addr = block.last_addr
+        successors_by_address = dict(
+            (successor.start_addr, successor) for successor in block.successors
+        )
+        jump_target = instructions_by_address.jump_target(addr)
+
+        if jump_target is None:
+            instruction_code = code.code_for_address(addr)
+            if instruction_code:
+                statements.append(('code', instruction_code))
+            if len(successors_by_address) > 1:
+                raise Exception("Unexpected branch at 0x%04x" % addr)
+            elif successors_by_address:
+                statements += self.branch(block, block.successors[0], follows)
+            elif not instructions_by_address.is_routine_exit(addr):
+                # calls a routine that never returns
+                statements.append(('code', code.return_code))
+            return statements
+
+        code_before_branch = code.code_before_branch(addr)
+        if code_before_branch:
+            statements.append(('code', code_before_branch))
+
+        target = successors_by_address[jump_target]
+        next_addr = instructions_by_address.next_address(addr)
+        if next_addr not in instructions_by_address.static_destination_addresses(addr):
+            # unconditional jump
+            statements += self.branch(block, target, follows)
+            return statements
+
+        fallthrough = successors_by_address[next_addr]
+        if target is fallthrough:
+            statements += self.branch(block, target, follows)
+            return statements
+
+        condition = code.condition_for_address(addr)
+        if condition in ('true', 'false'):
+            # always or never taken
+            statements += self.branch(
+                block, target if condition == 'true' else fallthrough, follows
+            )
+            return statements
+        then_statements = self.branch(block, target, follows)
+        else_statements = self.branch(block, fallthrough, follows)
+        if not then_statements and not else_statements:
+            return statements
+        elif not then_statements:
+            condition = negate(condition)
+            then_statements, else_statements = else_statements, []
+        elif ends_with_transfer(else_statements) and not ends_with_transfer(then_statements):
+            condition = negate(condition)
+            then_statements, else_statements = else_statements, then_statements
+
+        if ends_with_transfer(then_statements):
+            # no need for an else clause
+            statements.append(('if', condition, then_statements, []))
+            statements += else_statements
+        else:
+            statements.append(('if', condition, then_statements, else_statements))
+
+        return statements
+
+
+def get_used_labels(statements, innermost_loop=None, labels=None):
+    # find the labels that need to be written out; a continue to the innermost loop can be
+    # written without one
+    if labels is None:
+        labels = set()
+    for statement in statements:
+        kind = statement[0]
+        if kind == 'break' or (kind == 'continue' and statement[1] != innermost_loop):
+            labels.add(statement[1])
+        elif kind == 'if':
+            get_used_labels(statement[2], innermost_loop, labels)
+            get_used_labels(statement[3], innermost_loop, labels)
+        elif kind in ('loop', 'do', 'for'):
+            get_used_labels(statement[2], statement[1], labels)
+        elif kind == 'block':
+            get_used_labels(statement[2], innermost_loop, labels)
+    return labels
+
+
+def write_statements(writer, statements, used_labels, innermost_loop=None):
+    for statement in statements:
+        kind = statement[0]
+        if kind == 'code':
+            writer.write_code(statement[1])
+        elif kind == 'if':
+            writer.write_line("if (%s) {" % statement[1])
+            writer.indent()
+            write_statements(writer, statement[2], used_labels, innermost_loop)
+            writer.dedent()
+            if statement[3]:
+                writer.write_line("} else {")
+                writer.indent()
+                write_statements(writer, statement[3], used_labels, innermost_loop)
+                writer.dedent()
+            writer.write_line("}")
+        elif kind == 'loop':
+            label = statement[1]
+            if label in used_labels:
+                writer.write_line("%s: while (true) {" % label)
+            else:
+                writer.write_line("while (true) {")
+            writer.indent()
+            write_statements(writer, statement[2], used_labels, label)
+            writer.dedent()
+            writer.write_line("}")
+        elif kind == 'do':
+            label = statement[1]
+            if label in used_labels:
+                writer.write_line("%s: do {" % label)
+            else:
+                writer.write_line("do {")
+            writer.indent()
+            write_statements(writer, statement[2], used_labels, label)
+            writer.dedent()
+            writer.write_line("} while (%s);" % statement[3])
+        elif kind == 'for':
+            label = statement[1]
+            counter = "n%s" % label[1:]
+            loop = "for (var %s = %s || 0x100; %s > 0; %s--) {" % (
+                counter, statement[3], counter, counter
+            )
+            if label in used_labels:
+                writer.write_line("%s: %s" % (label, loop))
+            else:
+                writer.write_line(loop)
+            writer.indent()
+            write_statements(writer, statement[2], used_labels, label)
+            writer.dedent()
+            writer.write_line("}")
+        elif kind == 'block':
+            label = statement[1]
+            if label in used_labels:
+                writer.write_line("%s: {" % label)
+                writer.indent()
+                write_statements(writer, statement[2], used_labels, innermost_loop)
+                writer.dedent()
+                writer.write_line("}")
+            else:
+                write_statements(writer, statement[2], used_labels, innermost_loop)
+        elif kind == 'break':
+            writer.write_line("break %s;" % statement[1])
+        elif kind == 'continue':
+            if statement[1] == innermost_loop:
+                writer.write_line("continue;")
+            else:
+                writer.write_line("continue %s;" % statement[1])
@@ -0,0 +1,151 @@
+# Routine summaries: for each routine of an analysis, the values (as bitmasks of
+# TRACKED_VALUES) that it - or anything it calls - may read before writing them, and
+# those that it writes on every path from its entry to its exits. These let the liveness
+# of one routine be worked out on its own, in a given context, without following its
+# calls into the routines they call:
+#
+# - a call reads what the called routine may read, and (if it is unconditional) writes
+#   what the called routine always writes;
+# - the values live after the routine's exits are whatever the context says.
+#
+# This is what a routine needs from its caller, as opposed to Routine.uses (found by
+# following static destinations only, so losing track of the code after each call).
+
+from instructions import TRACKED_VALUES
+
+
+ALL_VALUES = (1 << len(TRACKED_VALUES)) - 1
+
+
+class RoutineSummaries(object):
+    # The summaries of all the routines of an (analysed) analyzer
+
+    def __init__(self, analyzer):
+        self.analyzer = analyzer
+        # routine address -> values that it may read before writing, that it writes on
+        # every path to its exits, and that it may write
+        self.reads = {}
+        self.must_writes = {}
+        self.writes = {}
+
+        # a (recursive) call to a routine not yet summarised may read and write anything
+        for routine in analyzer.get_routines_in_dependency_order(sorted(analyzer.routines)):
+            start_addr = routine.start_addr
+            live_in, _ = self.find_liveness(routine, 0)
+            self.reads[start_addr] = live_in[start_addr]
+            self.must_writes[start_addr] = self.find_must_writes(routine)
+            writes = 0
+            for addr in routine.addresses:
+                writes |= analyzer.instructions_by_address.overwrites_masks[addr]
+            for call_addr in routine.calls:
+                writes |= self.writes.get(call_addr, ALL_VALUES)
+            self.writes[start_addr] = writes
+
+    def is_unconditional_call(self, addr):
+        instructions_by_address = self.analyzer.instructions_by_address
+        return (
+            instructions_by_address.next_address(addr)
+            not in instructions_by_address.static_destination_addresses(addr)
+        )
+
+    def find_must_writes(self, routine):
+        # forward pass over the routine: the values written on every path to each block
+        instructions_by_address = self.analyzer.instructions_by_address
+        overwrites_masks = instructions_by_address.overwrites_masks
+        cfg = routine.cfg
+
+        written_out = {}
+        at_exits = ALL_VALUES
+        changed = True
+        while changed:
+            changed = False
+            at_exits = ALL_VALUES
+            for block in cfg.reverse_postorder:
+                if block is cfg.entry_block:
+                    written = 0
+                else:
+                    written = ALL_VALUES
+                    for predecessor in cfg.predecessors[block]:
+                        written &= written_out.get(predecessor, ALL_VALUES)
+                for addr in block.addresses:
+                    written |= overwrites_masks[addr]
+                    call_target = instructions_by_address.call_target(addr)
+                    if call_target is not None and self.is_unconditional_call(addr):
+                        written |= self.must_writes.get(call_target, 0)
+                    if instructions_by_address.is_routine_exit(addr):
+                        at_exits &= written
+                if written_out.get(block) != written:
+                    written_out[block] = written
+                    changed = True
+
+        # a routine that never returns writes nothing that anything after it could see
+        return 0 if at_exits == ALL_VALUES and not routine.exit_points else at_exits
+
+    def find_liveness(self, routine, exit_live, limit=None):
+        # Backward liveness over the routine's own control flow graph, with exit_live live
+        # after each exit, and calls taken as summarised. If limit is given, the values
+        # live after each instruction are narrowed to limit(addr). Return dicts of
+        # address -> values live before, and after, each instruction
+        instructions_by_address = self.analyzer.instructions_by_address
+        uses_masks = instructions_by_address.uses_masks
+        overwrites_masks = instructions_by_address.overwrites_masks
+        blocks = routine.cfg.reverse_postorder
+
+        live_in = {}
+        live_out = {}
+        live_in_by_block = dict((block, 0) for block in blocks)
+        changed = True
+        while changed:
+            changed = False
+            for block in reversed(blocks):
+                live = 0
+                for successor in block.successors:
+                    live |= live_in_by_block[successor]
+                for addr in reversed(block.addresses):
+                    if instructions_by_address.is_routine_exit(addr):
+                        live |= exit_live
+                    call_target = instructions_by_address.call_target(addr)
+                    if call_target is not None:
+                        # the values live on entry to the called routine
+                        if self.is_unconditional_call(addr):
+                            live &= ~self.must_writes.get(call_target, 0)
+                        live |= self.reads.get(call_target, ALL_VALUES)
+                    if limit is not None:
+                        live &= limit(addr)
+                    live_out[addr] = live
+                    live = uses_masks[addr] | (live & ~overwrites_masks[addr])
+                    live_in[addr] = live
+                if live != live_in_by_block[block]:
+                    live_in_by_block[block] = live
+                    changed = True
+
+        return live_in, live_out
+
+
+class RoutineLiveness(object):
+    # The liveness that one routine's code is generated for: that of the whole analysis,
+    # or that of clone (a clones.Clone of the routine) if given
+
+    def __init__(self, analyzer, routine, clone=None):
+        self.analyzer = analyzer
+        self.routine = routine
+        self.clone = clone
+        self.results = routine.results if clone is None else clone.results
+
+    def get_used_results_mask(self, addr):
+        if self.clone is not None:
+            return self.clone.used_results_masks[addr]
+        return self.analyzer.instructions_by_address.used_results_masks[addr]
+
+    def get_live_in(self, addr):
+        # the values live before the instruction at addr
+        if self.clone is not None:
+            return self.clone.live_in_by_address.get(addr, 0)
+        return self.analyzer.live_in_by_address.get(addr, 0)
+
+    def get_live_out(self, addr):
+        # the values live after the instruction at addr, wherever it goes
+        if self.clone is not None:
+            return self.clone.live_out_by_address[addr]
+        analyzer = self.analyzer
+        return analyzer.get_live_values(analyzer.destinations_by_address[addr])
@@ -0,0 +1,85 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from batch import read_manifest, run_batch
+
+
+#   8000  LD A,1
+#   8002  LD (9000),A
+#   8005  RET
+CODE = b'\x3e\x01\x32\x00\x90\xc9'
+
+MANIFEST = [
+    {
+        'name': 'good',
+        'player': 'player.bin',
+        'player_addr': '0x8000',
+        'entry_points': ['0x8000'],
+    },
+    {
+        'name': 'missing',
+        'player': 'missing.bin',
+        'player_addr': 32768,
+        'entry_points': [32768],
+    },
+]
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        with open(os.path.join(self.temp_dir, 'player.bin'), 'wb') as f:
+            f.write(CODE)
+        self.manifest_path = os.path.join(self.temp_dir, 'manifest.json')
+        with open(self.manifest_path, 'w') as f:
+            json.dump(MANIFEST, f)
+        self.output_dir = os.path.join(self.temp_dir, 'output')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_read_manifest(self):
+        jobs = read_manifest(self.manifest_path)
+        self.assertEqual([job['name'] for job in jobs], ['good', 'missing'])
+        self.assertEqual(jobs[0]['player'], os.path.join(self.temp_dir, 'player.bin'))
+        for job in jobs:
+            self.assertEqual(job['player_addr'], 0x8000)
+            self.assertEqual(job['entry_points'], [0x8000])
+            self.assertEqual(job['emit'], [0x8000])
+            self.assertIsNone(job['data'])
+
+    def test_duplicate_names(self):
+        with open(self.manifest_path, 'w') as f:
+            json.dump([MANIFEST[0], MANIFEST[0]], f)
+        with self.assertRaises(ValueError):
+            read_manifest(self.manifest_path)
+
+    def test_run_batch(self):
+        run_batch(
+            read_manifest(self.manifest_path), self.output_dir, max_workers=2, use_cache=False
+        )
+        with open(os.path.join(self.output_dir, 'report.json')) as f:
+            report = json.load(f)
+
+        self.assertIsInstance(report['seconds'], float)
+        good, missing = report['jobs']
+        self.assertEqual(good['name'], 'good')
+        self.assertEqual(good['status'], 'ok')
+        self.assertIsNone(good['error'])
+        self.assertEqual(good['output'], 'good.js')
+        with open(os.path.join(self.output_dir, 'good.js')) as f:
+            self.assertIn("function r8000() {", f.read())
+
+        # a failing job is reported, and leaves no output
+        self.assertEqual(missing['name'], 'missing')
+        self.assertEqual(missing['status'], 'failed')
+        self.assertIn('missing.bin', missing['error'])
+        self.assertIsNone(missing['output'])
+        self.assertEqual(sorted(os.listdir(self.output_dir)), ['good.js', 'report.json'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import cache
+from analyzer import Analyzer
+from cache import AnalysisCache
+
+
+#   8000  LD A,1
+#   8002  LD (9000),A
+#   8005  RET
+CODE = b'\x3e\x01\x32\x00\x90\xc9'
+
+
+def analyse(analysis_cache):
+    analyzer = Analyzer(cache=analysis_cache)
+    analyzer.load_bytes(CODE, 0x8000)
+    analyzer.analyse([0x8000])
+    return analyzer
+
+
+class TestAnalysisCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = AnalysisCache(self.cache_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def load(self):
+        return self.cache.load(analyse(None).mem, [0x8000])
+
+    def overwrite_cache_files(self, data):
+        for filename in os.listdir(self.cache_dir):
+            with open(os.path.join(self.cache_dir, filename), 'wb') as f:
+                f.write(data)
+
+    def test_round_trip(self):
+        self.assertIsNone(self.load())
+        analyse(self.cache)
+        state = self.load()
+        self.assertEqual(sorted(state['routines']), [0x8000])
+        self.assertEqual(list(state['instructions_by_address']), [0x8000, 0x8002, 0x8005])
+
+    def test_corrupt_files_are_misses(self):
+        for data in (b'', b'\x80\x04\x95', b'not a pickle', b'\x80\x04K\x01.'):
+            analyse(self.cache)
+            self.overwrite_cache_files(data)
+            self.assertIsNone(self.load())
+
+    def test_corrupt_analysis_is_a_miss(self):
+        analyse(self.cache)
+        for filename in os.listdir(self.cache_dir):
+            if filename.startswith('analysis-'):
+                with open(os.path.join(self.cache_dir, filename), 'wb') as f:
+                    f.write(b'garbage')
+        self.assertIsNone(self.load())
+        # and is replaced by the next analysis
+        analyse(self.cache)
+        self.assertIsNotNone(self.load())
+
+    def test_format_version_is_in_the_key(self):
+        analyse(self.cache)
+        version = cache.CACHE_FORMAT_VERSION
+        cache.CACHE_FORMAT_VERSION = version + 1
+        try:
+            self.assertIsNone(self.load())
+        finally:
+            cache.CACHE_FORMAT_VERSION = version
+        self.assertIsNotNone(self.load())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+
+from analyzer import Analyzer
+
+
+def analyse(code, addr=0x8000):
+    # the analysis of a routine made up of the given bytes of Z80 code, loaded at addr
+    analyzer = Analyzer()
+    analyzer.load_bytes(bytes(bytearray(code)), addr)
+    analyzer.analyse([addr])
+    return analyzer
+
+
+class TestDominators(unittest.TestCase):
+    def test_diamond(self):
+        #   8000  AND A
+        #   8001  JR Z,8007
+        #   8003  LD A,1
+        #   8005  JR 8009
+        #   8007  LD A,2
+        #   8009  LD (9000),A
+        #   800c  RET
+        analyzer = analyse([
+            0xa7, 0x28, 0x04, 0x3e, 0x01, 0x18, 0x02, 0x3e, 0x02, 0x32, 0x00, 0x90, 0xc9
+        ])
+        cfg = analyzer.routines[0x8000].cfg
+        blocks = analyzer.blocks_by_address
+        entry, then_block, else_block, merge = (
+            blocks[0x8000], blocks[0x8003], blocks[0x8007], blocks[0x8009]
+        )
+
+        self.assertIs(cfg.entry_block, entry)
+        self.assertIs(cfg.reverse_postorder[0], entry)
+        self.assertIs(cfg.reverse_postorder[-1], merge)
+        self.assertEqual(set(cfg.predecessors[merge]), set([then_block, else_block]))
+
+        self.assertIs(cfg.immediate_dominators[entry], entry)
+        self.assertIs(cfg.immediate_dominators[then_block], entry)
+        self.assertIs(cfg.immediate_dominators[else_block], entry)
+        self.assertIs(cfg.immediate_dominators[merge], entry)
+
+        self.assertTrue(cfg.dominates(entry, merge))
+        self.assertTrue(cfg.dominates(merge, merge))
+        self.assertFalse(cfg.dominates(then_block, merge))
+        self.assertFalse(cfg.dominates(else_block, merge))
+        self.assertFalse(cfg.dominates(merge, entry))
+
+    def test_loop(self):
+        #   8000  LD B,3
+        #   8002  INC A
+        #   8003  DJNZ 8002
+        #   8005  RET
+        analyzer = analyse([0x06, 0x03, 0x3c, 0x10, 0xfd, 0xc9])
+        cfg = analyzer.routines[0x8000].cfg
+        blocks = analyzer.blocks_by_address
+        entry, body, exit_block = blocks[0x8000], blocks[0x8002], blocks[0x8005]
+
+        self.assertEqual(cfg.reverse_postorder, [entry, body, exit_block])
+        self.assertEqual(set(cfg.predecessors[body]), set([entry, body]))
+        self.assertIs(cfg.immediate_dominators[body], entry)
+        self.assertIs(cfg.immediate_dominators[exit_block], body)
+        self.assertTrue(cfg.dominates(body, exit_block))
+        self.assertTrue(cfg.dominates(entry, exit_block))
+        self.assertFalse(cfg.dominates(exit_block, body))
+
+    def test_loop_with_two_entries(self):
+        #   8000  AND A
+        #   8001  JR Z,8004
+        #   8003  INC A
+        #   8004  DEC B
+        #   8005  JR NZ,8003
+        #   8007  RET
+        analyzer = analyse([0xa7, 0x28, 0x01, 0x3c, 0x05, 0x20, 0xfc, 0xc9])
+        cfg = analyzer.routines[0x8000].cfg
+        blocks = analyzer.blocks_by_address
+
+        # neither block of the loop dominates the other
+        self.assertIs(cfg.immediate_dominators[blocks[0x8003]], blocks[0x8000])
+        self.assertIs(cfg.immediate_dominators[blocks[0x8004]], blocks[0x8000])
+        self.assertFalse(cfg.dominates(blocks[0x8003], blocks[0x8004]))
+        self.assertFalse(cfg.dominates(blocks[0x8004], blocks[0x8003]))
+        self.assertIs(cfg.immediate_dominators[blocks[0x8007]], blocks[0x8004])
+
+
+if __name__ == '__main__':
+    unittest.main()
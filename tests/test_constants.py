@@ -0,0 +1,80 @@
+import unittest
+
+from constants import evaluate, fold, format_constant, split_statements
+
+
+class TestEvaluate(unittest.TestCase):
+    def test_constant(self):
+        self.assertEqual(evaluate('0x44 << 8 | 0x3c'), 0x443c)
+        self.assertEqual(evaluate('(0xff + 1) & 0xff'), 0x00)
+        self.assertEqual(evaluate('~0x00 & 0xff'), 0xff)
+        self.assertEqual(evaluate('0x10 - 0x20'), -0x10)
+
+    def test_not_constant(self):
+        self.assertIsNone(evaluate('a + 1'))
+        self.assertIsNone(evaluate('mem[0x4000]'))
+        self.assertIsNone(evaluate('()'))
+        self.assertIsNone(evaluate('0x01 +'))
+        self.assertIsNone(evaluate(''))
+
+    def test_out_of_32_bit_range(self):
+        # Javascript's bitwise operators would wrap these
+        self.assertIsNone(evaluate('0x7fffffff + 1'))
+        self.assertIsNone(evaluate('1 << 31'))
+        self.assertEqual(evaluate('1 << 30'), 0x40000000)
+
+    def test_javascript_semantics(self):
+        # Javascript converts the operands of >> and the bitwise operators to 32 bits,
+        # which Python does not, so these are left alone rather than folded differently
+        self.assertIsNone(evaluate('(0x7fffffff + 1) >> 4'))
+        self.assertIsNone(evaluate('(0xffffffff + 1) & 0xff'))
+        self.assertIsNone(evaluate('~0x80000000'))
+        self.assertIsNone(evaluate('0x01 << 32'))
+        self.assertIsNone(evaluate('0x01 >> (0 - 1)'))
+        # beyond the integers that a double holds exactly
+        self.assertIsNone(evaluate('0x20000000000000 + 1 - 0x20000000000000'))
+        # operators that are not folded at all
+        self.assertIsNone(evaluate('0x07 % 0x02'))
+        self.assertIsNone(evaluate('0x07 ** 0x02'))
+        # negative values within 32 bits fold as Javascript has them
+        self.assertEqual(evaluate('(0 - 0x10) >> 2'), -0x04)
+        self.assertEqual(evaluate('(0 - 0x10) & 0xff'), 0xf0)
+        self.assertEqual(evaluate('~0x00'), -0x01)
+
+
+class TestFold(unittest.TestCase):
+    def test_whole_expression(self):
+        self.assertEqual(fold('0x01 + 0x02'), '0x03')
+        self.assertEqual(fold(' 0x44 << 8 | 0x3c '), '0x443c')
+
+    def test_parts(self):
+        self.assertEqual(fold('mem[(0x44 << 8 | 0x3c)]'), 'mem[0x443c]')
+        self.assertEqual(fold('mem[0x443c + 0x01]'), 'mem[0x443d]')
+        self.assertEqual(fold('a + (0x01 + 0x01)'), 'a + 0x02')
+        self.assertEqual(fold('mem[(0x40 << 8 | 0x00) + (0x00 << 8 | 0x05)]'), 'mem[0x4005]')
+
+    def test_unchanged(self):
+        self.assertEqual(fold('a + b'), 'a + b')
+        self.assertEqual(fold('mem[(h << 8 | l)]'), 'mem[(h << 8 | l)]')
+        # a function call's arguments are not a parenthesised expression
+        self.assertEqual(fold('out(0x01 + 0x01)'), 'out(0x01 + 0x01)')
+
+
+class TestFormatConstant(unittest.TestCase):
+    def test_format_constant(self):
+        self.assertEqual(format_constant(0x05), '0x05')
+        self.assertEqual(format_constant(0x443c), '0x443c')
+        self.assertEqual(format_constant(0x10000), '0x10000')
+        self.assertEqual(format_constant(-1), '-0x01')
+
+
+class TestSplitStatements(unittest.TestCase):
+    def test_split_statements(self):
+        self.assertEqual(
+            split_statements('a = 0x01; if (zFlag) {b = a; return;} /* note */ c++;'),
+            ['a = 0x01;', ' if (zFlag) {b = a; return;}', ' /* note */', ' c++;']
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+
+from decoder import decode_fields
+from instructions import get_instruction
+
+
+def get_opcode_sequences():
+    # the opcode bytes of every instruction (and unrecognised opcode) that the decoder
+    # tables can reach, following the CB, ED, DD, FD and DD / FD CB prefixes
+    for opcode in range(0x100):
+        if opcode in (0xcb, 0xed):
+            for sub_opcode in range(0x100):
+                yield [opcode, sub_opcode]
+        elif opcode in (0xdd, 0xfd):
+            for sub_opcode in range(0x100):
+                if sub_opcode == 0xcb:
+                    for cb_opcode in range(0x100):
+                        # the offset comes between the CB prefix and the opcode
+                        yield [opcode, 0xcb, None, cb_opcode]
+                else:
+                    yield [opcode, sub_opcode]
+        else:
+            yield [opcode]
+
+
+def get_fields(instruction):
+    # the fields that decode_fields gives for instruction
+    next_addr = (instruction.addr + instruction.length) & 0xffff
+    return (
+        type(instruction), instruction.length, instruction.uses_mask,
+        instruction.overwrites_mask, instruction.is_routine_exit,
+        next_addr in instruction.static_destination_addresses,
+        getattr(instruction, 'param', -1), getattr(instruction, 'offset', 0),
+        instruction.jump_target, instruction.call_target,
+    )
+
+
+class TestDecoder(unittest.TestCase):
+    def test_matches_get_instruction(self):
+        # with parameter bytes giving forward and backward offsets, at an address where
+        # the instruction runs past 0xffff as well as one where it does not
+        for params in ([0x34, 0x35, 0x36, 0x37], [0x80, 0xff, 0xfe, 0x12]):
+            for addr in (0x8000, 0xfffe):
+                for sequence in get_opcode_sequences():
+                    mem = bytearray(0x10000)
+                    for i, param in enumerate(params):
+                        mem[(addr + i) & 0xffff] = param
+                    for i, byte in enumerate(sequence):
+                        if byte is not None:
+                            mem[(addr + i) & 0xffff] = byte
+
+                    try:
+                        instruction = get_instruction(mem, addr)
+                    except Exception:
+                        with self.assertRaises(Exception):
+                            decode_fields(mem, addr)
+                        continue
+
+                    self.assertEqual(
+                        decode_fields(mem, addr), get_fields(instruction),
+                        "%s at 0x%04x" % (' '.join('%02x' % byte for byte in mem[addr:addr + 4]), addr)
+                    )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,208 @@
+import json
+import shutil
+import subprocess
+import unittest
+
+from analyzer import Analyzer
+from loops import hoist_invariants, make_counted_loop, optimise_loops
+from test_ports import HOST
+
+# Add 3 to each of the bytes from 0x9000, as many as 0x9100 holds (256 for zero), then store
+# the final HL and B where the test can see them:
+#   8000  LD A,(0x9100)
+#   8003  LD B,A
+#   8004  LD HL,0x9000
+#   8007  LD A,(HL)
+#   8008  ADD A,3
+#   800a  LD (HL),A
+#   800b  INC HL
+#   800c  DJNZ 0x8007
+#   800e  LD (0x9101),HL
+#   8011  LD A,B
+#   8012  LD (0x9103),A
+#   8015  RET
+DJNZ_LOOP = [
+    0x3a, 0x00, 0x91, 0x47, 0x21, 0x00, 0x90, 0x7e, 0xc6, 0x03, 0x77, 0x23, 0x10, 0xf9,
+    0x22, 0x01, 0x91, 0x78, 0x32, 0x03, 0x91, 0xc9,
+]
+
+# The same loop, counted with DEC B / JR NZ
+DEC_JR_LOOP = [
+    0x3a, 0x00, 0x91, 0x47, 0x21, 0x00, 0x90, 0x7e, 0xc6, 0x03, 0x77, 0x23, 0x05, 0x20, 0xf8,
+    0x22, 0x01, 0x91, 0x78, 0x32, 0x03, 0x91, 0xc9,
+]
+
+# Add up (0x9200) as many times as 0x9100 holds, reading it through DE each time, and
+# store the total at 0x9101:
+#   8000  LD A,(0x9100)
+#   8003  LD B,A
+#   8004  LD C,0
+#   8006  LD DE,0x9200
+#   8009  LD A,(DE)
+#   800a  ADD A,C
+#   800b  LD C,A
+#   800c  DJNZ 0x8009
+#   800e  LD A,C
+#   800f  LD (0x9101),A
+#   8012  RET
+INVARIANT_LOOP = [
+    0x3a, 0x00, 0x91, 0x47, 0x0e, 0x00, 0x11, 0x00, 0x92, 0x1a, 0x81, 0x4f, 0x10, 0xfb,
+    0x79, 0x32, 0x01, 0x91, 0xc9,
+]
+
+
+def compile_code(code, **options):
+    analyzer = Analyzer(**options)
+    analyzer.load_bytes(bytes(bytearray(code)), 0x8000)
+    analyzer.analyse([0x8000])
+    return analyzer.emit([0x8000])
+
+
+def run(javascript, count):
+    # run the routine at 0x8000 from the given compiled Javascript in node, with count at
+    # 0x9100, returning the memory it leaves
+    script = HOST + javascript + '''
+for (var addr = 0; addr < 0x100; addr++) mem[0x9000 + addr] = addr;
+mem[0x9100] = %d;
+mem[0x9200] = 0x10;
+rp[SP] = 0xff00;
+r8000();
+console.log(JSON.stringify(Array.prototype.slice.call(mem, 0x9000, 0x9104)));
+''' % count
+    return json.loads(subprocess.check_output(['node', '-e', script]).decode())
+
+
+@unittest.skipUnless(shutil.which('node'), "node is not installed")
+class TestOptimisedLoops(unittest.TestCase):
+    def check_loop(self, code, count, **options):
+        javascript = compile_code(code, **options)
+        self.assertIn("for (var n", javascript)
+        expected = run(compile_code(code, optimise_loops=False, **options), count)
+        self.assertEqual(run(javascript, count), expected)
+        return expected
+
+    def test_djnz_loop(self):
+        for options in ({}, {'promote_registers': False}):
+            for count in (1, 5, 0):
+                result = self.check_loop(DJNZ_LOOP, count, **options)
+                iterations = count or 0x100
+                self.assertEqual(result[:iterations], [(n + 3) & 0xff for n in range(iterations)])
+                self.assertEqual(result[iterations:0x100], list(range(iterations, 0x100)))
+                self.assertEqual(result[0x101:0x104], [iterations & 0xff, 0x90 + (iterations >> 8), 0])
+
+    def test_dec_jr_loop(self):
+        for options in ({}, {'promote_registers': False}):
+            for count in (1, 5, 0):
+                self.check_loop(DEC_JR_LOOP, count, **options)
+
+    def test_invariant_loop(self):
+        javascript = compile_code(INVARIANT_LOOP)
+        self.assertIn("var m0_l8009 = mem[0x9200];", javascript)
+        for count in (1, 5, 0):
+            result = self.check_loop(INVARIANT_LOOP, count)
+            self.assertEqual(result[0x101], (0x10 * (count or 0x100)) & 0xff)
+
+
+class TestMakeCountedLoop(unittest.TestCase):
+    def test_counted_loop(self):
+        statement = ('do', 'l8000', [('code', 'a++;'), ('code', 'b = (b - 1) & 0xff;')], 'b !== 0')
+        self.assertEqual(make_counted_loop(statement), [
+            ('for', 'l8000', [('code', 'a++;')], 'b'),
+            ('code', 'b = 0x00;'),
+        ])
+
+    def test_unpromoted_counted_loop(self):
+        statement = ('do', 'l8000', [('code', 'r[A]++;'), ('code', 'r[B]--;')], 'r[B] !== 0')
+        self.assertEqual(make_counted_loop(statement), [
+            ('for', 'l8000', [('code', 'r[A]++;')], 'r[B]'),
+            ('code', 'r[B] = 0x00;'),
+        ])
+
+    def test_counter_used_in_body(self):
+        statement = ('do', 'l8000', [('code', 'a = b;'), ('code', 'b = (b - 1) & 0xff;')], 'b !== 0')
+        self.assertIsNone(make_counted_loop(statement))
+        statement = (
+            'do', 'l8000', [('code', 'rp[HL] = rp[BC];'), ('code', 'r[B]--;')], 'r[B] !== 0'
+        )
+        self.assertIsNone(make_counted_loop(statement))
+
+    def test_calls_in_unpromoted_body(self):
+        # a call could read or write r[B]
+        statement = ('do', 'l8000', [('code', 'r9000();'), ('code', 'r[B]--;')], 'r[B] !== 0')
+        self.assertIsNone(make_counted_loop(statement))
+
+    def test_other_exits(self):
+        for exit in (('code', 'return;'), ('break', 'b7000'), ('continue', 'l7000')):
+            statement = (
+                'do', 'l8000',
+                [('if', 'zFlag', [exit], []), ('code', 'b = (b - 1) & 0xff;')],
+                'b !== 0'
+            )
+            self.assertIsNone(make_counted_loop(statement))
+
+    def test_other_conditions(self):
+        statement = ('do', 'l8000', [('code', 'a++;'), ('code', 'b = (b - 1) & 0xff;')], 'c !== 0')
+        self.assertIsNone(make_counted_loop(statement))
+        statement = ('do', 'l8000', [('code', 'a++;'), ('code', 'b = (b + 1) & 0xff;')], 'b !== 0')
+        self.assertIsNone(make_counted_loop(statement))
+
+
+class TestHoistInvariants(unittest.TestCase):
+    def test_pairs(self):
+        declarations, body = hoist_invariants('l8000', [
+            ('code', 'a = mem[(h << 8 | l)];'),
+            ('code', 'mem[(d << 8 | e)] = a;'),
+            ('code', 'e = (e + 1) & 0xff;'),
+        ])
+        self.assertEqual(declarations, [('code', 'var hl_l8000 = (h << 8 | l);')])
+        self.assertEqual(body, [
+            ('code', 'a = mem[hl_l8000];'),
+            ('code', 'mem[(d << 8 | e)] = a;'),
+            ('code', 'e = (e + 1) & 0xff;'),
+        ])
+
+    def test_memory_reads(self):
+        declarations, body = hoist_invariants('l8000', [
+            ('code', 'a = (a + mem[0x9000]) & 0xff;'),
+            ('code', 'c = mem[(h << 8 | l)];'),
+            ('code', 'l = (l + 1) & 0xff;'),
+        ])
+        self.assertEqual(declarations, [('code', 'var m0_l8000 = mem[0x9000];')])
+        self.assertEqual(body[0], ('code', 'a = (a + m0_l8000) & 0xff;'))
+        self.assertEqual(body[1], ('code', 'c = mem[(h << 8 | l)];'))
+
+    def test_memory_writes(self):
+        # a write to memory could change what any read would see
+        statements = [
+            ('code', 'a = (a + mem[0x9000]) & 0xff;'),
+            ('code', 'mem[(h << 8 | l)] = a;'),
+            ('code', 'l = (l + 1) & 0xff;'),
+        ]
+        self.assertEqual(hoist_invariants('l8000', statements), ([], statements))
+
+    def test_calls(self):
+        statements = [('code', 'a = (a + mem[0x9000]) & 0xff;'), ('code', 'r9000();')]
+        self.assertEqual(hoist_invariants('l8000', statements), ([], statements))
+
+
+class TestOptimiseLoops(unittest.TestCase):
+    def test_nested_loops(self):
+        inner = (
+            'do', 'l8002', [('code', 'a++;'), ('code', 'c = (c - 1) & 0xff;')], 'c !== 0'
+        )
+        statements = [
+            ('do', 'l8000', [inner, ('code', 'b = (b - 1) & 0xff;')], 'b !== 0'),
+            ('code', 'return;'),
+        ]
+        self.assertEqual(optimise_loops(statements), [
+            ('for', 'l8000', [
+                ('for', 'l8002', [('code', 'a++;')], 'c'),
+                ('code', 'c = 0x00;'),
+            ], 'b'),
+            ('code', 'b = 0x00;'),
+            ('code', 'return;'),
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import json
+import shutil
+import subprocess
+import unittest
+
+from analyzer import Analyzer
+
+
+# The host state that compiled code runs against, as in regression.js
+HOST = '''
+var registerBuffer = new ArrayBuffer(26);
+var rp = new Uint16Array(registerBuffer);
+var r = new Uint8Array(registerBuffer);
+var BC = 1, DE = 2, HL = 3, IX = 4, IY = 5, SP = 6;
+var A = 1, B = 3, C = 2, D = 5, E = 4, H = 7, L = 6, IXH = 9, IXL = 8, IYH = 11, IYL = 10;
+var cFlag = false, zFlag = false, sFlag = false, pvFlag = false;
+var mem = new Uint8Array(0x10000);
+var ayRegisters = [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, false];
+var selectedAYRegister = 0;
+function out(port, val) {
+	if ((port & 0xc002) == 0xc000) {
+		selectedAYRegister = val;
+	} else if ((port & 0xc002) == 0x8000) {
+		ayRegisters[selectedAYRegister] = val;
+		if (selectedAYRegister == 13) ayRegisters[14] = true;
+	}
+}
+'''
+
+# Store the loop's final HL and A where the test can see them, and return
+#   LD (0x9100),HL
+#   LD (0x9102),A
+#   RET
+EPILOGUE = [0x22, 0x00, 0x91, 0x32, 0x02, 0x91, 0xc9]
+
+# Write AY registers 3 ... 13 from 0x9000 ... 0x900a:
+#   8000  LD HL,0x9000
+#   8003  LD A,3
+#   8005  LD C,0xfd
+#   8007  LD B,0xff
+#   8009  OUT (C),A
+#   800b  LD B,0xbf
+#   800d  OUTI
+#   800f  INC A
+#   8010  CP 14
+#   8012  JR NZ,0x8007
+OUTI_LOOP = [
+    0x21, 0x00, 0x90, 0x3e, 0x03, 0x0e, 0xfd, 0x06, 0xff, 0xed, 0x79, 0x06, 0xbf, 0xed, 0xa3,
+    0x3c, 0xfe, 0x0e, 0x20, 0xf3,
+] + EPILOGUE
+
+# Write AY registers 12 ... 0 from 0x900c ... 0x9000:
+#   8000  LD HL,0x900c
+#   8003  LD A,12
+#   8005  LD C,0xfd
+#   8007  LD B,0xff
+#   8009  OUT (C),A
+#   800b  LD B,0xbf
+#   800d  OUTD
+#   800f  DEC A
+#   8010  JP P,0x8007
+OUTD_LOOP = [
+    0x21, 0x0c, 0x90, 0x3e, 0x0c, 0x0e, 0xfd, 0x06, 0xff, 0xed, 0x79, 0x06, 0xbf, 0xed, 0xab,
+    0x3d, 0xf2, 0x07, 0x80,
+] + EPILOGUE
+
+
+def compile_code(code, **options):
+    analyzer = Analyzer(**options)
+    analyzer.load_bytes(bytes(bytearray(code)), 0x8000)
+    analyzer.load_bytes(bytes(bytearray(range(0x40, 0x50))), 0x9000)
+    analyzer.analyse([0x8000])
+    return analyzer
+
+
+def run(javascript):
+    # run the routine at 0x8000 from the given compiled Javascript in node, returning the
+    # AY state and the memory it leaves
+    script = HOST + javascript + '''
+for (var addr = 0; addr < 0x10; addr++) mem[0x9000 + addr] = 0x40 + addr;
+rp[SP] = 0xff00;
+r8000();
+console.log(JSON.stringify({
+	ayRegisters: ayRegisters, selectedAYRegister: selectedAYRegister,
+	mem: Array.prototype.slice.call(mem, 0x9000, 0x9110)
+}));
+'''
+    return json.loads(subprocess.check_output(['node', '-e', script]).decode())
+
+
+@unittest.skipUnless(shutil.which('node'), "node is not installed")
+class TestAYRegisterLoops(unittest.TestCase):
+    def check_loop(self, code):
+        # the loop is written as one copy, with the same results as each instruction's code
+        analyzer = compile_code(code, ay_ports=True)
+        self.assertEqual(list(analyzer.get_ay_register_loops([0x8000]).loops_by_address), [0x8007])
+        expected = run(compile_code(code, ay_ports=False).emit([0x8000]))
+        self.assertEqual(run(analyzer.emit([0x8000])), expected)
+        self.assertEqual(
+            run(compile_code(code, ay_ports=True, promote_registers=False).emit([0x8000])),
+            expected
+        )
+        return expected
+
+    def test_outi_loop(self):
+        result = self.check_loop(OUTI_LOOP)
+        self.assertEqual(result['ayRegisters'][3:14], list(range(0x40, 0x4b)))
+        self.assertEqual(result['ayRegisters'][14], True)
+        self.assertEqual(result['selectedAYRegister'], 13)
+
+    def test_outd_loop(self):
+        result = self.check_loop(OUTD_LOOP)
+        self.assertEqual(result['ayRegisters'][0:13], list(range(0x40, 0x4d)))
+        self.assertEqual(result['ayRegisters'][14], False)
+        self.assertEqual(result['selectedAYRegister'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import random
+import unittest
+
+import predecode
+from analyzer import Analyzer
+from decoder import decode_fields
+
+
+def get_image(seed):
+    # a memory image of random bytes, as a stand-in for an unknown snapshot
+    generator = random.Random(seed)
+    return bytearray(generator.randrange(0x100) for addr in range(0x10000))
+
+
+class TestPreDecode(unittest.TestCase):
+    def check_against_decoder(self, predecoded, mem):
+        for addr in range(0x10000):
+            try:
+                (
+                    cls, length, uses_mask, overwrites_mask, is_routine_exit, falls_through,
+                    param, offset, jump_target, call_target
+                ) = decode_fields(mem, addr)
+            except Exception:
+                self.assertEqual(predecoded.length(addr), 0, "0x%04x" % addr)
+                continue
+
+            next_addr = (addr + length) & 0xffff
+            self.assertEqual(predecoded.length(addr), length, "0x%04x" % addr)
+            self.assertEqual(predecoded.is_routine_exit(addr), is_routine_exit, "0x%04x" % addr)
+            self.assertEqual(predecoded.jump_target(addr), jump_target, "0x%04x" % addr)
+            self.assertEqual(predecoded.call_target(addr), call_target, "0x%04x" % addr)
+            self.assertEqual(
+                predecoded.static_destination_addresses(addr),
+                [target for target in (call_target, jump_target) if target is not None]
+                + ([next_addr] if falls_through else []),
+                "0x%04x" % addr
+            )
+
+    def test_matches_decoder(self):
+        mem = get_image(1)
+        self.check_against_decoder(predecode.PreDecode(mem), mem)
+
+    def test_without_numpy(self):
+        mem = get_image(2)
+        numpy = predecode.numpy
+        predecode.numpy = None
+        try:
+            predecoded = predecode.PreDecode(mem)
+            candidates = predecoded.candidate_entry_points()
+        finally:
+            predecode.numpy = numpy
+        self.check_against_decoder(predecoded, mem)
+        if numpy is not None:
+            self.assertEqual(candidates, predecode.PreDecode(mem).candidate_entry_points())
+
+    def test_candidate_entry_points(self):
+        #   8000  CALL 8010
+        #   8003  CALL 8020
+        #   8006  CALL 8010
+        #   8009  RET
+        #   8010  RET
+        #   8020  RET
+        analyzer = Analyzer()
+        analyzer.load_bytes(b'\xcd\x10\x80\xcd\x20\x80\xcd\x10\x80\xc9', 0x8000)
+        analyzer.load_bytes(b'\xc9', 0x8010)
+        analyzer.load_bytes(b'\xc9', 0x8020)
+
+        self.assertEqual(analyzer.get_candidate_entry_points(0x8000, 0x800a), [0x8010, 0x8020])
+
+        analyzer.analyse([0x8000])
+        self.assertEqual(sorted(analyzer.routines), [0x8000, 0x8010, 0x8020])
+        self.assertEqual(analyzer.origins_by_address[0x8003], set([0x8010]))
+
+
+if __name__ == '__main__':
+    unittest.main()
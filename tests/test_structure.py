@@ -0,0 +1,200 @@
+from io import StringIO
+import unittest
+
+from analyzer import Analyzer
+from jswriter import JavascriptWriter
+from structure import (
+    IrreducibleControlFlow, RoutineStructurer, get_used_labels, make_do_loop, negate,
+    write_statements,
+)
+
+
+def structure(code, addr=0x8000):
+    # the structured statements for a routine made up of the given bytes of Z80 code,
+    # loaded at addr
+    analyzer = Analyzer()
+    analyzer.load_bytes(bytes(bytearray(code)), addr)
+    analyzer.analyse([addr])
+    cfg = analyzer.routines[addr].cfg
+    return RoutineStructurer(cfg, analyzer.instructions_by_address).structure()
+
+
+def shape(statements):
+    # the statements with the Javascript of each ('code', ...) statement left out
+    result = []
+    for statement in statements:
+        kind = statement[0]
+        if kind == 'code':
+            result.append(('code',))
+        elif kind == 'if':
+            result.append(('if', shape(statement[2]), shape(statement[3])))
+        elif kind in ('loop', 'block'):
+            result.append((kind, statement[1], shape(statement[2])))
+        elif kind == 'do':
+            result.append(('do', statement[1], shape(statement[2]), statement[3]))
+        else:
+            result.append(statement)
+    return result
+
+
+class TestRoutineStructurer(unittest.TestCase):
+    def test_if_else(self):
+        #   8000  AND A
+        #   8001  JR Z,8007
+        #   8003  LD A,1
+        #   8005  JR 8009
+        #   8007  LD A,2
+        #   8009  LD (9000),A
+        #   800c  RET
+        statements = structure([
+            0xa7, 0x28, 0x04, 0x3e, 0x01, 0x18, 0x02, 0x3e, 0x02, 0x32, 0x00, 0x90, 0xc9
+        ])
+        self.assertEqual(shape(statements), [
+            ('block', 'b8009', [
+                ('code',),
+                ('if', [('code',)], [('code',)]),
+            ]),
+            ('code',),
+            ('code',),
+        ])
+        self.assertEqual(statements[0][2][1][1], 'zFlag')
+
+    def test_if_without_else(self):
+        #   8000  AND A
+        #   8001  JR Z,8005
+        #   8003  LD A,1
+        #   8005  LD (9000),A
+        #   8008  RET
+        statements = structure([0xa7, 0x28, 0x02, 0x3e, 0x01, 0x32, 0x00, 0x90, 0xc9])
+        self.assertEqual(shape(statements), [
+            ('block', 'b8005', [
+                ('code',),
+                ('if', [('code',)], []),
+            ]),
+            ('code',),
+            ('code',),
+        ])
+        self.assertEqual(statements[0][2][1][1], '!zFlag')
+
+    def test_djnz_loop(self):
+        #   8000  LD B,3
+        #   8002  INC A
+        #   8003  DJNZ 8002
+        #   8005  RET
+        statements = structure([0x06, 0x03, 0x3c, 0x10, 0xfd, 0xc9])
+        self.assertEqual(shape(statements), [
+            ('code',),
+            ('do', 'l8002', [('code',), ('code',)], 'r[B] !== 0'),
+            ('code',),
+        ])
+
+    def test_loop_left_from_the_middle(self):
+        #   8000  INC A
+        #   8001  CP 5
+        #   8003  RET Z
+        #   8004  JR 8000
+        statements = structure([0x3c, 0xfe, 0x05, 0xc8, 0x18, 0xfa])
+        self.assertEqual(shape(statements), [
+            ('loop', 'l8000', [('code',), ('code',), ('code',)]),
+        ])
+
+    def test_irreducible(self):
+        #   8000  AND A
+        #   8001  JR Z,8004
+        #   8003  INC A
+        #   8004  DEC B
+        #   8005  JR NZ,8003
+        #   8007  RET
+        with self.assertRaises(IrreducibleControlFlow):
+            structure([0xa7, 0x28, 0x01, 0x3c, 0x05, 0x20, 0xfc, 0xc9])
+
+
+class TestMakeDoLoop(unittest.TestCase):
+    def test_test_at_foot(self):
+        statements = [('code', 'b--;'), ('if', 'b === 0', [('code', 'return;')], [])]
+        self.assertEqual(make_do_loop('l8000', statements), [
+            ('do', 'l8000', [('code', 'b--;')], 'b !== 0'),
+            ('code', 'return;'),
+        ])
+
+    def test_continue_elsewhere(self):
+        statements = [
+            ('if', 'zFlag', [('continue', 'l8000')], []),
+            ('code', 'b--;'),
+            ('if', 'b === 0', [('code', 'return;')], []),
+        ]
+        self.assertEqual(make_do_loop('l8000', statements), [('loop', 'l8000', statements)])
+
+    def test_runs_off_the_end(self):
+        # running off the end of the statements goes round the loop
+        statements = [('if', 'zFlag', [('code', 'return;')], []), ('code', 'a++;')]
+        self.assertEqual(make_do_loop('l8000', statements), [('loop', 'l8000', statements)])
+
+    def test_never_goes_round(self):
+        statements = [('code', 'a++;'), ('code', 'return;')]
+        self.assertEqual(make_do_loop('l8000', statements), statements)
+
+
+class TestNegate(unittest.TestCase):
+    def test_negate(self):
+        self.assertEqual(negate('zFlag'), '!zFlag')
+        self.assertEqual(negate('!zFlag'), 'zFlag')
+        self.assertEqual(negate('a === 0x05'), 'a !== 0x05')
+        self.assertEqual(negate('(a < 0x10)'), 'a >= 0x10')
+        self.assertEqual(negate('(a << 1) > b'), '(a << 1) <= b')
+        self.assertEqual(negate('zFlag && cFlag'), '!(zFlag && cFlag)')
+        self.assertEqual(negate('!(zFlag && cFlag)'), 'zFlag && cFlag')
+
+
+class TestWriteStatements(unittest.TestCase):
+    def test_labels(self):
+        statements = [
+            ('loop', 'l8000', [
+                ('block', 'b8004', [
+                    ('if', 'zFlag', [('break', 'b8004')], []),
+                    ('continue', 'l8000'),
+                ]),
+                ('code', 'return;'),
+            ]),
+        ]
+        out = StringIO()
+        write_statements(JavascriptWriter(out), statements, get_used_labels(statements))
+        self.assertEqual(out.getvalue(), (
+            "while (true) {\n"
+            "\tb8004: {\n"
+            "\t\tif (zFlag) {\n"
+            "\t\t\tbreak b8004;\n"
+            "\t\t}\n"
+            "\t\tcontinue;\n"
+            "\t}\n"
+            "\treturn;\n"
+            "}\n"
+        ))
+
+    def test_for_loop(self):
+        statements = [
+            ('for', 'l8000', [
+                ('loop', 'l8002', [
+                    ('if', 'zFlag', [('continue', 'l8000')], []),
+                    ('code', 'a++;'),
+                ]),
+            ], 'b'),
+            ('code', 'b = 0x00;'),
+        ]
+        out = StringIO()
+        write_statements(JavascriptWriter(out), statements, get_used_labels(statements))
+        self.assertEqual(out.getvalue(), (
+            "l8000: for (var n8000 = b || 0x100; n8000 > 0; n8000--) {\n"
+            "\twhile (true) {\n"
+            "\t\tif (zFlag) {\n"
+            "\t\t\tcontinue l8000;\n"
+            "\t\t}\n"
+            "\t\ta++;\n"
+            "\t}\n"
+            "}\n"
+            "b = 0x00;\n"
+        ))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -32,6 +32,9 @@ var z80 = Z80Processor({
 	}
 });
 
+/* usage: node run.js tune.stc [frames] */
+var frames = parseInt(process.argv[3] || '100000');
+
 var fs = require('fs');
 fs.readFile(process.argv[2], function(err, stc) {
 	/* load STC data at address 0x443c */
@@ -42,7 +45,7 @@ fs.readFile(process.argv[2], function(err, stc) {
 	/* init player */
 	var count = z80.runRoutine(0x4000, 0x3f00);
 
-	for (var frame = 0; frame < 100000; frame++) {
+	for (var frame = 0; frame < frames; frame++) {
 		ayRegisters[14] = false;
 		count = z80.runRoutine(0x4006, 0x3f00);
 		console.log(ayRegisters.slice());